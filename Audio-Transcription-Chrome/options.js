@@ -122,6 +122,10 @@ async function startRecord(option) {
         chrome.runtime.sendMessage({ action: "stopCapture" })
         return;
       }
+
+      // waiting in the server queue, the connection is kept open until a slot frees up
+      if (data["status"] === "QUEUED")
+        return;
         
       if (isServerReady === false){
         isServerReady = true;
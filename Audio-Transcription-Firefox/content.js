@@ -93,6 +93,10 @@ function startRecording(data) {
         await browser.runtime.sendMessage({ action: "showPopup", data: data["message"] })
         return;
       }
+
+      // waiting in the server queue, the connection is kept open until a slot frees up
+      if (data["status"] === "QUEUED")
+        return;
       
       if (!isServerReady && data["message"] === "SERVER_READY"){
         isServerReady = true;
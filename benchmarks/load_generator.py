@@ -0,0 +1,445 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+import urllib.request
+
+import numpy as np
+import websockets
+from faster_whisper.audio import decode_audio
+
+from whisper_live.audio_codec import get_audio_encoder
+
+RATE = 16000
+
+
+def load_audio(paths, min_duration=0.0):
+    """
+    Decode the audio files replayed by the simulated clients.
+
+    Args:
+        paths (list): Audio files, concatenated in order.
+        min_duration (float, optional): The audio is repeated until it lasts at least this many seconds.
+
+    Returns:
+        bytes: 16-bit PCM at 16kHz.
+    """
+    audio = np.concatenate([decode_audio(path, sampling_rate=RATE) for path in paths])
+    if min_duration > 0 and len(audio) < min_duration * RATE:
+        audio = np.tile(audio, int(np.ceil(min_duration * RATE / len(audio))))
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+class ClientStats:
+    """
+    Latencies measured by one simulated client.
+
+    Timestamps of the segments are stream positions. The wall clock time at which a stream position was sent is
+    known from the pace of the replay, so the lag of a segment is the time between sending the end of its audio
+    and receiving it.
+
+    Attributes:
+        connected (bool): Whether the server accepted the client.
+        error (str): Error or rejection message of the server, if any.
+        queued (bool): Whether the client waited in the admission queue.
+        time_to_ready (float): Seconds from connecting to SERVER_READY.
+        time_to_first_segment (float): Seconds from the first audio sent to the first segment with text.
+        partial_latencies (list): Lag of every partial segment update, in seconds.
+        final_lags (list): Lag of every committed segment, in seconds.
+        messages (int): Number of segment messages received.
+    """
+    def __init__(self):
+        self.connected = False
+        self.error = None
+        self.queued = False
+        self.time_to_ready = None
+        self.time_to_first_segment = None
+        self.partial_latencies = []
+        self.final_lags = []
+        self.messages = 0
+
+
+async def run_client(host, port, pcm, speed, options, chunk_seconds, drain_timeout):
+    """
+    Stream `pcm` to the server like a live client and measure the latency of the results.
+
+    Args:
+        host (str): Server host.
+        port (int): Server port.
+        pcm (bytes): 16-bit PCM to replay.
+        speed (float): Replay speed, 1 for real time.
+        options (dict): Handshake options, the uid is added.
+        chunk_seconds (float): Duration of the audio sent in every message.
+        drain_timeout (float): Seconds to wait for the last results after the end of the audio.
+
+    Returns:
+        ClientStats: The measurements of the client.
+    """
+    stats = ClientStats()
+    uid = str(uuid.uuid4())
+    encoder = get_audio_encoder(options.get("audio_encoding", "float32"))
+    chunk_bytes = int(chunk_seconds * RATE) * 2
+    audio_duration = len(pcm) / 2 / RATE
+    start = time.perf_counter()
+    stream_start = None
+    ready = asyncio.Event()
+    committed_ids = set()
+
+    def sent_at(position):
+        return stream_start + min(position, audio_duration) / speed
+
+    def record_segment(segment, latencies, now):
+        if not segment.get("text", "").strip():
+            return
+        if stats.time_to_first_segment is None:
+            stats.time_to_first_segment = now - stream_start
+        latencies.append(now - sent_at(float(segment["end"])))
+
+    async def receive(websocket):
+        async for message in websocket:
+            now = time.perf_counter()
+            message = json.loads(message)
+            status = message.get("status")
+            if status == "QUEUED":
+                stats.queued = True
+                continue
+            if status in ("WAIT", "ERROR"):
+                stats.error = f"{status}: {message.get('message')}"
+                ready.set()
+                return
+            if message.get("message") == "SERVER_READY":
+                stats.connected = True
+                stats.time_to_ready = now - start
+                ready.set()
+                continue
+            if stream_start is None:
+                continue
+            if "committed" in message:
+                stats.messages += 1
+                for segment in message["committed"]:
+                    if segment.get("id") in committed_ids:
+                        continue
+                    committed_ids.add(segment.get("id"))
+                    record_segment(segment, stats.final_lags, now)
+                if message.get("partial"):
+                    record_segment(message["partial"], stats.partial_latencies, now)
+            elif "segments" in message and message["segments"]:
+                # protocol version 1 only resends the last segments, the last one is the partial
+                stats.messages += 1
+                record_segment(message["segments"][-1], stats.partial_latencies, now)
+
+    try:
+        async with websockets.connect(f"ws://{host}:{port}", max_size=None) as websocket:
+            await websocket.send(json.dumps(dict(options, uid=uid)))
+            receiver = asyncio.ensure_future(receive(websocket))
+            await ready.wait()
+            if not stats.connected:
+                return stats
+
+            stream_start = time.perf_counter()
+            for offset in range(0, len(pcm), chunk_bytes):
+                chunk = pcm[offset:offset + chunk_bytes]
+                for message in encoder.encode(chunk):
+                    await websocket.send(message)
+                position = (offset + len(chunk)) / 2 / RATE
+                delay = sent_at(position) - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            try:
+                await asyncio.wait_for(asyncio.shield(receiver), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+            receiver.cancel()
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        stats.error = stats.error or str(e)
+    return stats
+
+
+class ProcessMonitor:
+    """
+    Samples the CPU time and resident memory of the server process and its children (e.g. the worker processes
+    started with `--workers`) from /proc, so it only works on Linux.
+
+    Attributes:
+        pid (int): Process id of the server.
+        interval (float): Seconds between two samples.
+        rss_samples (list): Total resident memory in bytes at every sample.
+    """
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.rss_samples = []
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.stopped = threading.Event()
+        self.thread = None
+        self.start_cpu = None
+        self.start_time = None
+
+    def processes(self):
+        """Returns the pid of the server and of all its descendants."""
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # the command name can contain spaces, the fields after it are fixed
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        pids, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+        return pids
+
+    def sample(self):
+        """Returns the total CPU seconds and resident memory in bytes of the processes."""
+        cpu_seconds, rss = 0.0, 0
+        for pid in self.processes():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as f:
+                    rss += int(f.read().split()[1]) * self.page_size
+            except (OSError, IndexError, ValueError):
+                continue
+            # utime and stime, fields 14 and 15 of the stat file
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / self.clock_ticks
+        return cpu_seconds, rss
+
+    def start(self):
+        self.start_cpu, rss = self.sample()
+        self.start_time = time.perf_counter()
+        self.rss_samples = [rss]
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.rss_samples.append(self.sample()[1])
+
+    def stop(self):
+        """
+        Returns:
+            dict: Average CPU usage in cores and peak resident memory in bytes since `start`.
+        """
+        self.stopped.set()
+        self.thread.join()
+        cpu_seconds, rss = self.sample()
+        self.rss_samples.append(rss)
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "cpu_cores": (cpu_seconds - self.start_cpu) / max(elapsed, 1e-6),
+            "peak_rss_bytes": max(self.rss_samples),
+        }
+
+
+class MetricsScraper:
+    """
+    Periodically scrapes the real-time factor of every client from the Prometheus endpoint of the server
+    (`run_server.py --metrics_port`).
+
+    Attributes:
+        url (str): URL of the metrics endpoint.
+        interval (float): Seconds between two scrapes.
+        rtf_samples (list): Real-time factors of all clients over all scrapes.
+    """
+    METRIC = "whisper_live_client_real_time_factor"
+
+    def __init__(self, url, interval=1.0):
+        self.url = url
+        self.interval = interval
+        self.rtf_samples = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def scrape(self):
+        try:
+            with urllib.request.urlopen(self.url, timeout=2) as response:
+                text = response.read().decode("utf-8")
+        except OSError:
+            return
+        for line in text.splitlines():
+            if line.startswith(self.METRIC + "{"):
+                value = float(line.rsplit(" ", 1)[1])
+                if value > 0:
+                    self.rtf_samples.append(value)
+
+    def start(self):
+        self.rtf_samples = []
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.scrape()
+
+    def stop(self):
+        """
+        Returns:
+            dict: Mean and maximum real-time factor of the clients, None without samples.
+        """
+        self.stopped.set()
+        self.thread.join()
+        if not self.rtf_samples:
+            return {"server_rtf_mean": None, "server_rtf_max": None}
+        return {
+            "server_rtf_mean": float(np.mean(self.rtf_samples)),
+            "server_rtf_max": float(np.max(self.rtf_samples)),
+        }
+
+
+def percentiles(values, quantiles=(50, 90, 99)):
+    """Returns the percentiles of `values` keyed by "p50", "p90"..., None without values."""
+    if not values:
+        return {f"p{q}": None for q in quantiles}
+    return {f"p{q}": float(v) for q, v in zip(quantiles, np.percentile(values, quantiles))}
+
+
+async def run_level(num_clients, args, pcm, options):
+    """Run `num_clients` concurrent clients, their connections spread over `args.ramp_up` seconds."""
+    async def delayed_client(i):
+        await asyncio.sleep(args.ramp_up * i / max(num_clients, 1))
+        return await run_client(
+            args.host, args.port, pcm, args.speed, options, args.chunk_seconds, args.drain_timeout
+        )
+
+    return await asyncio.gather(*(delayed_client(i) for i in range(num_clients)))
+
+
+def summarize(num_clients, results, elapsed, server_stats):
+    connected = [r for r in results if r.connected]
+    report = {
+        "clients": num_clients,
+        "connected": len(connected),
+        "queued": sum(r.queued for r in results),
+        "rejected": sum(r.error is not None and not r.connected for r in results),
+        "elapsed_seconds": elapsed,
+        "time_to_ready": percentiles([r.time_to_ready for r in connected]),
+        "time_to_first_segment": percentiles(
+            [r.time_to_first_segment for r in connected if r.time_to_first_segment is not None]
+        ),
+        "partial_latency": percentiles([v for r in connected for v in r.partial_latencies]),
+        "final_segment_lag": percentiles([v for r in connected for v in r.final_lags]),
+        "messages": sum(r.messages for r in connected),
+    }
+    report.update(server_stats)
+    if report.get("peak_rss_bytes") is not None and num_clients:
+        report["rss_bytes_per_client"] = report["peak_rss_bytes"] / num_clients
+    return report
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_report(reports):
+    header = (
+        f"{'clients':>7} {'ok':>4} {'ttfs p50':>9} {'ttfs p90':>9} {'partial p50':>12} {'partial p90':>12} "
+        f"{'partial p99':>12} {'final p50':>10} {'final p90':>10} {'rtf mean':>9} {'rtf max':>8} "
+        f"{'cpu':>6} {'rss MB':>8}"
+    )
+    print(header)
+    for r in reports:
+        rss = r.get("peak_rss_bytes")
+        cpu = r.get("cpu_cores")
+        print(
+            f"{r['clients']:>7} {r['connected']:>4} "
+            f"{format_seconds(r['time_to_first_segment']['p50']):>9} "
+            f"{format_seconds(r['time_to_first_segment']['p90']):>9} "
+            f"{format_seconds(r['partial_latency']['p50']):>12} "
+            f"{format_seconds(r['partial_latency']['p90']):>12} "
+            f"{format_seconds(r['partial_latency']['p99']):>12} "
+            f"{format_seconds(r['final_segment_lag']['p50']):>10} "
+            f"{format_seconds(r['final_segment_lag']['p90']):>10} "
+            f"{format_seconds(r.get('server_rtf_mean')):>9} "
+            f"{format_seconds(r.get('server_rtf_max')):>8} "
+            f"{'-' if cpu is None else f'{cpu:.2f}':>6} "
+            f"{'-' if rss is None else f'{rss / 2 ** 20:.0f}':>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream audio files from many simulated clients to a running server and report latencies."
+    )
+    parser.add_argument('--host', type=str, default="localhost")
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--audio', type=str, nargs='+', default=["tests/jfk.flac"],
+                        help="Audio files replayed by every client, one after the other")
+    parser.add_argument('--min_duration', type=float, default=60,
+                        help="Repeat the audio until it lasts at least this many seconds")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4],
+                        help="Numbers of concurrent clients, one run per number")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay speed, 1 for real time, 2 to send the audio twice as fast")
+    parser.add_argument('--chunk_seconds', type=float, default=0.1,
+                        help="Duration of the audio sent in every message")
+    parser.add_argument('--ramp_up', type=float, default=1.0,
+                        help="Seconds over which the clients of a run connect")
+    parser.add_argument('--drain_timeout', type=float, default=10.0,
+                        help="Seconds to wait for the last results after the end of the audio")
+    parser.add_argument('--model', type=str, default="small")
+    parser.add_argument('--lang', type=str, default="en")
+    parser.add_argument('--multilingual', action='store_true')
+    parser.add_argument('--audio_encoding', type=str, default="int16", choices=["float32", "int16", "opus"])
+    parser.add_argument('--protocol_version', type=int, default=2, choices=[1, 2])
+    parser.add_argument('--metrics_url', type=str, default=None,
+                        help="Prometheus endpoint of the server, e.g. http://localhost:9091/metrics, "
+                             "to report the real-time factor of the server")
+    parser.add_argument('--server_pid', type=int, default=None,
+                        help="Process id of the server, to report its CPU usage and memory (Linux only)")
+    parser.add_argument('--pause', type=float, default=5.0,
+                        help="Seconds between two runs, for the server to release the clients")
+    parser.add_argument('--output', type=str, default=None, help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    pcm = load_audio(args.audio, args.min_duration)
+    options = {
+        "multilingual": args.multilingual,
+        "language": args.lang,
+        "task": "transcribe",
+        "model_size": args.model,
+        "use_custom_model": False,
+        "audio_encoding": args.audio_encoding,
+        "protocol_version": args.protocol_version,
+    }
+    print(f"Replaying {len(pcm) / 2 / RATE:.1f}s of audio at {args.speed}x to ws://{args.host}:{args.port}")
+
+    reports = []
+    for i, num_clients in enumerate(args.clients):
+        if i > 0:
+            time.sleep(args.pause)
+        monitor = ProcessMonitor(args.server_pid) if args.server_pid else None
+        scraper = MetricsScraper(args.metrics_url) if args.metrics_url else None
+        for sampler in (monitor, scraper):
+            if sampler is not None:
+                sampler.start()
+
+        start = time.perf_counter()
+        results = asyncio.run(run_level(num_clients, args, pcm, options))
+        elapsed = time.perf_counter() - start
+
+        server_stats = {}
+        for sampler in (monitor, scraper):
+            if sampler is not None:
+                server_stats.update(sampler.stop())
+        for result in results:
+            if result.error:
+                print(f"[WARN]: {result.error}")
+        reports.append(summarize(num_clients, results, elapsed, server_stats))
+
+    print_report(reports)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "runs": reports}, f, indent=2)
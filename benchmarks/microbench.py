@@ -0,0 +1,381 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from types import SimpleNamespace
+
+import numpy as np
+import ctranslate2
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from whisper_live.transcriber import Segment, TranscriptionOptions, WhisperModel
+
+RATE = 16000
+# token ids of the multilingual Whisper vocabulary
+EOT = 50257
+SOT = 50258
+SOT_PREV = 50361
+NO_TIMESTAMPS = 50363
+TIMESTAMP_BEGIN = 50364
+
+
+class StandInWhisper:
+    """
+    CTranslate2 compatible stand-in for `ctranslate2.models.Whisper`, returning fixed results of realistic shape
+    without running a network, so that the time spent around the model can be measured without real weights.
+
+    Attributes:
+        d_model (int): Width of the encoder output, 768 for the small model.
+        segments_per_window (int): Number of timestamped segments decoded per window.
+        tokens_per_segment (int): Number of text tokens per segment.
+        failing_temperatures (int): Number of temperatures, starting from the first, whose result fails the log
+                                    probability threshold so that the fallback is exercised.
+        delay (float): Seconds slept by every `encode`, `generate` and `align` call to simulate the model.
+    """
+    is_multilingual = False
+    device = "cpu"
+    device_index = [0]
+
+    def __init__(self, d_model=768, segments_per_window=4, tokens_per_segment=12, failing_temperatures=0, delay=0.0):
+        self.d_model = d_model
+        self.segments_per_window = segments_per_window
+        self.tokens_per_segment = tokens_per_segment
+        self.failing_temperatures = failing_temperatures
+        self.delay = delay
+        self.calls = 0
+
+    def window_tokens(self):
+        """Returns the tokens of a window: segments of text tokens between timestamp tokens."""
+        tokens = []
+        step = 1400 // self.segments_per_window
+        for i in range(self.segments_per_window):
+            tokens.append(TIMESTAMP_BEGIN + i * step)
+            tokens.extend(1000 + (i * self.tokens_per_segment + j) % 5000 for j in range(self.tokens_per_segment))
+            tokens.append(TIMESTAMP_BEGIN + (i + 1) * step - 10)
+        return tokens
+
+    def encode(self, features, to_cpu=False):
+        if self.delay:
+            time.sleep(self.delay)
+        batch_size = np.asarray(features).shape[0]
+        return ctranslate2.StorageView.from_array(np.zeros((batch_size, 1500, self.d_model), dtype=np.float32))
+
+    def generate(self, encoder_output, prompts, sampling_temperature=0.0, asynchronous=False, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        self.calls += 1
+        fails = self.calls <= self.failing_temperatures
+        tokens = self.window_tokens()
+        results = [
+            SimpleNamespace(
+                sequences_ids=[list(tokens)],
+                scores=[-2.0 if fails else -0.1],
+                no_speech_prob=0.01,
+            )
+            for _ in prompts
+        ]
+        if asynchronous:
+            return [SimpleNamespace(result=lambda result=result: result) for result in results]
+        return results
+
+    def align(self, encoder_output, start_sequence, text_tokens, num_frames, median_filter_width=7):
+        if self.delay:
+            time.sleep(self.delay)
+        results = []
+        for tokens in text_tokens:
+            n = len(tokens) + 1
+            n_frames = max(num_frames // 2, n)
+            # monotonic path over the frames, one text index after the other
+            alignments = [(i * n // n_frames, i) for i in range(n_frames)]
+            results.append(SimpleNamespace(alignments=alignments, text_token_probs=[0.9] * n))
+        return results
+
+    def detect_language(self, encoder_output):
+        return [[("<|en|>", 1.0)]]
+
+
+def make_vocabulary(size=5000, seed=0):
+    """Returns random words, so that decoded text compresses like natural text and passes the fallback checks."""
+    random = np.random.RandomState(seed)
+    letters = np.array(list("etaoinshrdlucmfwypvbgkjqxz"))
+    return [" " + "".join(random.choice(letters, size=random.randint(2, 9))) for _ in range(size)]
+
+
+class StandInTokenizer:
+    """Stand-in for `faster_whisper.tokenizer.Tokenizer` with an English-like vocabulary of one word per token."""
+    VOCABULARY = make_vocabulary()
+    eot = EOT
+    sot = SOT
+    sot_prev = SOT_PREV
+    no_timestamps = NO_TIMESTAMPS
+    timestamp_begin = TIMESTAMP_BEGIN
+    sot_sequence = [SOT]
+
+    def encode(self, text):
+        return [1000 + len(word) for word in text.split()]
+
+    def decode(self, tokens):
+        return "".join(self.VOCABULARY[token % len(self.VOCABULARY)] for token in tokens if token < EOT)
+
+    def split_to_word_tokens(self, tokens):
+        words = [self.VOCABULARY[token % len(self.VOCABULARY)] if token < EOT else "" for token in tokens]
+        return words, [[token] for token in tokens]
+
+
+class NullWebSocket:
+    def send(self, message):
+        pass
+
+
+class StandInPool:
+    def __init__(self, transcriber):
+        self.transcriber = transcriber
+
+    def acquire(self, *args, **kwargs):
+        return self.transcriber
+
+    def release(self, transcriber):
+        pass
+
+
+def make_transcriber(model):
+    """Returns a `WhisperModel` running on `model` instead of a CTranslate2 model loaded from disk."""
+    return WhisperModel.from_model(model)
+
+
+def make_options(**kwargs):
+    """Returns the `TranscriptionOptions` of `WhisperModel.transcribe` with its default arguments."""
+    options = dict(
+        beam_size=5,
+        best_of=5,
+        patience=1,
+        length_penalty=1,
+        repetition_penalty=1,
+        no_repeat_ngram_size=0,
+        log_prob_threshold=-1.0,
+        no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4,
+        condition_on_previous_text=True,
+        prompt_reset_on_temperature=0.5,
+        temperatures=[0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        initial_prompt=None,
+        prefix=None,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+        without_timestamps=False,
+        max_initial_timestamp=1.0,
+        word_timestamps=False,
+        prepend_punctuations="\"'“¿([{-",
+        append_punctuations="\"'.。,，!！?？:：”)]}、",
+        fallback_budget=None,
+        parallel_fallback=False,
+        tracer=None,
+    )
+    options.update(kwargs)
+    return TranscriptionOptions(**options)
+
+
+def measure(fn, setup=None, min_time=0.5, min_runs=5):
+    """
+    Time `fn` until it ran for at least `min_time` seconds and `min_runs` times.
+
+    Args:
+        fn (callable): The code to time, called without arguments.
+        setup (callable, optional): Called before every run, outside of the timing.
+        min_time (float, optional): Minimum total measured time in seconds. Defaults to 0.5.
+        min_runs (int, optional): Minimum number of runs. Defaults to 5.
+
+    Returns:
+        dict: Number of runs and the median, mean, 90th percentile and minimum duration in milliseconds.
+    """
+    fn()  # warm up caches and lazily loaded models
+    durations = []
+    while sum(durations) < min_time or len(durations) < min_runs:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations = np.array(durations) * 1000
+    return {
+        "runs": len(durations),
+        "median_ms": float(np.median(durations)),
+        "mean_ms": float(np.mean(durations)),
+        "p90_ms": float(np.percentile(durations, 90)),
+        "min_ms": float(np.min(durations)),
+    }
+
+
+def get_benchmarks(audio, args):
+    """
+    Returns the benchmarks by name. Each benchmark is a `(fn, setup)` pair working on one 30 second window.
+    """
+    window = audio[: RATE * 30]
+    tokenizer = StandInTokenizer()
+    model = StandInWhisper(d_model=args.d_model, delay=args.model_delay)
+    transcriber = make_transcriber(model)
+    features = transcriber.feature_extractor(window)
+    window_features = features[:, : transcriber.feature_extractor.nb_max_frames]
+    encoder_output = transcriber.encode(window_features)
+    prompt = transcriber.get_prompt(tokenizer, [])
+    options = make_options()
+    vad_options = VadOptions()
+
+    fallback_model = StandInWhisper(d_model=args.d_model, delay=args.model_delay)
+    fallback_transcriber = make_transcriber(fallback_model)
+
+    def reset_fallback():
+        fallback_model.calls = 0
+        fallback_model.failing_temperatures = 2
+
+    def window_segments():
+        tokens = model.window_tokens()
+        segments = []
+        for i in range(0, len(tokens), model.tokens_per_segment + 2):
+            sliced = tokens[i:i + model.tokens_per_segment + 2]
+            segments.append(dict(
+                seek=0,
+                start=(sliced[0] - TIMESTAMP_BEGIN) * 0.02,
+                end=(sliced[-1] - TIMESTAMP_BEGIN) * 0.02,
+                tokens=sliced,
+            ))
+        return segments
+
+    from whisper_live.server import ServeClient
+
+    client = ServeClient(
+        NullWebSocket(),
+        client_uid="bench",
+        model_pool=StandInPool(transcriber),
+        start_thread=False,
+    )
+    frame = window[:4096].astype(np.float32)
+    segments = [
+        Segment(
+            id=i, seek=0, start=i * 2.0, end=i * 2.0 + 1.8, text=f" segment number {i} of the window",
+            tokens=[], temperature=0.0, avg_logprob=-0.1, compression_ratio=1.2, no_speech_prob=0.01, words=None,
+        )
+        for i in range(4)
+    ]
+
+    def reset_client():
+        client.transcript = []
+        client.text = []
+
+    return {
+        "vad": (lambda: get_speech_timestamps(window, vad_options), None),
+        "feature_extractor": (lambda: transcriber.feature_extractor(window), None),
+        "encode": (lambda: transcriber.encode(window_features), None),
+        "generate_with_fallback": (
+            lambda: transcriber.generate_with_fallback(encoder_output, prompt, tokenizer, options), None
+        ),
+        "generate_with_fallback_3_temperatures": (
+            lambda: fallback_transcriber.generate_with_fallback(encoder_output, prompt, tokenizer, options),
+            reset_fallback,
+        ),
+        "generate_segments": (
+            lambda: transcriber.generate_segments(features, tokenizer, options, encoder_output), None
+        ),
+        "add_word_timestamps": (
+            lambda: transcriber.add_word_timestamps(
+                window_segments(),
+                tokenizer,
+                encoder_output,
+                transcriber.feature_extractor.nb_max_frames,
+                options.prepend_punctuations,
+                options.append_punctuations,
+                last_speech_timestamp=0.0,
+            ),
+            None,
+        ),
+        "serve_client_add_frames": (lambda: client.add_frames(frame), None),
+        "serve_client_update_segments": (lambda: client.update_segments(segments, 30.0), reset_client),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the median of every benchmark next to its baseline.
+
+    Returns:
+        list: Names of the benchmarks slower than `threshold` times their baseline.
+    """
+    regressions = []
+    print(f"{'benchmark':<40} {'median ms':>10} {'baseline':>10} {'ratio':>7}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<40} {result['median_ms']:>10.3f} {'-':>10} {'-':>7}")
+            continue
+        ratio = result["median_ms"] / max(base["median_ms"], 1e-9)
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  slower"
+        print(f"{name:<40} {result['median_ms']:>10.3f} {base['median_ms']:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the stages of a transcription pass on one 30 second window, with a stand-in model."
+    )
+    parser.add_argument('--audio', type=str, default="tests/jfk.flac",
+                        help="Audio file, repeated to fill a 30 second window")
+    parser.add_argument('--benchmarks', type=str, nargs='+', default=None,
+                        help="Names of the benchmarks to run, all by default")
+    parser.add_argument('--min_time', type=float, default=0.5,
+                        help="Minimum seconds spent measuring each benchmark")
+    parser.add_argument('--d_model', type=int, default=768,
+                        help="Width of the stand-in encoder output, 768 for the small model")
+    parser.add_argument('--model_delay', type=float, default=0.0,
+                        help="Seconds slept by every call to the stand-in model")
+    parser.add_argument('--output', type=str, default=None, help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', type=str, default=None, help="Results of a previous run to compare with")
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help="Ratio to the baseline median above which a benchmark counts as a regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    audio = decode_audio(args.audio, sampling_rate=RATE)
+    audio = np.tile(audio, int(np.ceil(RATE * 30 / len(audio))))
+
+    benchmarks = get_benchmarks(audio, args)
+    names = args.benchmarks or list(benchmarks)
+    unknown = [name for name in names if name not in benchmarks]
+    if unknown:
+        parser.error(f"Unknown benchmarks {unknown}. Available choices: {list(benchmarks)}")
+
+    results = {}
+    for name in names:
+        fn, setup = benchmarks[name]
+        results[name] = measure(fn, setup, min_time=args.min_time)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "ctranslate2": ctranslate2.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "options": vars(args),
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
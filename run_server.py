@@ -1,13 +1,123 @@
+import os
 import argparse
-from whisper_live.server import TranscriptionServer
+from whisper_live.server import COMMIT_POLICIES, TranscriptionServer
+from whisper_live.model_pool import ModelPool
+from whisper_live.workers import WorkerPool
 
 if __name__ == "__main__":
-    server = TranscriptionServer()
     parser = argparse.ArgumentParser()
     parser.add_argument('--model_path', type=str, default=None, help="Custom Faster Whisper Model")
+    parser.add_argument('--max_idle_models', type=int, default=2,
+                        help="Number of unused models kept loaded for future clients")
+    parser.add_argument('--model_idle_ttl', type=float, default=600,
+                        help="Seconds after which an unused model is unloaded")
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help="Number of clients that can run inference on the same model in parallel")
+    parser.add_argument('--batch_inference', action='store_true',
+                        help="Batch the encoder and decoder calls of all connected clients")
+    parser.add_argument('--max_batch_size', type=int, default=8, help="Maximum inference batch size")
+    parser.add_argument('--max_batch_wait', type=float, default=0.01,
+                        help="Maximum time in seconds a call waits for other clients to batch with")
+    parser.add_argument('--asyncio', action='store_true',
+                        help="Serve clients on an asyncio event loop instead of a thread per connection")
+    parser.add_argument('--inference_workers', type=int, default=4,
+                        help="Number of concurrent transcription passes when using --asyncio")
+    parser.add_argument('--max_clients', type=int, default=4,
+                        help="Number of clients transcribed at the same time")
+    parser.add_argument('--max_connection_time', type=int, default=600,
+                        help="Seconds after which a client is disconnected")
+    parser.add_argument('--max_queue_size', type=int, default=16,
+                        help="Number of clients that can wait for a free slot while the server is full")
+    parser.add_argument('--queue_timeout', type=float, default=600,
+                        help="Seconds a client waits in the queue before being asked to come back later")
+    parser.add_argument('--metrics_port', type=int, default=None,
+                        help="Serve Prometheus metrics on this port at /metrics, including the metrics reported by "
+                             "the --workers processes")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Run client sessions in this many worker processes, each with its own models")
+    parser.add_argument('--worker_cpu_threads', type=int, default=None,
+                        help="CTranslate2 threads per model in each worker, defaults to the cores divided by --workers")
+    parser.add_argument('--preload', type=str, nargs='+', default=[],
+                        help="Models to load at startup, as requested by clients, e.g. small.en for "
+                             "English-only clients of the small model")
+    parser.add_argument('--warmup_audio', type=str, default=None,
+                        help="Audio file transcribed once by every preloaded model, e.g. tests/jfk.flac")
+    parser.add_argument('--offline', action='store_true',
+                        help="Only use models already downloaded, never access the network")
+    parser.add_argument('--disable_adaptive_decoding', action='store_true',
+                        help="Always decode with beam search and all fallback temperatures, even when the server "
+                             "falls behind real time")
+    parser.add_argument('--fallback_budget', type=float, default=1.0,
+                        help="Maximum seconds spent on the temperature fallback of one window, 0 for no limit")
+    parser.add_argument('--parallel_fallback', action='store_true',
+                        help="Submit the fallback temperatures of a window at once, decoded concurrently by the "
+                             "--num_workers workers of the model")
+    parser.add_argument('--commit_policy', type=str, default="local_agreement", choices=COMMIT_POLICIES,
+                        help="How the text of the last segment is committed: local_agreement commits the words two "
+                             "consecutive passes agree on, repetition waits until the whole segment was repeated "
+                             "by more than 5 passes")
+    parser.add_argument('--disable_forced_prefix', action='store_true',
+                        help="Decode the whole window on every pass, instead of forcing the tokens the last two "
+                             "passes agree on as the decoder prefix")
     args = parser.parse_args()
+    fallback_budget = args.fallback_budget if args.fallback_budget > 0 else None
+
+    if args.offline:
+        # inherited by worker processes, which import huggingface_hub after this point
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    model_pool = ModelPool(
+        max_idle_models=args.max_idle_models,
+        idle_ttl=args.model_idle_ttl,
+        num_workers=args.num_workers,
+        local_files_only=args.offline,
+    )
+    worker_pool = None
+    if args.workers > 0:
+        worker_pool = WorkerPool(
+            num_workers=args.workers,
+            cpu_threads=args.worker_cpu_threads,
+            model_pool_options=dict(
+                max_idle_models=args.max_idle_models,
+                idle_ttl=args.model_idle_ttl,
+                num_workers=args.num_workers,
+                local_files_only=args.offline,
+            ),
+            preload=args.preload,
+            warmup_audio=args.warmup_audio,
+            server_options=dict(
+                batch_inference=args.batch_inference,
+                max_batch_size=args.max_batch_size,
+                max_batch_wait=args.max_batch_wait,
+                adaptive_decoding=not args.disable_adaptive_decoding,
+                fallback_budget=fallback_budget,
+                parallel_fallback=args.parallel_fallback,
+                commit_policy=args.commit_policy,
+                forced_prefix=not args.disable_forced_prefix,
+            ),
+        )
+    server = TranscriptionServer(
+        model_pool=model_pool,
+        batch_inference=args.batch_inference,
+        max_batch_size=args.max_batch_size,
+        max_batch_wait=args.max_batch_wait,
+        max_clients=args.max_clients,
+        max_connection_time=args.max_connection_time,
+        max_queue_size=args.max_queue_size,
+        queue_timeout=args.queue_timeout,
+        worker_pool=worker_pool,
+        adaptive_decoding=not args.disable_adaptive_decoding,
+        fallback_budget=fallback_budget,
+        parallel_fallback=args.parallel_fallback,
+        commit_policy=args.commit_policy,
+        forced_prefix=not args.disable_forced_prefix,
+    )
+    server.preload(args.preload, warmup_audio=args.warmup_audio)
     server.run(
         "0.0.0.0",
         9090,
-        custom_model_path=args.model_path
+        custom_model_path=args.model_path,
+        use_asyncio=args.asyncio,
+        inference_workers=args.inference_workers,
+        metrics_port=args.metrics_port,
     )
@@ -50,5 +50,11 @@ setup(name="whisper-live",
         "scipy",
         "websocket-client",
       ],
+      extras_require={
+        "opus": ["opuslib"],
+      },
+      entry_points={
+        "console_scripts": ["whisper_live=whisper_live.__main__:main"],
+      },
       python_requires=">=3.8"
 )
@@ -0,0 +1,124 @@
+import json
+import time
+import threading
+import unittest
+
+from whisper_live.server import AdmissionQueue, TranscriptionServer
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.messages = []
+        self.closed = False
+
+    def send(self, message):
+        self.messages.append(json.loads(message))
+
+    def close(self):
+        self.closed = True
+
+
+class AdmissionQueueTest(unittest.TestCase):
+    def test_waiting_connections_are_admitted_in_arrival_order(self):
+        admission = AdmissionQueue(max_clients=1, max_size=2)
+        self.assertTrue(admission.try_acquire(object()))
+        first, second, third = object(), object(), object()
+        self.assertTrue(admission.enqueue(first))
+        self.assertTrue(admission.enqueue(second))
+        self.assertFalse(admission.enqueue(third))
+        self.assertEqual(admission.position(second), 2)
+
+        self.assertFalse(admission.try_acquire(first))
+        admission.release()
+        # a free slot goes to the head of the queue only
+        self.assertFalse(admission.try_acquire(second))
+        self.assertTrue(admission.try_acquire(first))
+        self.assertEqual(admission.position(second), 1)
+        admission.release()
+        self.assertTrue(admission.try_acquire(second))
+        self.assertEqual(len(admission.waiting), 0)
+
+    def test_leaving_lets_the_next_connection_in(self):
+        admission = AdmissionQueue(max_clients=1)
+        admission.try_acquire(object())
+        first, second = object(), object()
+        admission.enqueue(first)
+        admission.enqueue(second)
+        admission.release()
+        admission.leave(first)
+        self.assertTrue(admission.try_acquire(second))
+
+    def test_release_before_wait_is_not_missed(self):
+        admission = AdmissionQueue(max_clients=1)
+        admission.try_acquire(object())
+        ticket = object()
+        admission.enqueue(ticket)
+        self.assertFalse(admission.try_acquire(ticket))
+        admission.release()
+        start = time.monotonic()
+        self.assertTrue(admission.wait(ticket, 5))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertTrue(admission.try_acquire(ticket))
+
+    def test_waiting_connections_wake_up_when_the_queue_moves(self):
+        admission = AdmissionQueue(max_clients=1)
+        admission.try_acquire(object())
+        first, second = object(), object()
+        admission.enqueue(first)
+        admission.enqueue(second)
+        woken = []
+        thread = threading.Thread(target=lambda: woken.append(admission.wait(second, 5)))
+        thread.start()
+        time.sleep(0.1)
+        admission.release()
+        self.assertTrue(admission.try_acquire(first))
+        thread.join(timeout=1)
+        self.assertFalse(thread.is_alive())
+        # the second connection moved to the head, but no slot is free
+        self.assertEqual(woken, [False])
+        self.assertEqual(admission.position(second), 1)
+
+
+class WaitForSlotTest(unittest.TestCase):
+    def make_server(self, timeout):
+        server = TranscriptionServer(max_clients=1, queue_timeout=timeout)
+        server.queue_update_interval = 0.05
+        self.assertTrue(server.admission.try_acquire(object()))
+        return server
+
+    def test_queued_connection_times_out(self):
+        server = self.make_server(timeout=0.2)
+        websocket = RecordingWebSocket()
+        self.assertFalse(server.wait_for_slot(websocket, "a"))
+        self.assertEqual(websocket.messages[0]["status"], "QUEUED")
+        self.assertEqual(websocket.messages[0]["position"], 1)
+        self.assertEqual(websocket.messages[-1]["status"], "WAIT")
+        self.assertTrue(websocket.closed)
+        self.assertEqual(len(server.admission.waiting), 0)
+
+    def test_queued_connections_get_freed_slots_in_order(self):
+        server = self.make_server(timeout=10)
+        admitted = []
+        threads = []
+        for uid in ("a", "b"):
+            websocket = RecordingWebSocket()
+            thread = threading.Thread(
+                target=lambda uid=uid, websocket=websocket: server.wait_for_slot(websocket, uid) and admitted.append(uid)
+            )
+            thread.start()
+            threads.append(thread)
+            while len(server.admission.waiting) < len(threads):
+                time.sleep(0.01)
+
+        for i in range(len(threads)):
+            server.admission.release()
+            deadline = time.monotonic() + 5
+            while len(admitted) <= i and time.monotonic() < deadline:
+                time.sleep(0.01)
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(admitted, ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from whisper_live.audio_buffer import AudioRingBuffer, SharedAudioRingBuffer
+
+
+class AudioRingBufferTest(unittest.TestCase):
+    def test_views_across_the_wraparound(self):
+        buffer = AudioRingBuffer(10)
+        stream = np.arange(37, dtype=np.float32)
+        for i in range(0, len(stream), 3):
+            buffer.append(stream[i:i + 3])
+            self.assertEqual(buffer.end, min(i + 3, len(stream)))
+            self.assertEqual(buffer.start, max(0, buffer.end - 10))
+            np.testing.assert_array_equal(buffer.view(buffer.start), stream[buffer.start:buffer.end])
+
+        # any retained range is contiguous, including ranges crossing the end of the storage
+        for start in range(buffer.start, buffer.end):
+            for end in range(start, buffer.end + 1):
+                np.testing.assert_array_equal(buffer.view(start, end), stream[start:end])
+
+    def test_append_longer_than_capacity(self):
+        buffer = AudioRingBuffer(8)
+        buffer.append(np.arange(3, dtype=np.float32))
+        buffer.append(np.arange(3, 23, dtype=np.float32))
+        self.assertEqual(buffer.end, 23)
+        self.assertEqual(len(buffer), 8)
+        np.testing.assert_array_equal(buffer.view(15), np.arange(15, 23))
+
+    def test_overwritten_samples_are_not_available(self):
+        buffer = AudioRingBuffer(10)
+        buffer.append(np.zeros(25, dtype=np.float32))
+        self.assertFalse(buffer.is_retained(14))
+        self.assertTrue(buffer.is_retained(15))
+        with self.assertRaises(ValueError):
+            buffer.view(14, 20)
+        with self.assertRaises(ValueError):
+            buffer.view(20, 26)
+
+
+class SharedAudioRingBufferTest(unittest.TestCase):
+    def test_readers_see_the_writes(self):
+        writer = SharedAudioRingBuffer(10)
+        reader = SharedAudioRingBuffer(10, name=writer.name)
+        try:
+            stream = np.arange(24, dtype=np.float32)
+            writer.append(stream[:7])
+            writer.append(stream[7:])
+            self.assertEqual(reader.end, 24)
+            np.testing.assert_array_equal(reader.view(reader.start), stream[14:])
+        finally:
+            reader.close()
+            writer.close(unlink=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
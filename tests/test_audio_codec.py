@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from whisper_live.audio_codec import (
+    OPUS_FRAME_SAMPLES,
+    get_audio_decoder,
+    get_audio_encoder,
+    join_opus_packets,
+    load_opuslib,
+    split_opus_packets,
+)
+
+
+def make_pcm(n_samples, seed=0):
+    """Returns 16-bit PCM of a tone with some noise."""
+    random = np.random.RandomState(seed)
+    t = np.arange(n_samples) / 16000
+    signal = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.01 * random.randn(n_samples)
+    return (signal * 32767).astype(np.int16).tobytes()
+
+
+class AudioCodecTest(unittest.TestCase):
+    def roundtrip(self, encoding, pcm, chunk_bytes=1000):
+        encoder = get_audio_encoder(encoding)
+        decoder = get_audio_decoder(encoding)
+        decoded = [
+            decoder.decode(message)
+            for i in range(0, len(pcm), chunk_bytes)
+            for message in encoder.encode(pcm[i:i + chunk_bytes])
+        ]
+        return np.concatenate(decoded)
+
+    def test_float32_and_int16_are_lossless(self):
+        pcm = make_pcm(16000)
+        expected = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        for encoding in ("float32", "int16"):
+            decoded = self.roundtrip(encoding, pcm)
+            self.assertEqual(decoded.dtype, np.float32)
+            np.testing.assert_array_equal(decoded, expected)
+
+    def test_int16_is_half_the_size_of_float32(self):
+        pcm = make_pcm(1600)
+        self.assertEqual(len(get_audio_encoder("int16").encode(pcm)[0]), 3200)
+        self.assertEqual(len(get_audio_encoder("float32").encode(pcm)[0]), 6400)
+
+    def test_opus_packet_framing(self):
+        packets = [b"", b"\x01", bytes(range(200)) * 2]
+        data = join_opus_packets(packets)
+        self.assertEqual(split_opus_packets(data), packets)
+        with self.assertRaises(ValueError):
+            split_opus_packets(data[:-1])
+        with self.assertRaises(ValueError):
+            split_opus_packets(b"\x05")
+
+    def test_opus_roundtrip(self):
+        try:
+            load_opuslib()
+        except ImportError:
+            self.skipTest("opuslib is not installed")
+        pcm = make_pcm(16000)
+        decoded = self.roundtrip("opus", pcm)
+        # samples that do not fill a whole frame wait for the next call
+        self.assertEqual(len(decoded), 16000 // OPUS_FRAME_SAMPLES * OPUS_FRAME_SAMPLES)
+        expected = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        # lossy, but the energy of the signal is preserved
+        self.assertAlmostEqual(float(np.std(decoded[1600:])), float(np.std(expected[1600:len(decoded)])), delta=0.05)
+
+    def test_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            get_audio_decoder("mp3")
+        with self.assertRaises(ValueError):
+            get_audio_encoder("mp3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from whisper_live.batch import find_audio_files, get_cache_key
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_key_depends_on_content_and_options(self):
+        options = {"model": "small", "device": "cpu", "compute_type": "default", "beam_size": 5}
+        key = get_cache_key("abc", options)
+        self.assertEqual(key, get_cache_key("abc", dict(reversed(list(options.items())))))
+        self.assertNotEqual(key, get_cache_key("abd", options))
+        self.assertNotEqual(key, get_cache_key("abc", dict(options, device="cuda")))
+        self.assertNotEqual(key, get_cache_key("abc", dict(options, beam_size=1)))
+
+
+class FindAudioFilesTest(unittest.TestCase):
+    def test_outputs_of_files_with_the_same_name_do_not_collide(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = []
+            for directory in ("a", "b", os.path.join("c", "d")):
+                os.makedirs(os.path.join(root, directory))
+                paths.append(os.path.join(root, directory, "talk.wav"))
+                open(paths[-1], "wb").close()
+            open(os.path.join(root, "c", "notes.txt"), "wb").close()
+
+            files = find_audio_files([paths[0], paths[1], os.path.join(root, "c")])
+            self.assertEqual(files, [
+                (paths[0], "talk.wav"),
+                (paths[1], "talk-1.wav"),
+                (paths[2], os.path.join("d", "talk.wav")),
+            ])
+
+            # a file listed twice is transcribed once
+            self.assertEqual(find_audio_files([paths[0], paths[0]]), [(paths[0], "talk.wav")])
+
+
+if __name__ == "__main__":
+    unittest.main()
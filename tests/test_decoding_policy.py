@@ -0,0 +1,50 @@
+import unittest
+
+from whisper_live.decoding_policy import DecodingPolicy
+
+
+class DecodingPolicyTest(unittest.TestCase):
+    def test_steady_state_keeps_best_quality(self):
+        # back to back passes over the audio that arrived during the previous pass
+        policy = DecodingPolicy()
+        for i in range(200):
+            rtf = 1.05 if i % 2 else 0.95
+            self.assertEqual(policy.update(rtf, 0.8), 0)
+
+    def test_growing_backlog_degrades(self):
+        policy = DecodingPolicy()
+        backlog = 0.3
+        levels = []
+        for _ in range(12):
+            levels.append(policy.update(1.3, backlog))
+            backlog *= 1.3
+        self.assertEqual(levels[:policy.degrade_passes - 1], [0] * (policy.degrade_passes - 1))
+        self.assertGreater(levels[-1], 0)
+
+    def test_large_backlog_degrades(self):
+        policy = DecodingPolicy()
+        for _ in range(10):
+            policy.update(1.0, 6.0)
+        self.assertGreater(policy.level, 0)
+
+    def test_quality_is_restored(self):
+        policy = DecodingPolicy()
+        for _ in range(30):
+            policy.update(1.0, 8.0)
+        self.assertEqual(policy.level, len(DecodingPolicy.LEVELS) - 1)
+        for _ in range(200):
+            policy.update(1.0, 0.5)
+        self.assertEqual(policy.level, 0)
+
+    def test_options_drop_word_timestamps(self):
+        policy = DecodingPolicy()
+        self.assertTrue(policy.options(word_timestamps=True)["word_timestamps"])
+        self.assertFalse(policy.options(word_timestamps=False)["word_timestamps"])
+        policy.set_level(2)
+        options = policy.options(word_timestamps=True)
+        self.assertFalse(options["word_timestamps"])
+        self.assertEqual(options["beam_size"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import unittest
+
+import numpy as np
+from faster_whisper.audio import decode_audio
+from faster_whisper.feature_extractor import FeatureExtractor
+from faster_whisper.vad import collect_chunks
+
+from whisper_live.audio_buffer import AudioRingBuffer
+from whisper_live.features import StreamingFeatureExtractor, collect_log_mel_chunks, pad_log_mel
+
+
+JFK_PATH = os.path.join(os.path.dirname(__file__), "jfk.flac")
+
+
+class TestStreamingFeatureExtractor(unittest.TestCase):
+    def setUp(self):
+        self.feature_extractor = FeatureExtractor()
+        self.hop_length = self.feature_extractor.hop_length
+        self.audio = decode_audio(JFK_PATH)
+        self.buffer = AudioRingBuffer(len(self.audio))
+        self.features = StreamingFeatureExtractor(self.feature_extractor, self.buffer.capacity)
+
+    def get_features(self, log_mel, n_samples):
+        return pad_log_mel(log_mel, n_samples // self.hop_length + self.feature_extractor.nb_max_frames)
+
+    def test_growing_stream_matches_feature_extractor(self):
+        rng = np.random.default_rng(0)
+        end = 0
+        while end < len(self.audio):
+            size = int(rng.integers(500, 9000))
+            self.buffer.append(self.audio[end:end + size])
+            end = min(end + size, len(self.audio))
+
+            log_mel = self.features.get_log_mel(self.buffer, 0, end)
+
+            expected = self.feature_extractor(self.audio[:end])
+            np.testing.assert_allclose(self.get_features(log_mel, end), expected, atol=1e-4)
+
+    def test_window_after_offset_matches_feature_extractor(self):
+        self.buffer.append(self.audio)
+        self.features.get_log_mel(self.buffer, 0, len(self.audio) // 2)
+        start = self.features.align(len(self.audio) // 3 + 77)
+
+        log_mel = self.features.get_log_mel(self.buffer, start, len(self.audio))
+
+        expected = self.feature_extractor(self.audio[start:])
+        actual = self.get_features(log_mel, len(self.audio) - start)
+        # the first frames see the audio before the window instead of its reflection
+        edge = self.feature_extractor.n_fft // (2 * self.hop_length) + 1
+        np.testing.assert_allclose(actual[:, edge:], expected[:, edge:], atol=1e-4)
+
+    def test_speech_chunks_match_collected_audio(self):
+        self.buffer.append(self.audio)
+        n_samples = len(self.audio)
+        log_mel = self.features.get_log_mel(self.buffer, 0, n_samples)
+        chunks = [
+            {"start": 3200, "end": 48000},
+            {"start": 64000, "end": 112000},
+            {"start": 128160, "end": n_samples},
+        ]
+
+        actual = self.get_features(
+            collect_log_mel_chunks(log_mel, chunks, self.hop_length, n_samples=n_samples),
+            sum(chunk["end"] - chunk["start"] for chunk in chunks),
+        )
+
+        expected = self.feature_extractor(collect_chunks(self.audio, chunks))
+        self.assertEqual(actual.shape, expected.shape)
+        # frames around the junctions see the audio next to the chunks instead of the next chunk
+        edge = self.feature_extractor.n_fft // (2 * self.hop_length) + 1
+        frame = 0
+        junctions = []
+        for chunk in chunks:
+            frame += (chunk["end"] - chunk["start"]) // self.hop_length
+            junctions.append(frame)
+        mask = np.ones(expected.shape[1], dtype=bool)
+        mask[:edge] = False
+        for junction in junctions[:-1]:
+            mask[junction - edge:junction + edge] = False
+        np.testing.assert_allclose(actual[:, mask], expected[:, mask], atol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from whisper_live.metrics import MetricsRegistry, ServerMetrics
+
+
+class RemoteMetricsTest(unittest.TestCase):
+    def test_remote_values_are_summed(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("sent_total", "Sent.", ("type",))
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        counter.inc(2, type="partial")
+        histogram.observe(0.05)
+
+        worker = MetricsRegistry()
+        worker_counter = worker.counter("sent_total", "Sent.", ("type",))
+        worker_histogram = worker.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        worker_counter.inc(3, type="partial")
+        worker_counter.inc(1, type="final")
+        worker_histogram.observe(0.5)
+        registry.set_remote(1234, worker.snapshot())
+
+        text = registry.render()
+        self.assertIn('sent_total{type="partial"} 5.0', text)
+        self.assertIn('sent_total{type="final"} 1.0', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1.0', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2.0', text)
+        self.assertIn("latency_seconds_count 2.0", text)
+        # the local values are left untouched
+        self.assertEqual(counter.values[("partial",)], 2)
+        self.assertEqual(histogram.values[()][0], [1, 0, 0])
+
+        registry.remove_remote(1234)
+        self.assertIn('sent_total{type="partial"} 2.0', registry.render())
+        self.assertNotIn("final", registry.render())
+
+    def test_snapshot_is_a_copy(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1,))
+        histogram.observe(0.05)
+        snapshot = registry.snapshot()
+        histogram.observe(0.05)
+        self.assertEqual(snapshot["latency_seconds"][()][0], [1, 0])
+
+    def test_worker_snapshot_leaves_out_front_end_gauges(self):
+        snapshot = ServerMetrics().worker_snapshot()
+        self.assertNotIn("whisper_live_active_clients", snapshot)
+        self.assertNotIn("whisper_live_queued_clients", snapshot)
+        self.assertIn("whisper_live_messages_sent_total", snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from whisper_live.model_pool import ModelPool
+from whisper_live.server import TranscriptionServer
+
+
+class StubModel:
+    """Stand-in for `WhisperModel`, recording the models the pool loads."""
+    loaded = []
+
+    def __init__(self, model_size_or_path, device="cpu", compute_type="int8", **kwargs):
+        self.key = (model_size_or_path, device, compute_type)
+        self.model_path = "/nonexistent/" + model_size_or_path
+        self.transcriptions = 0
+        StubModel.loaded.append(self.key)
+
+    def transcribe(self, audio, **kwargs):
+        self.transcriptions += 1
+        return [], None
+
+
+class StubLoaderTestCase(unittest.TestCase):
+    def setUp(self):
+        StubModel.loaded = []
+        patcher = mock.patch("whisper_live.model_pool.WhisperModel", StubModel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def loaded_models(self, pool):
+        return [key[0] for key in pool.entries]
+
+
+class ModelPoolTest(StubLoaderTestCase):
+    def test_clients_share_one_model_per_key(self):
+        pool = ModelPool(idle_ttl=None)
+        first = pool.acquire("small.en")
+        second = pool.acquire("small.en")
+        self.assertIs(first, second)
+        self.assertIsNot(pool.acquire("small.en", compute_type="float32"), first)
+        self.assertEqual(StubModel.loaded, [("small.en", "cpu", "int8"), ("small.en", "cpu", "float32")])
+
+        pool.release(first)
+        pool.release(second)
+        # kept loaded for the next client
+        self.assertIs(pool.acquire("small.en"), first)
+        self.assertEqual(len(StubModel.loaded), 2)
+
+    def test_models_in_use_are_never_evicted(self):
+        pool = ModelPool(max_idle_models=0, idle_ttl=0)
+        in_use = pool.acquire("small.en")
+        pool.release(pool.acquire("tiny.en"))
+        time.sleep(0.01)
+        pool.evict_idle()
+        self.assertEqual(self.loaded_models(pool), ["small.en"])
+        self.assertEqual([entry.ref_count for entry in pool.entries.values()], [1])
+
+        pool.release(in_use)
+        self.assertEqual(self.loaded_models(pool), [])
+
+    def test_idle_models_are_evicted_oldest_first(self):
+        pool = ModelPool(max_idle_models=2, idle_ttl=None)
+        models = [pool.acquire(name) for name in ("tiny.en", "base.en", "small.en")]
+        for model in models:
+            pool.release(model)
+        self.assertEqual(self.loaded_models(pool), ["base.en", "small.en"])
+
+        # using a model makes it the most recent one
+        pool.release(pool.acquire("base.en"))
+        pool.release(pool.acquire("medium.en"))
+        self.assertEqual(self.loaded_models(pool), ["base.en", "medium.en"])
+
+    def test_reaper_unloads_expired_models(self):
+        pool = ModelPool(idle_ttl=0.05, reap_interval=0.01)
+        pool.release(pool.acquire("small.en"))
+        self.assertEqual(self.loaded_models(pool), ["small.en"])
+        deadline = time.monotonic() + 5
+        while pool.entries and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.loaded_models(pool), [])
+
+
+class PreloadTest(StubLoaderTestCase):
+    def test_preloaded_models_are_never_evicted(self):
+        pool = ModelPool(max_idle_models=0, idle_ttl=0, reap_interval=0.01)
+        server = TranscriptionServer(model_pool=pool)
+        server.preload(["small.en", "tiny"], warmup_audio=np.zeros(16000, dtype=np.float32))
+        self.assertEqual(StubModel.loaded, [("small.en", "cpu", "int8"), ("tiny", "cpu", "int8")])
+        # warmed up once each
+        self.assertEqual([entry.model.transcriptions for entry in pool.entries.values()], [1, 1])
+
+        # a client comes and goes, and the reaper runs a few times
+        pool.release(pool.acquire("small.en"))
+        pool.release(pool.acquire("tiny"))
+        time.sleep(0.1)
+        self.assertEqual(self.loaded_models(pool), ["small.en", "tiny"])
+        self.assertEqual(len(StubModel.loaded), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
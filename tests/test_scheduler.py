@@ -0,0 +1,104 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from whisper_live.scheduler import BatchedModel, InferenceScheduler
+
+
+class AsyncResult:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+class RecordingWhisper:
+    """Stand-in for a CTranslate2 Whisper model, recording the size and options of every batch."""
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def generate(self, features, prompts, asynchronous=False, **kwargs):
+        features = np.asarray(features)
+        with self.lock:
+            self.batches.append((len(prompts), kwargs))
+        results = [
+            SimpleNamespace(sequences_ids=[list(prompt) + [int(window.sum())]])
+            for window, prompt in zip(features, prompts)
+        ]
+        if asynchronous:
+            return [AsyncResult(result) for result in results]
+        return results
+
+
+class TestInferenceScheduler(unittest.TestCase):
+    def setUp(self):
+        self.whisper = RecordingWhisper()
+        self.scheduler = InferenceScheduler(max_batch_size=8, max_wait_time=0.5)
+        self.model = BatchedModel(self.whisper, self.scheduler)
+
+    def run_concurrently(self, calls):
+        results = [None] * len(calls)
+        barrier = threading.Barrier(len(calls))
+
+        def run(i, call):
+            barrier.wait()
+            results[i] = call()
+
+        threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def generate_call(self, i, **kwargs):
+        features = np.full((1, 2, 3), i, dtype=np.float32)
+        return lambda: self.model.generate(features, [[i]], **kwargs)
+
+    def test_identical_options_are_batched(self):
+        results = self.run_concurrently([self.generate_call(i, beam_size=5) for i in range(4)])
+
+        self.assertEqual(self.whisper.batches, [(4, {"beam_size": 5})])
+        for i, result in enumerate(results):
+            self.assertEqual(len(result), 1)
+            self.assertEqual(result[0].sequences_ids, [[i, i * 6]])
+
+    def test_synchronous_and_asynchronous_calls_share_a_batch(self):
+        results = self.run_concurrently([
+            self.generate_call(1, sampling_temperature=0.2),
+            self.generate_call(2, sampling_temperature=0.2, asynchronous=True),
+        ])
+
+        self.assertEqual(len(self.whisper.batches), 1)
+        self.assertEqual(results[0][0].sequences_ids, [[1, 6]])
+        self.assertEqual(results[1][0].result().sequences_ids, [[2, 12]])
+
+    def test_different_temperatures_are_separate_batches(self):
+        results = self.run_concurrently([
+            self.generate_call(1, sampling_temperature=0.0),
+            self.generate_call(2, sampling_temperature=0.4),
+        ])
+
+        self.assertEqual(sorted(kwargs["sampling_temperature"] for _, kwargs in self.whisper.batches), [0.0, 0.4])
+        self.assertEqual(results[0][0].sequences_ids, [[1, 6]])
+        self.assertEqual(results[1][0].sequences_ids, [[2, 12]])
+
+    def test_multi_window_requests_get_their_slices(self):
+        first = np.ones((2, 2, 3), dtype=np.float32)
+        second = np.full((1, 2, 3), 2, dtype=np.float32)
+        results = self.run_concurrently([
+            lambda: self.model.generate(first, [[1], [2]]),
+            lambda: self.model.generate(second, [[3]]),
+        ])
+
+        self.assertEqual(self.whisper.batches, [(3, {})])
+        self.assertEqual([r.sequences_ids for r in results[0]], [[[1, 6]], [[2, 6]]])
+        self.assertEqual([r.sequences_ids for r in results[1]], [[[3, 12]]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,405 @@
+import os
+import json
+import time
+import asyncio
+import unittest
+import contextlib
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from faster_whisper.audio import decode_audio
+from faster_whisper.feature_extractor import FeatureExtractor
+
+from whisper_live.server import ServeClient, TranscriptionServer
+from whisper_live.transcriber import Segment, Word
+
+try:
+    from whisper_live.client import Client
+except ImportError:
+    # the client needs the audio dependencies, e.g. pyaudio
+    Client = None
+
+
+JFK_PATH = os.path.join(os.path.dirname(__file__), "jfk.flac")
+
+
+def make_segment(words, end=None, tokens=(), temperature=0.0):
+    """Returns a segment made of `(start, end, word)` tuples."""
+    return Segment(
+        id=0,
+        seek=0,
+        start=words[0][0],
+        end=end if end is not None else words[-1][1],
+        text="".join(word for _, _, word in words),
+        tokens=list(tokens),
+        temperature=temperature,
+        avg_logprob=-0.1,
+        compression_ratio=1.0,
+        no_speech_prob=0.0,
+        words=[Word(start, end, word, 0.9) for start, end, word in words],
+    )
+
+
+class ScriptedModel:
+    """Stand-in for `WhisperModel` returning the same segments on every call."""
+    def __init__(self, segments):
+        self.feature_extractor = FeatureExtractor()
+        self.segments = segments
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        return list(self.segments), None
+
+
+class SequenceModel(ScriptedModel):
+    """Stand-in for `WhisperModel` returning the next scripted result on every call, and recording the prefixes."""
+    def __init__(self, results):
+        super().__init__([])
+        self.results = list(results)
+        self.prefixes = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        self.prefixes.append(kwargs.get("prefix"))
+        return list(self.results.pop(0)), None
+
+
+class StaticPool:
+    def __init__(self, model):
+        self.model = model
+
+    def acquire(self, *args, **kwargs):
+        return self.model
+
+    def release(self, model):
+        pass
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(json.loads(message))
+
+
+def make_client(segments=(), **kwargs):
+    model = ScriptedModel(list(segments))
+    kwargs.setdefault("start_thread", False)
+    client = ServeClient(
+        RecordingWebSocket(),
+        language="en",
+        model_pool=StaticPool(model),
+        **kwargs,
+    )
+    return client, model
+
+
+class SpeechToTextWakeupTest(unittest.TestCase):
+    def setUp(self):
+        self.client, _ = make_client(start_thread=True)
+        self.checks = 0
+        has_new_audio = self.client.has_new_audio
+
+        def count_checks():
+            self.checks += 1
+            return has_new_audio()
+
+        self.client.has_new_audio = count_checks
+        self.addCleanup(self.stop)
+
+    def stop(self):
+        with self.client.frames_cond:
+            self.client.exit = True
+            self.client.frames_cond.notify()
+        self.client.trans_thread.join(timeout=5)
+
+    def wait_until_processed(self, seconds, timeout=3):
+        deadline = time.monotonic() + timeout
+        while self.client.processed_until < seconds and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return self.client.processed_until
+
+    def test_idle_client_sleeps_until_enough_audio_arrived(self):
+        self.client.new_audio_timeout = 60
+        time.sleep(0.2)
+        # the thread checked for audio when it went to sleep, not in a loop
+        self.assertLessEqual(self.checks, 2)
+
+        self.client.add_frames(np.zeros(1600, dtype=np.float32))
+        time.sleep(0.1)
+        self.assertEqual(self.client.processed_until, 0.0)
+
+        # `min_new_audio` seconds since the last pass wake the thread up
+        self.client.add_frames(np.zeros(2400, dtype=np.float32))
+        self.assertEqual(self.wait_until_processed(0.25), 0.25)
+
+    def test_new_audio_timeout_wakes_up_the_client(self):
+        self.client.new_audio_timeout = 0.05
+        self.client.add_frames(np.zeros(1600, dtype=np.float32))
+        self.assertEqual(self.wait_until_processed(0.1), 0.1)
+
+
+class FakeAsyncWebSocket:
+    """Asyncio connection sending a handshake and audio frames, then closing once a transcription arrived."""
+    def __init__(self, options, frames):
+        self.options = options
+        self.frames = frames
+        self.messages = []
+        self.closed = False
+
+    async def recv(self):
+        return json.dumps(self.options)
+
+    async def send(self, message):
+        self.messages.append(json.loads(message))
+
+    async def close(self):
+        self.closed = True
+
+    async def __aiter__(self):
+        for frame in self.frames:
+            yield frame
+            await asyncio.sleep(0.01)
+        deadline = time.monotonic() + 5
+        while not any("segments" in message for message in self.messages) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+
+class AsyncServerTest(unittest.TestCase):
+    def test_client_streams_and_disconnects(self):
+        audio = decode_audio(JFK_PATH)[:3 * 16000]
+        segments = [make_segment([(0.0, 0.4, " And"), (0.4, 0.8, " so")])]
+        model = ScriptedModel(segments)
+        server = TranscriptionServer(model_pool=StaticPool(model))
+        server.inference_executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(server.inference_executor.shutdown)
+        options = {
+            "uid": "a", "multilingual": False, "language": "en", "task": "transcribe",
+            "model_size": "small", "use_custom_model": False,
+        }
+        websocket = FakeAsyncWebSocket(options, [chunk.tobytes() for chunk in np.split(audio, 6)])
+
+        async def run():
+            handled = asyncio.Event()
+
+            @contextlib.asynccontextmanager
+            async def serve(handler, host, port):
+                # a single connection instead of a listening socket
+                await handler(websocket)
+                handled.set()
+                yield
+
+            with mock.patch("whisper_live.server.websockets.serve", serve):
+                task = asyncio.ensure_future(server.serve_async("localhost", 9090))
+                await handled.wait()
+                task.cancel()
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+        self.assertEqual(websocket.messages[0]["message"], ServeClient.SERVER_READY)
+        self.assertEqual(websocket.messages[-1]["segments"][0]["text"], " And so")
+        self.assertGreaterEqual(model.calls, 1)
+        self.assertEqual(server.clients, {})
+        self.assertEqual(server.admission.active, 0)
+
+
+class CommitAgreedWordsTest(unittest.TestCase):
+    def test_commits_the_words_two_passes_agree_on(self):
+        client, _ = make_client()
+        first = [make_segment([(0.0, 0.4, " And"), (0.4, 0.8, " so"), (0.8, 1.2, " my")])]
+        partial = client.commit_agreed_words(first, 2.0)
+        self.assertEqual(partial["text"], " And so my")
+        self.assertEqual(client.agreed_words, [])
+        self.assertEqual(client.timestamp_offset, 0.0)
+
+        second = [make_segment([(0.0, 0.4, " and"), (0.4, 0.8, " so,"), (0.8, 1.2, " mine"), (1.2, 1.6, " fellow")])]
+        partial = client.commit_agreed_words(second, 2.5)
+        self.assertEqual([word for _, _, word in client.agreed_words], [" and", " so,"])
+        self.assertEqual(client.timestamp_offset, 0.8)
+        self.assertEqual([word for _, _, word in client.hypothesis], [" mine", " fellow"])
+        self.assertEqual(partial["text"], " and so, mine fellow")
+        # the segment of the agreed words is still open
+        self.assertEqual(client.transcript, [])
+
+    def test_completed_segments_are_appended_to_the_transcript(self):
+        client, _ = make_client()
+        segments = [
+            make_segment([(0.0, 0.5, " Ask"), (0.5, 1.0, " not.")]),
+            make_segment([(1.2, 1.6, " What")]),
+        ]
+        client.commit_agreed_words(segments, 2.0)
+        segments = [
+            make_segment([(0.0, 0.5, " Ask"), (0.5, 1.0, " not.")]),
+            make_segment([(1.2, 1.6, " Why")]),
+        ]
+        partial = client.commit_agreed_words(segments, 2.5)
+        self.assertEqual(len(client.transcript), 1)
+        self.assertEqual(client.transcript[0]["text"], " Ask not.")
+        self.assertEqual(client.agreed_words, [])
+        self.assertEqual(partial["text"], " Why")
+
+    def test_reused_result_does_not_agree_with_itself(self):
+        segments = [make_segment([(0.0, 0.4, " And"), (0.4, 0.8, " so"), (0.8, 1.2, " my")])]
+        client, _ = make_client()
+        client.update_segments(segments, 2.0)
+        partial = client.update_segments(segments, 2.0, reused=True)
+        self.assertEqual(partial["text"], " And so my")
+        self.assertEqual(client.agreed_words, [])
+        self.assertEqual(len(client.hypothesis), 3)
+        self.assertEqual(client.timestamp_offset, 0.0)
+
+    def test_stalled_stream_commits_nothing(self):
+        audio = decode_audio(JFK_PATH)
+        segments = [make_segment([(0.0, 0.4, " And"), (0.4, 0.8, " so"), (0.8, 1.2, " my")], end=2.0)]
+        client, model = make_client(segments, forced_prefix=False)
+        client.add_frames(audio[:3 * 16000])
+        client.transcribe_audio()
+        for _ in range(3):
+            client.transcribe_audio()
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(client.agreed_words, [])
+        self.assertEqual(client.transcript, [])
+        self.assertEqual(client.timestamp_offset, 0.0)
+
+
+class SegmentUpdatesTest(unittest.TestCase):
+    def setUp(self):
+        self.client, _ = make_client(protocol_version=2)
+        self.messages = self.client.websocket.messages
+        del self.messages[:]
+
+    def commit(self, text):
+        start = float(len(self.client.transcript))
+        self.client.transcript.append(self.client.format_segment(start, start + 1, text))
+
+    def test_only_changes_are_sent(self):
+        self.commit(" Ask not")
+        self.commit(" what your country")
+        partial = self.client.format_segment(2, 2.5, " can")
+        self.client.send_segment_updates(partial)
+        self.assertEqual([s["id"] for s in self.messages[-1]["committed"]], [0, 1])
+        self.assertEqual(self.messages[-1]["partial"]["text"], " can")
+
+        self.client.send_segment_updates(partial)
+        self.assertEqual(len(self.messages), 1)
+
+        self.commit(" can do for you")
+        self.client.send_segment_updates(None)
+        self.assertEqual(len(self.messages), 2)
+        self.assertEqual([s["id"] for s in self.messages[-1]["committed"]], [2])
+        self.assertIsNone(self.messages[-1]["partial"])
+
+    def test_resync_sends_the_whole_transcript(self):
+        self.commit(" Ask not")
+        self.client.send_segment_updates(self.client.format_segment(1, 1.5, " what"))
+        self.commit(" what your country")
+        self.client.resync()
+        message = self.messages[-1]
+        self.assertTrue(message["resync"])
+        self.assertEqual([s["text"] for s in message["committed"]], [" Ask not", " what your country"])
+        self.assertEqual(message["partial"]["text"], " what")
+        # nothing left to send afterwards
+        self.client.send_segment_updates(self.client.last_partial)
+        self.assertIs(self.messages[-1], message)
+
+    @unittest.skipIf(Client is None, "the client dependencies are not installed")
+    def test_client_recovers_from_a_lost_message(self):
+        receiver = Client.__new__(Client)
+        receiver.transcript = []
+        receiver.partial = None
+        receiver.resync_pending = False
+        receiver.client_socket = RecordingWebSocket()
+
+        for text in (" Ask not", " what your country", " can do for you", " ask what"):
+            self.commit(text)
+            self.client.send_segment_updates(None)
+        receiver.update_transcript(self.messages[0])
+        # the second message is lost
+        receiver.update_transcript(self.messages[2])
+        self.assertEqual(receiver.client_socket.messages, [{"type": "resync"}])
+        self.assertEqual(len(receiver.transcript), 1)
+        # a single resync is requested until it arrives
+        receiver.update_transcript(self.messages[3])
+        self.assertEqual(receiver.client_socket.messages, [{"type": "resync"}])
+
+        self.client.resync()
+        receiver.update_transcript(self.messages[-1])
+        self.assertEqual(receiver.transcript, self.messages[-1]["committed"])
+        self.assertEqual(
+            [s["text"] for s in receiver.transcript], [" Ask not", " what your country", " can do for you", " ask what"]
+        )
+        self.assertFalse(receiver.resync_pending)
+
+
+class ForcedPrefixTest(unittest.TestCase):
+    def setUp(self):
+        self.audio = decode_audio(JFK_PATH)[:4 * 16000]
+
+    def run_passes(self, results, starts):
+        model = SequenceModel(results)
+        client = ServeClient(
+            RecordingWebSocket(),
+            language="en",
+            model_pool=StaticPool(model),
+            start_thread=False,
+        )
+        client.add_frames(self.audio)
+        for start in starts:
+            client.run_inference(start, len(self.audio))
+        return client, model
+
+    def result(self, tokens, temperature=0.0):
+        return [make_segment([(0.0, 1.0, " And so")], tokens=tokens, temperature=temperature)]
+
+    def test_tokens_of_the_last_two_passes_are_forced(self):
+        client, model = self.run_passes(
+            [self.result([1, 2, 3, 4, 5]), self.result([1, 2, 3, 4, 6, 7]), self.result([1, 2, 3, 4, 6, 8])],
+            starts=[0, 0, 0],
+        )
+        self.assertEqual(model.prefixes, [None, None, [1, 2, 3, 4]])
+        self.assertEqual(client.stable_tokens, [1, 2, 3, 4, 6])
+
+    def test_short_agreement_is_not_forced(self):
+        _, model = self.run_passes(
+            [self.result([1, 2, 3, 4]), self.result([1, 2, 3, 5]), self.result([1, 2, 3, 5])],
+            starts=[0, 0, 0],
+        )
+        self.assertEqual(model.prefixes, [None, None, None])
+
+    def test_prefix_is_dropped_when_sampling_was_needed(self):
+        client, model = self.run_passes(
+            [
+                self.result([1, 2, 3, 4, 5]),
+                self.result([1, 2, 3, 4, 5]),
+                self.result([1, 2, 3, 4, 5, 9], temperature=0.2),
+                self.result([1, 2, 3, 7]),
+            ],
+            starts=[0, 0, 0],
+        )
+        # the window is decoded again without the prefix
+        self.assertEqual(model.prefixes, [None, None, [1, 2, 3, 4, 5], None])
+        self.assertEqual(client.decoded_tokens, (0, [1, 2, 3, 7]))
+        self.assertEqual(client.stable_tokens, [])
+
+    def test_prefix_is_dropped_when_nothing_was_decoded(self):
+        client, model = self.run_passes(
+            [self.result([1, 2, 3, 4, 5]), self.result([1, 2, 3, 4, 5]), [], self.result([1, 2, 3, 4])],
+            starts=[0, 0, 0],
+        )
+        self.assertEqual(model.prefixes, [None, None, [1, 2, 3, 4, 5], None])
+        self.assertEqual(client.decoded_tokens, (0, [1, 2, 3, 4]))
+
+    def test_prefix_is_reset_when_the_window_moves(self):
+        client, model = self.run_passes(
+            [self.result([1, 2, 3, 4, 5]), self.result([1, 2, 3, 4, 5]), self.result([4, 5, 6, 7])],
+            starts=[0, 0, 16000],
+        )
+        self.assertEqual(model.prefixes, [None, None, None])
+        self.assertEqual(client.stable_tokens, [])
+        self.assertEqual(client.decoded_tokens, (16000, [4, 5, 6, 7]))
+
+
+if __name__ == "__main__":
+    unittest.main()
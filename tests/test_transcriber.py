@@ -0,0 +1,330 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import ctranslate2
+import tokenizers
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from faster_whisper.tokenizer import Tokenizer
+
+from whisper_live.tracing import SessionTracer, Tracer, trace
+from whisper_live.transcriber import FallbackStats, TranscriptionOptions, WhisperModel, merge_speech_chunks
+
+
+TEMPERATURES = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+
+
+def make_options(**kwargs):
+    """Returns the `TranscriptionOptions` of `WhisperModel.transcribe` with its default arguments."""
+    options = dict(
+        beam_size=5,
+        best_of=5,
+        patience=1,
+        length_penalty=1,
+        repetition_penalty=1,
+        no_repeat_ngram_size=0,
+        log_prob_threshold=-1.0,
+        no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4,
+        condition_on_previous_text=True,
+        prompt_reset_on_temperature=0.5,
+        temperatures=TEMPERATURES,
+        initial_prompt=None,
+        prefix=None,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+        without_timestamps=False,
+        max_initial_timestamp=1.0,
+        word_timestamps=False,
+        prepend_punctuations="\"'“¿([{-",
+        append_punctuations="\"'.。,，!！?？:：”)]}、",
+        fallback_budget=None,
+        parallel_fallback=False,
+        tracer=None,
+    )
+    options.update(kwargs)
+    return TranscriptionOptions(**options)
+
+
+class FailingWhisper:
+    """
+    Stand-in for a CTranslate2 Whisper model whose results fail the log probability threshold
+    below `passing_temperature`.
+    """
+    is_multilingual = False
+
+    def __init__(self, passing_temperature=0.0, delay=0.0):
+        self.passing_temperature = passing_temperature
+        self.delay = delay
+        self.calls = []
+
+    def generate(self, encoder_output, prompts, sampling_temperature=0.0, asynchronous=False, **kwargs):
+        time.sleep(self.delay)
+        self.calls.append((sampling_temperature, asynchronous))
+        score = -0.1 if sampling_temperature >= self.passing_temperature else -2.0
+        results = [
+            SimpleNamespace(sequences_ids=[list(range(10))], scores=[score], no_speech_prob=0.01)
+            for _ in prompts
+        ]
+        if asynchronous:
+            return [SimpleNamespace(result=lambda result=result: result) for result in results]
+        return results
+
+
+class WordTokenizer:
+    WORDS = "ask not what your country can do for you my fellow".split()
+
+    def decode(self, tokens):
+        return " ".join(self.WORDS[token % len(self.WORDS)] for token in tokens)
+
+
+SPECIAL_TOKENS = [
+    "<unk>", "<|endoftext|>", "<|startoftranscript|>", "<|en|>", "<|translate|>", "<|transcribe|>",
+    "<|startoflm|>", "<|startofprev|>", "<|nocaptions|>", "<|notimestamps|>",
+]
+
+
+def make_tokenizer():
+    """Returns a tokenizer of the words of `WordTokenizer` followed by the special tokens of Whisper."""
+    vocab = {token: i for i, token in enumerate(WordTokenizer.WORDS + SPECIAL_TOKENS)}
+    tokenizer = tokenizers.Tokenizer(WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = Whitespace()
+    return tokenizer
+
+
+TIMESTAMP_BEGIN = len(WordTokenizer.WORDS) + len(SPECIAL_TOKENS)
+
+
+class StandInWhisper:
+    """Stand-in for a CTranslate2 Whisper model decoding the same words in every window."""
+    is_multilingual = False
+    device = "cpu"
+    device_index = [0]
+
+    def __init__(self, tokens=(0, 1, 2)):
+        self.tokens = [TIMESTAMP_BEGIN] + list(tokens) + [TIMESTAMP_BEGIN + 50]
+
+    def encode(self, features, to_cpu=False):
+        batch_size = np.asarray(features).shape[0]
+        return ctranslate2.StorageView.from_array(np.zeros((batch_size, 1500, 4), dtype=np.float32))
+
+    def generate(self, encoder_output, prompts, sampling_temperature=0.0, **kwargs):
+        return [
+            SimpleNamespace(sequences_ids=[list(self.tokens)], scores=[-0.1], no_speech_prob=0.01)
+            for _ in prompts
+        ]
+
+    def align(self, encoder_output, start_sequence, text_tokens, num_frames, median_filter_width=7):
+        results = []
+        for tokens in text_tokens:
+            n = len(tokens) + 1
+            alignments = [(i * n // num_frames, i) for i in range(num_frames)]
+            results.append(SimpleNamespace(alignments=alignments, text_token_probs=[0.9] * n))
+        return results
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.spans = []
+
+    def record(self, name, seconds, attributes):
+        self.spans.append((name, attributes))
+
+
+class FromModelTest(unittest.TestCase):
+    def test_wraps_a_loaded_model(self):
+        model = SimpleNamespace(is_multilingual=False)
+        transcriber = WhisperModel.from_model(model)
+        self.assertIs(transcriber.model, model)
+        self.assertIsNone(transcriber.model_path)
+        self.assertEqual(transcriber.feature_extractor.hop_length, 160)
+        self.assertEqual(transcriber.frames_per_second, 100)
+        self.assertEqual(transcriber.tokens_per_second, 50)
+        self.assertEqual(transcriber.fallback_stats.snapshot()["windows"], 0)
+        self.assertEqual(len(transcriber.decoding_setups), 0)
+
+
+class FallbackStatsTest(unittest.TestCase):
+    def test_record(self):
+        stats = FallbackStats()
+        stats.record(1, budget_exceeded=False, exhausted=False)
+        stats.record(3, budget_exceeded=True, exhausted=False)
+        stats.record(6, budget_exceeded=False, exhausted=True)
+        self.assertEqual(
+            stats.snapshot(),
+            {"windows": 3, "attempts": 10, "fallbacks": 2, "budget_exceeded": 1, "exhausted": 1},
+        )
+
+    def decode(self, model, **kwargs):
+        transcriber = WhisperModel.from_model(model)
+        result = transcriber.generate_with_fallback(None, [0], WordTokenizer(), make_options(**kwargs))
+        return result, transcriber.fallback_stats.snapshot()
+
+    def test_first_temperature_passes(self):
+        (_, _, temperature, _), stats = self.decode(FailingWhisper())
+        self.assertEqual(temperature, 0.0)
+        self.assertEqual(stats, {"windows": 1, "attempts": 1, "fallbacks": 0, "budget_exceeded": 0, "exhausted": 0})
+
+    def test_fallback(self):
+        (_, _, temperature, _), stats = self.decode(FailingWhisper(passing_temperature=0.4))
+        self.assertEqual(temperature, 0.4)
+        self.assertEqual(stats, {"windows": 1, "attempts": 3, "fallbacks": 1, "budget_exceeded": 0, "exhausted": 0})
+
+    def test_all_temperatures_fail(self):
+        _, stats = self.decode(FailingWhisper(passing_temperature=2.0))
+        self.assertEqual(stats["attempts"], len(TEMPERATURES))
+        self.assertEqual(stats["exhausted"], 1)
+        self.assertEqual(stats["budget_exceeded"], 0)
+
+    def test_budget_stops_the_fallback(self):
+        model = FailingWhisper(passing_temperature=2.0, delay=0.02)
+        _, stats = self.decode(model, fallback_budget=0.05)
+        self.assertLess(stats["attempts"], len(TEMPERATURES))
+        self.assertEqual(stats["budget_exceeded"], 1)
+        self.assertEqual(stats["exhausted"], 0)
+
+    def test_parallel_fallback_submits_the_remaining_temperatures_at_once(self):
+        model = FailingWhisper(passing_temperature=0.4)
+        (_, _, temperature, _), stats = self.decode(model, parallel_fallback=True)
+        # the first acceptable result in temperature order wins
+        self.assertEqual(temperature, 0.4)
+        self.assertEqual(model.calls, [(0.0, False)] + [(t, True) for t in TEMPERATURES[1:]])
+        self.assertEqual(stats["attempts"], len(TEMPERATURES))
+        self.assertEqual(stats["fallbacks"], 1)
+
+
+class TracingTest(unittest.TestCase):
+    def transcribe(self, tracer, model_tracer=None):
+        transcriber = WhisperModel.from_model(StandInWhisper(), hf_tokenizer=make_tokenizer(), tracer=model_tracer)
+        audio = np.zeros(2 * 16000, dtype=np.float32)
+        segments, _ = transcriber.transcribe(audio, language="en", word_timestamps=True, tracer=tracer)
+        return list(segments)
+
+    def test_spans_of_the_model_stages(self):
+        tracer = RecordingTracer()
+        segments = self.transcribe(tracer)
+        self.assertEqual(segments[0].text, "ask not what")
+        stages = [(name, attributes) for name, attributes in tracer.spans if name != "features"]
+        self.assertEqual(
+            stages,
+            [
+                ("encode", {"window": 0.0}),
+                ("generate", {"window": 0.0, "temperature": 0.0}),
+                ("alignment", {"window": 0.0}),
+            ],
+        )
+
+    def test_tracer_of_the_model_is_the_default(self):
+        tracer = RecordingTracer()
+        self.transcribe(None, model_tracer=tracer)
+        self.assertIn("generate", [name for name, _ in tracer.spans])
+
+    def test_session_tracer_aggregates_the_spans(self):
+        tracer = SessionTracer()
+        self.transcribe(tracer)
+        self.transcribe(tracer)
+        summary = tracer.summary()
+        self.assertEqual({name: summary[name]["count"] for name in ("encode", "generate", "alignment")},
+                         {"encode": 2, "generate": 2, "alignment": 2})
+        self.assertEqual(tracer.temperatures[0.0][0], 2)
+
+    def test_disabled_tracing_returns_the_null_span(self):
+        span = trace(None, "encode", window=0.0)
+        self.assertIs(span, trace(None, "generate"))
+        with span:
+            pass
+        tracer = RecordingTracer()
+        with trace(tracer, "encode", window=1.0):
+            pass
+        self.assertEqual(tracer.spans, [("encode", {"window": 1.0})])
+
+
+class DecodingSetupCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.transcriber = WhisperModel.from_model(
+            StandInWhisper(), hf_tokenizer=make_tokenizer(), decoding_setup_cache_size=2
+        )
+
+    def test_same_arguments_reuse_the_setup(self):
+        setup = self.transcriber.get_decoding_setup("transcribe", "en", [-1], "ask not")
+        self.assertIs(self.transcriber.get_decoding_setup("transcribe", "en", [-1], "ask not"), setup)
+        self.assertEqual(list(setup.initial_prompt_tokens), [0, 1])
+        self.assertEqual(len(self.transcriber.decoding_setups), 1)
+
+        # token ids are keyed by value
+        tokens = self.transcriber.get_decoding_setup("transcribe", "en", [-1], [0, 1])
+        self.assertIs(self.transcriber.get_decoding_setup("transcribe", "en", [-1], (0, 1)), tokens)
+
+    def test_other_arguments_build_a_new_setup(self):
+        setup = self.transcriber.get_decoding_setup("transcribe", "en", [-1], None)
+        other = self.transcriber.get_decoding_setup("transcribe", "en", [-1], "ask not")
+        self.assertIsNot(other, setup)
+        self.assertIsNot(self.transcriber.get_decoding_setup("transcribe", "en", None, None), setup)
+        # only the last `decoding_setup_cache_size` are kept
+        self.assertEqual(len(self.transcriber.decoding_setups), 2)
+        self.assertIsNot(self.transcriber.get_decoding_setup("transcribe", "en", [-1], None), setup)
+
+
+class PromptPrefixTest(unittest.TestCase):
+    def setUp(self):
+        self.transcriber = WhisperModel.from_model(StandInWhisper(), hf_tokenizer=make_tokenizer())
+        self.tokenizer = Tokenizer(self.transcriber.hf_tokenizer, False)
+
+    def test_token_prefix_is_appended_as_is(self):
+        prefix = [TIMESTAMP_BEGIN, 0, 1, 2]
+        prompt = self.transcriber.get_prompt(self.tokenizer, [3, 4], prefix=prefix)
+        self.assertEqual(prompt, [self.tokenizer.sot_prev, 3, 4, self.tokenizer.sot] + prefix)
+
+    def test_token_prefix_is_capped(self):
+        prefix = [TIMESTAMP_BEGIN] + [i % 10 for i in range(400)]
+        prompt = self.transcriber.get_prompt(self.tokenizer, [], prefix=prefix)
+        self.assertEqual(prompt[1:], prefix[: self.transcriber.max_length // 2 - 1])
+
+
+class BatchedWindowsTest(unittest.TestCase):
+    def windows(self, chunks, max_samples=1000):
+        chunks = [dict(start=start, end=end) for start, end in chunks]
+        return [(w["start"], w["end"]) for w in merge_speech_chunks(chunks, max_samples)]
+
+    def test_merge_speech_chunks(self):
+        # windows are cut in the silences between chunks
+        self.assertEqual(self.windows([(0, 100), (200, 300)]), [(0, 300)])
+        self.assertEqual(self.windows([(0, 600), (700, 1200)]), [(0, 600), (700, 1200)])
+        self.assertEqual(self.windows([(0, 400), (500, 1000), (1100, 1300)]), [(0, 1000), (1100, 1300)])
+        # longer chunks are cut every max_samples
+        self.assertEqual(self.windows([(0, 2500)]), [(0, 1000), (1000, 2000), (2000, 2500)])
+        self.assertEqual(self.windows([(0, 1500), (1600, 1700)]), [(0, 1000), (1000, 1700)])
+        self.assertEqual(self.windows([]), [])
+
+    def test_split_window_tokens(self):
+        tokenizer = SimpleNamespace(timestamp_begin=50364, eot=50257)
+        transcriber = WhisperModel.from_model(SimpleNamespace(is_multilingual=False))
+
+        def timestamp(seconds):
+            return tokenizer.timestamp_begin + int(round(seconds / transcriber.time_precision))
+
+        tokens = [
+            timestamp(0.0), 10, 11, timestamp(1.0),
+            timestamp(1.0), 12, timestamp(2.0),
+            timestamp(2.5), 13,
+        ]
+        segments = transcriber.split_window_tokens(tokens, tokenizer, duration=3.0)
+        self.assertEqual(
+            [(s["start"], s["end"], s["tokens"]) for s in segments],
+            [
+                (0.0, 1.0, [timestamp(0.0), 10, 11, timestamp(1.0)]),
+                (1.0, 2.0, [timestamp(1.0), 12, timestamp(2.0)]),
+                # the text after the last timestamp ends with the window
+                (2.5, 3.0, [timestamp(2.5), 13]),
+            ],
+        )
+
+        # timestamps are clipped to the window
+        segments = transcriber.split_window_tokens([timestamp(0.0), 10, timestamp(5.0)], tokenizer, duration=3.0)
+        self.assertEqual([(s["start"], s["end"]) for s in segments], [(0.0, 3.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
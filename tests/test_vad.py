@@ -0,0 +1,70 @@
+import os
+import unittest
+
+import numpy as np
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from whisper_live.audio_buffer import AudioRingBuffer
+from whisper_live.vad import StreamingVad
+
+
+JFK_PATH = os.path.join(os.path.dirname(__file__), "jfk.flac")
+
+
+class TestStreamingVad(unittest.TestCase):
+    def setUp(self):
+        audio = decode_audio(JFK_PATH)
+        silence = np.zeros(16000 * 2, dtype=np.float32)
+        self.audio = np.concatenate((silence, audio, silence, audio))
+        # get_speech_timestamps zero pads the last window, the stream waits for it to be complete
+        self.audio = self.audio[:len(self.audio) - len(self.audio) % 512]
+        self.buffer = AudioRingBuffer(len(self.audio))
+
+    def stream(self, vad, frame_size=4096):
+        for i in range(0, len(self.audio), frame_size):
+            self.buffer.append(self.audio[i:i + frame_size])
+            vad.process(self.buffer)
+
+    def snap(self, chunks, hop_length=160):
+        """Align the chunks of `get_speech_timestamps` on feature frames, like `get_speech_chunks` does."""
+        snapped = []
+        for chunk in chunks:
+            start = chunk["start"] - chunk["start"] % hop_length
+            end = min(len(self.audio), -(-chunk["end"] // hop_length) * hop_length)
+            if snapped:
+                start = max(start, snapped[-1]["end"])
+            snapped.append({"start": start, "end": end})
+        return snapped
+
+    def assert_matches_get_speech_timestamps(self, vad_options):
+        vad = StreamingVad(vad_options)
+        self.stream(vad)
+
+        expected = get_speech_timestamps(self.audio, vad_options)
+        self.assertEqual(vad.get_speech_chunks(0, self.buffer.end), self.snap(expected))
+
+    def test_matches_get_speech_timestamps(self):
+        self.assert_matches_get_speech_timestamps(VadOptions(threshold=0.5))
+
+    def test_short_silences_are_split_like_get_speech_timestamps(self):
+        self.assert_matches_get_speech_timestamps(VadOptions(threshold=0.5, min_silence_duration_ms=200))
+
+    def test_long_speech_is_split_like_get_speech_timestamps(self):
+        self.assert_matches_get_speech_timestamps(VadOptions(threshold=0.5, max_speech_duration_s=3))
+
+    def test_chunks_are_aligned_on_feature_frames(self):
+        vad = StreamingVad({"threshold": 0.5})
+        self.stream(vad)
+
+        for start in (0, 12345, 40000):
+            chunks = vad.get_speech_chunks(start, self.buffer.end)
+            self.assertTrue(chunks)
+            for chunk in chunks:
+                self.assertEqual(chunk["start"] % vad.hop_length, 0)
+                if chunk["end"] != self.buffer.end - start:
+                    self.assertEqual(chunk["end"] % vad.hop_length, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from whisper_live.audio_buffer import AudioRingBuffer, SharedAudioRingBuffer
+from whisper_live.workers import RemoteClient, WorkerPool, run_worker
+
+
+class RecordingWorker:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(message)
+
+
+class ScriptedConnection:
+    """Pipe end receiving the scripted messages, then reporting the pipe closed."""
+    def __init__(self, received):
+        self.received = list(received)
+        self.sent = []
+
+    def recv(self):
+        if not self.received:
+            raise EOFError
+        return self.received.pop(0)
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.messages = []
+        self.closed = False
+
+    def send(self, message):
+        self.messages.append(json.loads(message))
+
+    def close(self):
+        self.closed = True
+
+
+class RemoteClientTest(unittest.TestCase):
+    def test_audio_notifications_are_coalesced(self):
+        pool = SimpleNamespace(min_new_audio=0.25, RATE=WorkerPool.RATE)
+        worker = RecordingWorker()
+        client = RemoteClient(pool, worker, 7, None, {"uid": "a"}, AudioRingBuffer(WorkerPool.RATE * 10))
+
+        # 100 ms frames, the worker is notified every 250 ms of audio
+        for _ in range(20):
+            client.add_frames(np.zeros(1600, dtype=np.float32))
+        self.assertEqual(worker.messages, [("audio", 7)] * 6)
+        self.assertEqual(client.notified_until, 18 * 1600)
+
+
+class OpenFailureTest(unittest.TestCase):
+    def test_worker_reports_an_invalid_model(self):
+        audio_buffer = SharedAudioRingBuffer(1600)
+        self.addCleanup(audio_buffer.close, unlink=True)
+        options = {
+            "uid": "a", "multilingual": False, "language": "en", "task": "transcribe",
+            "model_size": "huge", "use_custom_model": False,
+        }
+        conn = ScriptedConnection([("open", 3, options, audio_buffer.name, audio_buffer.capacity, None)])
+        run_worker(conn, 1, {})
+
+        self.assertEqual(conn.sent[0], ("ready", None, None))
+        command, session_id, message = conn.sent[1]
+        self.assertEqual((command, session_id), ("send", 3))
+        self.assertEqual(json.loads(message)["status"], "ERROR")
+        self.assertEqual(conn.sent[2], ("open_failed", 3, None))
+
+    def test_front_end_closes_the_failed_session(self):
+        pool = WorkerPool.__new__(WorkerPool)
+        pool.lock = threading.Lock()
+        pool.metrics = None
+        pool.stopping = True
+        pool.min_new_audio = 0.25
+        conn = ScriptedConnection([("open_failed", 7, "out of memory")])
+        worker = SimpleNamespace(conn=conn, sessions={}, ready=threading.Event(), process=None, send=conn.send)
+        websocket = RecordingWebSocket()
+        client = RemoteClient(pool, worker, 7, websocket, {"uid": "a", "model_size": "small"}, SharedAudioRingBuffer(1600))
+        worker.sessions[7] = client
+
+        pool._forward_results(worker)
+        self.assertEqual(websocket.messages, [{"uid": "a", "status": "ERROR", "message": "out of memory"}])
+        self.assertTrue(websocket.closed)
+        self.assertIsNone(client.model_size_or_path)
+        self.assertEqual(conn.sent, [("close", 7)])
+        self.assertEqual(worker.sessions, {})
+        # frames received before the connection handler noticed are dropped
+        client.add_frames(np.zeros(1600, dtype=np.float32))
+
+
+if __name__ == "__main__":
+    unittest.main()
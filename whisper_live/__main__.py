@@ -0,0 +1,76 @@
+import sys
+import logging
+import argparse
+
+from whisper_live.batch import OUTPUT_FORMATS, transcribe_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="whisper_live")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser('batch', help="Transcribe audio files offline with a pool of worker processes")
+    batch.add_argument('paths', nargs='+',
+                       help="Audio files, and directories searched recursively for audio files")
+    batch.add_argument('--output_dir', '-o', type=str, default=None,
+                       help="Directory of the outputs, next to the audio files by default")
+    batch.add_argument('--formats', type=str, nargs='+', default=list(OUTPUT_FORMATS), choices=OUTPUT_FORMATS,
+                       help="Output formats")
+    batch.add_argument('--model', type=str, default="small",
+                       help="Model size, e.g. small.en, or path to a converted model")
+    batch.add_argument('--workers', type=int, default=2,
+                       help="Number of worker processes, each with its own copy of the model")
+    batch.add_argument('--cpu_threads', type=int, default=None,
+                       help="CTranslate2 threads per worker, the number of cores divided by --workers by default")
+    batch.add_argument('--device', type=str, default="auto", choices=["auto", "cpu", "cuda"])
+    batch.add_argument('--compute_type', type=str, default="default",
+                       help="CTranslate2 compute type, e.g. int8 or float16")
+    batch.add_argument('--language', type=str, default=None,
+                       help="Language of the audio, detected per file by default")
+    batch.add_argument('--task', type=str, default="transcribe", choices=["transcribe", "translate"])
+    batch.add_argument('--beam_size', type=int, default=5)
+    batch.add_argument('--vad_filter', action='store_true',
+                       help="Skip the parts of the audio without speech")
+    batch.add_argument('--word_timestamps', action='store_true',
+                       help="Include word timestamps in the JSON output")
+    batch.add_argument('--initial_prompt', type=str, default=None)
+    batch.add_argument('--batch_size', type=int, default=None,
+                       help="Split each file at silences into windows of at most 30s and transcribe this many "
+                            "windows at a time, instead of one window after the other")
+    batch.add_argument('--cache_dir', type=str, default=None,
+                       help="Directory of the cached results, .whisper_live_cache in the output directory by default")
+    batch.add_argument('--no_cache', action='store_true',
+                       help="Transcribe all files again, even those with a cached result")
+    batch.add_argument('--offline', action='store_true',
+                       help="Only use a model already downloaded, never access the network")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    summary = transcribe_files(
+        args.paths,
+        output_dir=args.output_dir,
+        formats=args.formats,
+        model_size_or_path=args.model,
+        num_workers=args.workers,
+        cpu_threads=args.cpu_threads,
+        device=args.device,
+        compute_type=args.compute_type,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        local_files_only=args.offline,
+        language=args.language,
+        task=args.task,
+        beam_size=args.beam_size,
+        vad_filter=args.vad_filter,
+        word_timestamps=args.word_timestamps,
+        initial_prompt=args.initial_prompt,
+        batch_size=args.batch_size,
+    )
+    logging.info(
+        f"{summary['transcribed']} transcribed, {summary['cached']} cached, {summary['failed']} failed"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Fixed capacity buffer of audio samples addressed by absolute sample index.
+
+    Samples are stored twice, at `i % capacity` and `i % capacity + capacity`, so that any
+    range of up to `capacity` retained samples is available as a contiguous, zero-copy view
+    of the underlying array. Appending costs O(frame size) regardless of how much audio is
+    retained; the oldest samples are overwritten once more than `capacity` samples were appended.
+
+    Attributes:
+        capacity (int): Number of most recent samples retained.
+        data (numpy.ndarray): Mirrored storage of size 2 * capacity.
+        end (int): Absolute index one past the newest sample, i.e. the number of samples appended so far.
+    """
+    def __init__(self, capacity, dtype=np.float32, buffer=None):
+        """
+        Args:
+            capacity (int): Number of samples to retain.
+            dtype (numpy.dtype, optional): Sample type. Defaults to float32.
+            buffer (numpy.ndarray, optional): Preallocated storage of size 2 * capacity to use instead
+                                              of allocating a new array. Defaults to None.
+        """
+        self.capacity = int(capacity)
+        if buffer is None:
+            buffer = np.zeros(2 * self.capacity, dtype=dtype)
+        elif buffer.shape[0] != 2 * self.capacity:
+            raise ValueError(f"Expected a buffer of {2 * self.capacity} samples, got {buffer.shape[0]}")
+        self.data = buffer
+        self.end = 0
+
+    @property
+    def start(self):
+        """Absolute index of the oldest sample still retained."""
+        return max(0, self.end - self.capacity)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def append(self, samples):
+        """
+        Append samples to the buffer, overwriting the oldest ones if needed.
+
+        Args:
+            samples (numpy.ndarray): One dimensional array of samples.
+        """
+        n = samples.shape[0]
+        if n > self.capacity:
+            self.end += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+
+        pos = self.end % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = samples[:first]
+        self.data[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+        rest = n - first
+        if rest:
+            self.data[:rest] = samples[first:]
+            self.data[self.capacity:self.capacity + rest] = samples[first:]
+        self.end += n
+
+    def view(self, start, end=None):
+        """
+        Zero-copy view of the samples in [start, end).
+
+        The view aliases the buffer storage: it stays valid until `capacity - (end - start)` more
+        samples have been appended, which callers can check with `is_retained(start)`.
+
+        Args:
+            start (int): Absolute index of the first sample.
+            end (int, optional): Absolute index one past the last sample. Defaults to `self.end`.
+
+        Returns:
+            numpy.ndarray: The requested samples.
+
+        Raises:
+            ValueError: If the range is not retained in the buffer.
+        """
+        if end is None:
+            end = self.end
+        if start < self.start or end > self.end or start > end:
+            raise ValueError(
+                f"Samples [{start}, {end}) are not available, buffer holds [{self.start}, {self.end})"
+            )
+        pos = start % self.capacity
+        return self.data[pos:pos + end - start]
+
+    def is_retained(self, start):
+        """Whether the sample at absolute index `start` has not been overwritten yet."""
+        return start >= self.start
+
+
+class SharedAudioRingBuffer(AudioRingBuffer):
+    """
+    `AudioRingBuffer` stored in shared memory, so that one process appends audio and others read it.
+
+    The write position is kept in the shared segment next to the samples, so readers always see the
+    current `end` and `is_retained` stays exact across processes. Only the process that created the
+    buffer may append to it.
+
+    Attributes:
+        shm (multiprocessing.shared_memory.SharedMemory): Segment holding the write position and the samples.
+        name (str): Name of the segment, used by other processes to attach to the buffer.
+    """
+    HEADER_SIZE = 8
+
+    def __init__(self, capacity, name=None):
+        """
+        Args:
+            capacity (int): Number of samples to retain.
+            name (str, optional): Name of an existing buffer to attach to. Defaults to None, which creates
+                                  a new buffer.
+        """
+        from multiprocessing import shared_memory
+
+        self.capacity = int(capacity)
+        size = self.HEADER_SIZE + 2 * self.capacity * np.dtype(np.float32).itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((2 * self.capacity,), dtype=np.float32, buffer=self.shm.buf, offset=self.HEADER_SIZE)
+        if name is None:
+            self.header[0] = 0
+
+    @property
+    def end(self):
+        return int(self.header[0])
+
+    @end.setter
+    def end(self, value):
+        self.header[0] = value
+
+    def close(self, unlink=False):
+        """
+        Detach from the shared segment, and destroy it if `unlink` is set. Views returned by `view` must not be
+        used afterwards.
+        """
+        self.header = None
+        self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # a view is still referenced somewhere, the mapping is released with it
+            pass
+        if unlink:
+            self.shm.unlink()
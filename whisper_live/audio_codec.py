@@ -0,0 +1,170 @@
+import struct
+
+import numpy as np
+
+# encodings a client can announce with "audio_encoding" in its handshake
+AUDIO_ENCODINGS = ("float32", "int16", "opus")
+
+# Opus frames of 20 ms, the shortest duration that keeps the codec efficient for speech
+OPUS_FRAME_SAMPLES = 320
+# largest frame an Opus packet can hold at 16 kHz (120 ms)
+OPUS_MAX_FRAME_SAMPLES = 1920
+OPUS_LENGTH_PREFIX = struct.Struct("<H")
+
+
+def load_opuslib():
+    """Import `opuslib`, the optional dependency needed for the "opus" encoding."""
+    try:
+        import opuslib
+    except Exception as e:
+        # opuslib raises a bare Exception when the libopus shared library is missing
+        raise ImportError(
+            "The opus audio encoding requires the opuslib package and the libopus library. "
+            "Install them with `pip install opuslib` and your system package manager."
+        ) from e
+    return opuslib
+
+
+class Float32Decoder:
+    """Decodes raw float32 PCM, the legacy wire format."""
+    def decode(self, data):
+        return np.frombuffer(data, dtype=np.float32)
+
+
+class Int16Decoder:
+    """Decodes raw 16-bit PCM into float32 samples normalized between -1 and 1."""
+    def decode(self, data):
+        return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class OpusDecoder:
+    """
+    Decodes messages made of Opus packets, each preceded by its length as a little-endian uint16.
+
+    Attributes:
+        sample_rate (int): Sampling rate of the stream.
+        decoder (opuslib.Decoder): Stateful Opus decoder of the stream.
+    """
+    def __init__(self, sample_rate=16000):
+        opuslib = load_opuslib()
+        self.sample_rate = sample_rate
+        self.decoder = opuslib.Decoder(sample_rate, 1)
+
+    def decode(self, data):
+        pcm = []
+        for packet in split_opus_packets(data):
+            pcm.append(self.decoder.decode(packet, OPUS_MAX_FRAME_SAMPLES))
+        return np.frombuffer(b"".join(pcm), dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class Float32Encoder:
+    """Encodes 16-bit PCM as float32 PCM, the legacy wire format."""
+    def encode(self, pcm):
+        return [(np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0).tobytes()]
+
+
+class Int16Encoder:
+    """Sends 16-bit PCM as is."""
+    def encode(self, pcm):
+        return [bytes(pcm)]
+
+
+class OpusEncoder:
+    """
+    Encodes 16-bit PCM into messages of length prefixed Opus packets.
+
+    Opus only encodes fixed size frames, samples that do not fill a whole frame are kept for the
+    next call.
+
+    Attributes:
+        sample_rate (int): Sampling rate of the stream.
+        encoder (opuslib.Encoder): Stateful Opus encoder of the stream.
+        pending (bytes): PCM not encoded yet.
+    """
+    def __init__(self, sample_rate=16000):
+        opuslib = load_opuslib()
+        self.sample_rate = sample_rate
+        self.encoder = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_VOIP)
+        self.pending = b""
+
+    def encode(self, pcm):
+        self.pending += bytes(pcm)
+        frame_bytes = OPUS_FRAME_SAMPLES * 2
+        n_frames = len(self.pending) // frame_bytes
+        if not n_frames:
+            return []
+        packets = [
+            self.encoder.encode(self.pending[i * frame_bytes:(i + 1) * frame_bytes], OPUS_FRAME_SAMPLES)
+            for i in range(n_frames)
+        ]
+        self.pending = self.pending[n_frames * frame_bytes:]
+        return [join_opus_packets(packets)]
+
+
+def join_opus_packets(packets):
+    """Concatenate Opus packets into one message, each preceded by its length."""
+    return b"".join(OPUS_LENGTH_PREFIX.pack(len(packet)) + packet for packet in packets)
+
+
+def split_opus_packets(data):
+    """
+    Split a message built by `join_opus_packets` into its Opus packets.
+
+    Raises:
+        ValueError: If the message is truncated.
+    """
+    packets = []
+    offset = 0
+    while offset < len(data):
+        if offset + OPUS_LENGTH_PREFIX.size > len(data):
+            raise ValueError("Truncated Opus packet length")
+        (length,) = OPUS_LENGTH_PREFIX.unpack_from(data, offset)
+        offset += OPUS_LENGTH_PREFIX.size
+        if offset + length > len(data):
+            raise ValueError("Truncated Opus packet")
+        packets.append(bytes(data[offset:offset + length]))
+        offset += length
+    return packets
+
+
+def get_audio_decoder(encoding, sample_rate=16000):
+    """
+    Returns the server side decoder of an audio encoding.
+
+    Args:
+        encoding (str): One of `AUDIO_ENCODINGS`.
+        sample_rate (int, optional): Sampling rate of the stream. Defaults to 16000.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+        ImportError: If the encoding needs an optional dependency that is not installed.
+    """
+    if encoding == "float32":
+        return Float32Decoder()
+    if encoding == "int16":
+        return Int16Decoder()
+    if encoding == "opus":
+        return OpusDecoder(sample_rate)
+    raise ValueError(f"Unsupported audio encoding {encoding}. Available choices: {list(AUDIO_ENCODINGS)}")
+
+
+def get_audio_encoder(encoding, sample_rate=16000):
+    """
+    Returns the client side encoder of an audio encoding, which turns 16-bit PCM into the messages
+    to send.
+
+    Args:
+        encoding (str): One of `AUDIO_ENCODINGS`.
+        sample_rate (int, optional): Sampling rate of the stream. Defaults to 16000.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+        ImportError: If the encoding needs an optional dependency that is not installed.
+    """
+    if encoding == "float32":
+        return Float32Encoder()
+    if encoding == "int16":
+        return Int16Encoder()
+    if encoding == "opus":
+        return OpusEncoder(sample_rate)
+    raise ValueError(f"Unsupported audio encoding {encoding}. Available choices: {list(AUDIO_ENCODINGS)}")
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from faster_whisper.utils import format_timestamp
+
+# extensions picked up when a directory is given, other files can be listed explicitly
+AUDIO_EXTENSIONS = (
+    ".wav", ".flac", ".mp3", ".m4a", ".ogg", ".opus", ".webm", ".mp4", ".mkv", ".aac", ".wma",
+)
+OUTPUT_FORMATS = ("json", "srt", "vtt")
+# bump when the layout of the cached results changes
+CACHE_VERSION = 1
+
+_model = None
+
+
+def find_audio_files(paths, extensions=AUDIO_EXTENSIONS):
+    """
+    Expand the files and directories given on the command line into the audio files to transcribe.
+
+    Args:
+        paths (list): Files and directories. Directories are searched recursively for files with one of
+                      `extensions`, files are always included.
+        extensions (tuple, optional): Audio file extensions, lower case. Defaults to `AUDIO_EXTENSIONS`.
+
+    Returns:
+        list: `(path, relative_path)` tuples, sorted. `relative_path` is the path of the file inside the
+              directory it was found in, its name otherwise, and names its outputs. It is unique: files that
+              would share one, e.g. files with the same name listed from different directories, get a numbered
+              suffix in the order of their paths.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    if name.lower().endswith(extensions):
+                        file_path = os.path.normpath(os.path.join(root, name))
+                        files.append((file_path, os.path.relpath(file_path, path)))
+        elif os.path.isfile(path):
+            files.append((os.path.normpath(path), os.path.basename(path)))
+        else:
+            logging.error(f"[ERROR]: {path} does not exist, skipping it.")
+
+    unique_files = []
+    used = set()
+    for path, relative_path in sorted(set(files)):
+        name, extension = os.path.splitext(relative_path)
+        candidate = relative_path
+        suffix = 1
+        while candidate in used:
+            candidate = f"{name}-{suffix}{extension}"
+            suffix += 1
+        used.add(candidate)
+        unique_files.append((path, candidate))
+    return unique_files
+
+
+def resolve_device(device):
+    """Returns the device "auto" selects, "cuda" if a CUDA device is available and "cpu" otherwise."""
+    if device != "auto":
+        return device
+    import ctranslate2
+
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+
+def get_file_hash(path, chunk_size=1 << 20):
+    """Returns the SHA-256 of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_key(file_hash, options):
+    """Returns the key of the cached result of a file content transcribed with `options`."""
+    fingerprint = json.dumps({"version": CACHE_VERSION, "options": options}, sort_keys=True)
+    return hashlib.sha256(f"{file_hash}:{fingerprint}".encode("utf-8")).hexdigest()
+
+
+def _init_worker(model_size_or_path, device, compute_type, cpu_threads, download_root, local_files_only):
+    """Load the model of a worker process once, before it transcribes its first file."""
+    global _model
+    from whisper_live.transcriber import WhisperModel
+
+    logging.basicConfig(level=logging.INFO)
+    _model = WhisperModel(
+        model_size_or_path,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        download_root=download_root,
+        local_files_only=local_files_only,
+    )
+
+
+def _transcribe_file(path, options):
+    """
+    Transcribe one file with the model of the worker process.
+
+    Returns:
+        dict: The language, duration and segments of the file, with the processing time in seconds.
+    """
+    start = time.time()
+    segments, info = _model.transcribe(path, **options)
+    result = {
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "duration": info.duration,
+        "segments": [],
+    }
+    for segment in segments:
+        item = {
+            "id": segment.id,
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text.strip(),
+            "avg_logprob": segment.avg_logprob,
+            "no_speech_prob": segment.no_speech_prob,
+        }
+        if segment.words is not None:
+            item["words"] = [word._asdict() for word in segment.words]
+        result["segments"].append(item)
+    result["processing_time"] = time.time() - start
+    return result
+
+
+def format_srt(segments):
+    """Returns the segments of a result as SubRip subtitles."""
+    blocks = []
+    for i, segment in enumerate(segments, start=1):
+        start = format_timestamp(segment["start"], always_include_hours=True, decimal_marker=",")
+        end = format_timestamp(segment["end"], always_include_hours=True, decimal_marker=",")
+        blocks.append(f"{i}\n{start} --> {end}\n{segment['text']}\n")
+    return "\n".join(blocks)
+
+
+def format_vtt(segments):
+    """Returns the segments of a result as WebVTT subtitles."""
+    blocks = ["WEBVTT\n"]
+    for segment in segments:
+        start = format_timestamp(segment["start"], always_include_hours=True)
+        end = format_timestamp(segment["end"], always_include_hours=True)
+        blocks.append(f"{start} --> {end}\n{segment['text']}\n")
+    return "\n".join(blocks)
+
+
+def _write_atomic(path, text):
+    """Write a file through a temporary file, so that an interrupted run never leaves a truncated output."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_outputs(result, output_base, formats):
+    """
+    Write the outputs of a result.
+
+    Args:
+        result (dict): The result of a file.
+        output_base (str): Output path without extension, e.g. `out/talks/intro` for `out/talks/intro.srt`.
+        formats (list): Output formats, from `OUTPUT_FORMATS`.
+    """
+    for output_format in formats:
+        if output_format == "json":
+            text = json.dumps(result, indent=2, ensure_ascii=False)
+        elif output_format == "srt":
+            text = format_srt(result["segments"])
+        elif output_format == "vtt":
+            text = format_vtt(result["segments"])
+        else:
+            raise ValueError(f"Unsupported output format {output_format}. Available choices: {list(OUTPUT_FORMATS)}")
+        _write_atomic(f"{output_base}.{output_format}", text)
+
+
+def transcribe_files(
+    paths,
+    output_dir=None,
+    formats=("json", "srt", "vtt"),
+    model_size_or_path="small",
+    num_workers=2,
+    cpu_threads=None,
+    device="auto",
+    compute_type="default",
+    cache_dir=None,
+    use_cache=True,
+    download_root=None,
+    local_files_only=False,
+    **transcribe_options,
+):
+    """
+    Transcribe audio files offline, as fast as the hardware allows.
+
+    Files are distributed across `num_workers` worker processes, each with its own copy of the model. Every result
+    is stored in a cache keyed by the content hash of the file, the model, device and compute type and the
+    transcription options, so that re-running the command on a grown archive only transcribes the new or modified
+    files; cached results are still written to the outputs.
+
+    Args:
+        paths (list): Audio files and directories to search for audio files.
+        output_dir (str, optional): Directory of the outputs, mirroring the layout of the input directories.
+                                    Defaults to None, which writes the outputs next to the audio files.
+        formats (tuple, optional): Output formats, from `OUTPUT_FORMATS`. Defaults to all of them.
+        model_size_or_path (str, optional): Model to load in every worker. Defaults to "small".
+        num_workers (int, optional): Number of worker processes. Defaults to 2.
+        cpu_threads (int, optional): Number of CTranslate2 threads per worker. Defaults to the number of cores
+                                     divided by the number of workers.
+        device (str, optional): "cpu", "cuda" or "auto". Defaults to "auto".
+        compute_type (str, optional): CTranslate2 compute type. Defaults to "default".
+        cache_dir (str, optional): Directory of the cached results. Defaults to `.whisper_live_cache` inside
+                                   `output_dir`, or the current directory.
+        use_cache (bool, optional): Skip the files with a cached result. Results are cached either way.
+                                    Defaults to True.
+        download_root (str, optional): Directory where the model is downloaded.
+        local_files_only (bool, optional): Only use a model already downloaded.
+        **transcribe_options: Keyword arguments of `WhisperModel.transcribe`, e.g. `language` or `beam_size`. They
+                              are part of the cache key.
+
+    Returns:
+        dict: Number of files `transcribed`, served from the `cached` results and `failed`.
+    """
+    for output_format in formats:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {output_format}. Available choices: {list(OUTPUT_FORMATS)}")
+    if cache_dir is None:
+        cache_dir = os.path.join(output_dir or ".", ".whisper_live_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // num_workers)
+
+    # the compute type a model runs with depends on the device, e.g. for "default"
+    device = resolve_device(device)
+    cache_options = dict(transcribe_options, model=model_size_or_path, device=device, compute_type=compute_type)
+    summary = {"transcribed": 0, "cached": 0, "failed": 0}
+    pending = []
+
+    def output_base(path, relative_path):
+        if output_dir is None:
+            return os.path.splitext(path)[0]
+        return os.path.join(output_dir, os.path.splitext(relative_path)[0])
+
+    for path, relative_path in find_audio_files(paths):
+        try:
+            file_hash = get_file_hash(path)
+        except OSError as e:
+            logging.error(f"[ERROR]: Failed to read {path}: {e}")
+            summary["failed"] += 1
+            continue
+        cache_path = os.path.join(cache_dir, f"{get_cache_key(file_hash, cache_options)}.json")
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    result = json.load(f)
+                result["file"] = path
+                write_outputs(result, output_base(path, relative_path), formats)
+                summary["cached"] += 1
+                continue
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable cached result of {path}: {e}")
+        pending.append((path, output_base(path, relative_path), file_hash, cache_path))
+
+    logging.info(f"{summary['cached']} files cached, {len(pending)} to transcribe with {num_workers} workers")
+    if not pending:
+        return summary
+
+    start = time.time()
+    audio_seconds = 0.0
+    # CTranslate2 does not survive a fork, start clean interpreters
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=min(num_workers, len(pending)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(model_size_or_path, device, compute_type, cpu_threads, download_root, local_files_only),
+    ) as executor:
+        futures = {
+            executor.submit(_transcribe_file, path, transcribe_options): (path, base, file_hash, cache_path)
+            for path, base, file_hash, cache_path in pending
+        }
+        for future in as_completed(futures):
+            path, base, file_hash, cache_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"[ERROR]: Failed to transcribe {path}: {e}")
+                summary["failed"] += 1
+                continue
+
+            result.update(file=path, sha256=file_hash, options=cache_options)
+            _write_atomic(cache_path, json.dumps(result, ensure_ascii=False))
+            write_outputs(result, base, formats)
+            summary["transcribed"] += 1
+            audio_seconds += result["duration"]
+            logging.info(
+                f"[{summary['transcribed'] + summary['failed']}/{len(pending)}] {path}: "
+                f"{result['duration']:.1f}s of audio in {result['processing_time']:.1f}s"
+            )
+
+    elapsed = time.time() - start
+    logging.info(
+        f"Transcribed {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+        f"({audio_seconds / max(elapsed, 1e-6):.1f}x real time)"
+    )
+    return summary
@@ -14,6 +14,8 @@ import time
 
 from typing import Callable
 
+from whisper_live.audio_codec import get_audio_encoder
+
 
 def resample(file: str, sr: int = 16000):
     """
@@ -67,6 +69,8 @@ class Client:
         use_custom_model=False,
         callback: Callable[[frozenset[str]], any]=None,
         replay_playback: bool=False,
+        audio_encoding="float32",
+        protocol_version=2,
     ):
         """
         Initializes a Client instance for audio recording and streaming to a server.
@@ -81,6 +85,13 @@ class Client:
             is_multilingual (bool, optional): Specifies if multilingual transcription is enabled. Default is False.
             lang (str, optional): The selected language for transcription when multilingual is disabled. Default is None.
             translate (bool, optional): Specifies if the task is translation. Default is False.
+            audio_encoding (str, optional): Wire format of the audio, "float32", "int16" or "opus". "int16" halves
+                                            and "opus" cuts the bandwidth by about 10x compared to "float32", which
+                                            older servers expect. Default is "float32".
+            protocol_version (int, optional): Format of the segment messages requested from the server. With 2 the
+                                              server only sends new segments instead of the last 10 on every update.
+                                              Servers that do not support it keep sending version 1 messages, which
+                                              are handled as well. Default is 2.
         """
         self.chunk = 1024
         self.format = pyaudio.paInt16
@@ -102,6 +113,12 @@ class Client:
         self.use_custom_model = use_custom_model
         self.callback = callback
         self.replay_playback = replay_playback
+        self.audio_encoding = audio_encoding
+        self.audio_encoder = get_audio_encoder(audio_encoding, 16000)
+        self.protocol_version = protocol_version
+        self.transcript = []
+        self.partial = None
+        self.resync_pending = False
 
         if translate:
             self.task = "translate"
@@ -170,6 +187,11 @@ class Client:
                 print(
                     f"[INFO]:Server is full. Estimated wait time {round(message['message'])} minutes."
                 )
+            elif message["status"] == "QUEUED":
+                print(
+                    f"[INFO]:Server is full. Position in queue {message['position']}, "
+                    f"estimated wait time {round(message['message'])} minutes."
+                )
             elif message["status"] == "ERROR":
                 print(f"Message from Server: {message['message']}")
                 self.server_error = True
@@ -191,17 +213,59 @@ class Client:
             )
             return
 
+        if "committed" in keys:
+            self.update_transcript(message)
+            segments = self.transcript[-3:]
+            if self.partial is not None:
+                segments = segments + [self.partial]
+            self.display_segments_text(segments)
+            return
+
         if "segments" not in keys:
             return
 
-        message = message["segments"]
+        self.display_segments_text(message["segments"])
+
+    def update_transcript(self, message):
+        """
+        Apply a protocol version 2 message to the local copy of the transcript.
+
+        Committed segments carry their position in the transcript. If a segment is missing, e.g. after a
+        message was lost, a resync of the whole transcript is requested from the server, once until the
+        resynced transcript arrives.
+
+        Args:
+            message (dict): Message with the "committed" segments and the current "partial" segment.
+        """
+        if message.get("resync"):
+            self.transcript = []
+            self.resync_pending = False
+        for seg in message["committed"]:
+            if seg["id"] < len(self.transcript):
+                self.transcript[seg["id"]] = seg
+            elif seg["id"] == len(self.transcript):
+                self.transcript.append(seg)
+            else:
+                if not self.resync_pending:
+                    print("[WARN]: Missed transcript segments, requesting a resync.")
+                    self.client_socket.send(json.dumps({"type": "resync"}))
+                    self.resync_pending = True
+                break
+        self.partial = message["partial"]
+
+    def display_segments_text(self, segments):
+        """
+        Print the text of the latest segments and pass it to the callback if it changed.
+
+        Args:
+            segments (list): Segments, oldest first.
+        """
         text = []
-        if len(message):
-            for seg in message:
-                if text and text[-1] == seg["text"]:
-                    # already got it
-                    continue
-                text.append(seg["text"])
+        for seg in segments:
+            if text and text[-1] == seg["text"]:
+                # already got it
+                continue
+            text.append(seg["text"])
         # keep only last 3
         if len(text) > 3:
             text = text[-3:]
@@ -247,7 +311,9 @@ class Client:
                     "language": self.language,
                     "task": self.task,
                     "model_size": self.model_size,
-                    "use_custom_model": self.use_custom_model   # if runnning your own server with a custom model
+                    "use_custom_model": self.use_custom_model,   # if runnning your own server with a custom model
+                    "audio_encoding": self.audio_encoding,
+                    "protocol_version": self.protocol_version,
                 }
             )
         )
@@ -282,6 +348,16 @@ class Client:
         except Exception as e:
             print(e)
 
+    def send_audio(self, audio_bytes):
+        """
+        Encode 16-bit PCM audio in the negotiated audio encoding and send it to the server.
+
+        Args:
+            audio_bytes (bytes): Audio data in 16-bit PCM format.
+        """
+        for message in self.audio_encoder.encode(audio_bytes):
+            self.send_packet_to_server(message)
+
     def play_file(self, filename):
         """
         Play an audio file and send it to the server for processing.
@@ -313,8 +389,7 @@ class Client:
                     if data == b"":
                         break
 
-                    audio_array = self.bytes_to_float_array(data)
-                    self.send_packet_to_server(audio_array.tobytes())
+                    self.send_audio(data)
                     
                     if self.replay_playback:
                         self.stream.write(data)
@@ -405,8 +480,7 @@ class Client:
                 in_bytes = process.stdout.read(self.chunk * 2)  # 2 bytes per sample
                 if not in_bytes:
                     break
-                audio_array = self.bytes_to_float_array(in_bytes)
-                self.send_packet_to_server(audio_array.tobytes())
+                self.send_audio(in_bytes)
 
         except Exception as e:
             print(f"[ERROR]: Failed to connect to HLS stream: {e}")
@@ -444,9 +518,7 @@ class Client:
                 data = self.stream.read(self.chunk, exception_on_overflow = False)
                 self.frames += data
 
-                audio_array = Client.bytes_to_float_array(data)
-
-                self.send_packet_to_server(audio_array.tobytes())
+                self.send_audio(data)
 
                 # save frames if more than a minute
                 if len(self.frames) > 60 * self.rate:
@@ -523,6 +595,7 @@ class TranscriptionClient:
         is_multilingual (bool, optional): Indicates whether the transcription should support multiple languages (default is False).
         lang (str, optional): The primary language for transcription (used if `is_multilingual` is False). Default is None, which defaults to English ('en').
         translate (bool, optional): Indicates whether translation tasks are required (default is False).
+        audio_encoding (str, optional): Wire format of the audio sent to the server, "float32", "int16" or "opus" (default is "float32").
 
     Attributes:
         client (Client): An instance of the underlying Client class responsible for handling the WebSocket connection.
@@ -545,8 +618,12 @@ class TranscriptionClient:
         use_custom_model=False,
         callback: Callable[[frozenset[str]], any]=None,
         replay_playback: bool=False,
+        audio_encoding="float32",
     ):
-        self.client = Client(host, port, is_multilingual, lang, translate, model_size, use_custom_model, callback, replay_playback)
+        self.client = Client(
+            host, port, is_multilingual, lang, translate, model_size, use_custom_model, callback, replay_playback,
+            audio_encoding,
+        )
 
     def __call__(self, audio=None, hls_url=None):
         """
@@ -0,0 +1,112 @@
+import logging
+
+
+class DecodingPolicy:
+    """
+    Picks the decoding options of a client's transcription passes from how well the server keeps up with it.
+
+    Every pass reports its real-time factor (processing time over the duration of the new audio it covered)
+    and the backlog it started with (audio received but not processed yet). A client whose transcription thread
+    is busy all the time runs each pass over the audio that arrived during the previous one, so its real-time
+    factor stays close to 1 even when it keeps up: on its own, a real-time factor around 1 is not a sign of
+    overload. The client falls behind when its backlog grows from pass to pass, i.e. when passes are slower than
+    real time for `degrade_passes` consecutive passes, or when the smoothed backlog exceeds `degrade_backlog`.
+    Decoding then steps down one level at a time: smaller beams, fewer fallback temperatures, then greedy
+    decoding without fallback or word timestamps. Once the backlog stays small and stops growing for
+    `restore_passes` consecutive passes, quality is restored one level at a time. Changes are at least
+    `hold_passes` passes apart so that a level is measured before it is changed again.
+
+    Attributes:
+        LEVELS (list): Keyword arguments of `WhisperModel.transcribe` for every level, from best to cheapest.
+        level (int): Current level, an index into `LEVELS`.
+        rtf (float): Smoothed real-time factor.
+        backlog (float): Smoothed backlog in seconds.
+        degrade_rtf (float): Real-time factor of a pass above which the backlog is considered growing.
+        degrade_passes (int): Number of consecutive passes with a growing backlog before degrading one level.
+        degrade_backlog (float): Smoothed backlog in seconds above which decoding is degraded.
+        restore_backlog (float): Smoothed backlog in seconds below which decoding quality can be restored.
+        restore_passes (int): Number of consecutive low load passes before restoring one level.
+        hold_passes (int): Minimum number of passes between two level changes.
+        smoothing (float): Weight of the newest measurement in the moving averages.
+        growing_passes (int): Number of consecutive passes slower than `degrade_rtf`.
+    """
+    LEVELS = [
+        {"beam_size": 5, "best_of": 5, "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0], "word_timestamps": True},
+        {"beam_size": 3, "best_of": 3, "temperature": [0.0, 0.4, 0.8], "word_timestamps": True},
+        {"beam_size": 1, "best_of": 1, "temperature": [0.0, 0.6], "word_timestamps": False},
+        {"beam_size": 1, "best_of": 1, "temperature": [0.0], "word_timestamps": False},
+    ]
+
+    def __init__(
+        self,
+        degrade_rtf=1.1,
+        degrade_passes=5,
+        degrade_backlog=3.0,
+        restore_backlog=1.0,
+        restore_passes=10,
+        hold_passes=3,
+        smoothing=0.3,
+    ):
+        self.degrade_rtf = degrade_rtf
+        self.degrade_passes = degrade_passes
+        self.degrade_backlog = degrade_backlog
+        self.restore_backlog = restore_backlog
+        self.restore_passes = restore_passes
+        self.hold_passes = hold_passes
+        self.smoothing = smoothing
+        self.level = 0
+        self.rtf = 0.0
+        self.backlog = 0.0
+        self.growing_passes = 0
+        self.low_load_passes = 0
+        self.passes_since_change = 0
+
+    def options(self, word_timestamps=False):
+        """
+        Returns the keyword arguments of `WhisperModel.transcribe` for the current level.
+
+        Args:
+            word_timestamps (bool, optional): Whether the client wants word timestamps, which are dropped at the
+                                              cheaper levels. Defaults to False.
+        """
+        options = dict(self.LEVELS[self.level])
+        options["word_timestamps"] = word_timestamps and options["word_timestamps"]
+        return options
+
+    def update(self, rtf, backlog):
+        """
+        Record the load measured by a transcription pass and adjust the level.
+
+        Args:
+            rtf (float): Real-time factor of the pass. Above 1, more audio arrived during the pass than it processed.
+            backlog (float): Seconds of audio received but not processed when the pass started.
+
+        Returns:
+            int: The level for the next pass.
+        """
+        self.rtf += self.smoothing * (rtf - self.rtf)
+        self.backlog += self.smoothing * (backlog - self.backlog)
+        self.passes_since_change += 1
+
+        self.growing_passes = self.growing_passes + 1 if rtf > self.degrade_rtf else 0
+
+        overloaded = self.growing_passes >= self.degrade_passes or self.backlog > self.degrade_backlog
+        low_load = self.growing_passes == 0 and self.backlog < self.restore_backlog
+        self.low_load_passes = self.low_load_passes + 1 if low_load else 0
+
+        if self.passes_since_change < self.hold_passes:
+            return self.level
+        if overloaded and self.level < len(self.LEVELS) - 1:
+            self.set_level(self.level + 1)
+        elif self.low_load_passes >= self.restore_passes and self.level > 0:
+            self.set_level(self.level - 1)
+        return self.level
+
+    def set_level(self, level):
+        logging.info(
+            f"Decoding level {self.level} -> {level} (real-time factor {self.rtf:.2f}, backlog {self.backlog:.2f}s)"
+        )
+        self.level = level
+        self.growing_passes = 0
+        self.low_load_passes = 0
+        self.passes_since_change = 0
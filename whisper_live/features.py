@@ -0,0 +1,185 @@
+import numpy as np
+
+# log10 of the clipped mel energy of digital silence, i.e. of the padding appended to every window
+SILENCE_LOG_MEL = -10.0
+
+
+class StreamingFeatureExtractor:
+    """
+    Incremental log-mel spectrogram of a growing audio stream.
+
+    Whisper's `FeatureExtractor` recomputes the STFT of the whole window on every call, although
+    in streaming only the last second or so of the window is new. This class caches the log10
+    mel frames of audio already seen, addressed by absolute frame index (sample index // hop length),
+    and only computes frames for newly appended samples.
+
+    Frames whose FFT window extends past the newest sample are recomputed on every call with the
+    missing samples zero padded, which is what `FeatureExtractor` sees once the 30 seconds of padding
+    have been appended. Frames are cached as raw log10 energies; the dynamic range normalization
+    depends on the whole window and is applied by `pad_log_mel`.
+
+    Attributes:
+        n_fft (int): FFT size.
+        hop_length (int): Number of samples between frames.
+        mel_filters (numpy.ndarray): Mel filterbank of the model.
+        capacity (int): Maximum number of cached frames.
+        cache (numpy.ndarray): Cached frames, column `i` holds frame `cache_start + i`.
+        cache_start (int): Absolute index of the first cached frame.
+        cache_end (int): Absolute index one past the last cached frame.
+    """
+    def __init__(self, feature_extractor, capacity):
+        """
+        Args:
+            feature_extractor (FeatureExtractor): Feature extractor of the model, used for its parameters.
+            capacity (int): Maximum number of samples the cached frames span, usually the retention
+                            of the audio buffer.
+        """
+        self.n_fft = feature_extractor.n_fft
+        self.hop_length = feature_extractor.hop_length
+        self.mel_filters = feature_extractor.mel_filters
+        self.window = np.hanning(self.n_fft + 1)[:-1]
+        self.capacity = capacity // self.hop_length + 1
+        self.cache = np.zeros((self.mel_filters.shape[0], self.capacity), dtype=np.float32)
+        self.cache_start = 0
+        self.cache_end = 0
+
+    def align(self, sample):
+        """Returns the first sample of the frame containing `sample`."""
+        return sample - sample % self.hop_length
+
+    def compute_frames(self, audio_buffer, first_frame, last_frame):
+        """
+        Compute log10 mel frames [first_frame, last_frame) from the audio buffer.
+
+        Samples before the start of the stream are reflected, like `FeatureExtractor` does, and samples
+        not received yet are zeros.
+
+        Returns:
+            numpy.ndarray: Frames of shape (n_mels, last_frame - first_frame).
+        """
+        n_frames = last_frame - first_frame
+        if n_frames <= 0:
+            return np.zeros((self.mel_filters.shape[0], 0), dtype=np.float32)
+
+        half_window = self.n_fft // 2
+        start = first_frame * self.hop_length - half_window
+        end = (last_frame - 1) * self.hop_length + half_window
+
+        available_start = max(start, audio_buffer.start, 0)
+        available_end = min(end, audio_buffer.end)
+        samples = audio_buffer.view(available_start, max(available_start, available_end))
+        pad_left = available_start - start
+        pad_right = end - max(available_start, available_end)
+        if pad_left and start < 0 and samples.shape[0] > pad_left:
+            left = samples[1:pad_left + 1][::-1]
+            pad_left -= left.shape[0]
+            samples = np.concatenate((left, samples))
+        if pad_left or pad_right:
+            samples = np.pad(samples, (pad_left, pad_right))
+
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.n_fft)[::self.hop_length]
+        stft = np.fft.rfft(frames * self.window, axis=-1)
+        magnitudes = np.abs(stft) ** 2
+        mel_spec = self.mel_filters @ magnitudes.T
+        return np.log10(np.clip(mel_spec, a_min=1e-10, a_max=None)).astype(np.float32)
+
+    def discard_before(self, sample):
+        """
+        Drop cached frames that start before `sample`, e.g. once the transcription offset moved past them.
+        """
+        first_frame = sample // self.hop_length
+        if first_frame <= self.cache_start:
+            return
+        keep = max(0, self.cache_end - first_frame)
+        if keep:
+            src = first_frame - self.cache_start
+            self.cache[:, :keep] = self.cache[:, src:src + keep]
+        self.cache_start = first_frame
+        self.cache_end = first_frame + keep
+
+    def get_log_mel(self, audio_buffer, start, end):
+        """
+        Log10 mel frames of the audio in [start, end), computing only the frames not cached yet.
+
+        Args:
+            audio_buffer (AudioRingBuffer): Buffer holding the stream.
+            start (int): Absolute index of the first sample of the window, a multiple of `hop_length`.
+            end (int): Absolute index one past the last sample of the window.
+
+        Returns:
+            numpy.ndarray: Frames of shape (n_mels, n) covering the window, including the trailing frames
+                           that overlap the end of the window.
+        """
+        self.discard_before(start)
+        first_frame = start // self.hop_length
+        if first_frame < self.cache_start or first_frame > self.cache_end:
+            # the window starts outside of the cache, start over
+            self.cache_start = self.cache_end = first_frame
+
+        # frames fully covered by received audio never change
+        stable_end = (end - self.n_fft // 2) // self.hop_length + 1
+        if stable_end > self.cache_end:
+            if stable_end - self.cache_start > self.capacity:
+                raise ValueError(
+                    f"Window of {end - start} samples exceeds the feature cache capacity"
+                )
+            new_frames = self.compute_frames(audio_buffer, self.cache_end, stable_end)
+            offset = self.cache_end - self.cache_start
+            self.cache[:, offset:offset + new_frames.shape[1]] = new_frames
+            self.cache_end = stable_end
+
+        # frames overlapping the end of the window are recomputed with zero padding
+        last_frame = -(-(end + self.n_fft // 2) // self.hop_length)
+        tail = self.compute_frames(audio_buffer, max(self.cache_end, first_frame), last_frame)
+        cached = self.cache[:, first_frame - self.cache_start:self.cache_end - self.cache_start]
+        return np.concatenate((cached, tail), axis=1)
+
+
+def pad_log_mel(log_mel, n_frames):
+    """
+    Pad log10 mel frames to `n_frames` with frames of silence and apply Whisper's dynamic range
+    normalization, which gives the output of `FeatureExtractor` for the same audio.
+
+    Args:
+        log_mel (numpy.ndarray): Log10 mel frames of shape (n_mels, n).
+        n_frames (int): Number of frames of the output, i.e. the audio frames plus the padding frames.
+
+    Returns:
+        numpy.ndarray: Normalized features of shape (n_mels, n_frames).
+    """
+    features = np.full((log_mel.shape[0], n_frames), SILENCE_LOG_MEL, dtype=np.float32)
+    n = min(n_frames, log_mel.shape[1])
+    features[:, :n] = log_mel[:, :n]
+    features = np.maximum(features, features.max() - 8.0)
+    return (features + 4.0) / 4.0
+
+
+def collect_log_mel_chunks(log_mel, chunks, hop_length, n_samples=None):
+    """
+    Select the frames of the speech chunks found by the VAD, the counterpart of `collect_chunks`
+    for precomputed features.
+
+    Chunk boundaries must be multiples of `hop_length`, as returned by `StreamingVad`, except for an end
+    at the end of the window. The frames then match the features of the collected audio, apart from the
+    frames less than `n_fft / 2` samples away from a junction between two chunks, which see the audio
+    around the chunks instead of the other chunk.
+
+    Args:
+        log_mel (numpy.ndarray): Log10 mel frames of the whole window, as returned by `get_log_mel`.
+        chunks (list): Speech chunks with "start" and "end" sample indices relative to the window.
+        hop_length (int): Number of samples between frames.
+        n_samples (int, optional): Number of samples of the window. A last chunk ending there keeps the
+                                   frames overlapping the end of the window. Defaults to None.
+
+    Returns:
+        numpy.ndarray: The concatenated frames of all chunks.
+    """
+    if not chunks:
+        return log_mel[:, :0]
+    frames = []
+    for chunk in chunks:
+        end = chunk["end"] // hop_length
+        if n_samples is not None and chunk["end"] >= n_samples:
+            end = log_mel.shape[1]
+        frames.append(log_mel[:, chunk["start"] // hop_length:end])
+    return np.concatenate(frames, axis=1)
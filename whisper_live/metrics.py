@@ -0,0 +1,463 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text exposition format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """
+    Base class of the metrics of a `MetricsRegistry`, one time series per combination of label values.
+
+    Attributes:
+        name (str): Name of the metric.
+        documentation (str): Help text of the metric.
+        labelnames (tuple): Names of the labels of the metric.
+        values (dict): Value of every series, keyed by the tuple of its label values.
+        remote (dict): Values reported by other processes, e.g. worker processes, keyed by their source. They are
+                       added to `values` when rendering.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.remote = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Expected labels {self.labelnames} for {self.name}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+    def remove(self, **labels):
+        """Drop the series with the given label values, e.g. once a client disconnected."""
+        with self.lock:
+            self.values.pop(self.key(labels), None)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def copy_value(self, value):
+        return value
+
+    def merge(self, value, other):
+        """Returns the sum of two values of the same series."""
+        return value + other
+
+    def snapshot(self):
+        """Returns a copy of the values of this process, without the remote ones."""
+        with self.lock:
+            return {key: self.copy_value(value) for key, value in self.values.items()}
+
+    def collected_values(self):
+        """Returns the values of this process summed with the remote values, series by series."""
+        with self.lock:
+            values = dict(self.values)
+            for remote in self.remote.values():
+                for key, value in remote.items():
+                    values[key] = self.merge(values[key], value) if key in values else value
+            return values
+
+    def samples(self):
+        """Returns the (suffix, label string, value) samples of the metric."""
+        return [("", self.format_labels(key), value) for key, value in self.collected_values().items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {float(value)!r}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value, e.g. the number of messages sent."""
+    type = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def set_total(self, value, **labels):
+        """Set the value of a counter maintained elsewhere, sampled by a collector."""
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. the number of connected clients."""
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets, e.g. the latency of a processing stage.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets, in increasing order.
+    """
+    type = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                # per bucket counts (the last one is +Inf), sum
+                series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def copy_value(self, value):
+        return [list(value[0]), value[1]]
+
+    def merge(self, value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1]]
+
+    def samples(self):
+        samples = []
+        for key, (counts, total) in self.collected_values().items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                samples.append(("_bucket", self.format_labels(key, [("le", le)]), cumulative))
+            samples.append(("_sum", self.format_labels(key), total))
+            samples.append(("_count", self.format_labels(key), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered in the Prometheus text exposition format.
+
+    Attributes:
+        metrics (list): Registered metrics, in registration order.
+        collectors (list): Callables run before every render to refresh gauges computed on demand.
+    """
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """Register a callable run before every render, e.g. to sample the state of the server."""
+        self.collectors.append(collector)
+
+    def collect(self):
+        """Run the collectors."""
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logging.error(f"[ERROR]: Metrics collector failed: {e}")
+
+    def render(self):
+        """Returns the current value of all metrics in the Prometheus text exposition format."""
+        self.collect()
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+    def snapshot(self, exclude=()):
+        """
+        Collect and return the values of this process, to be reported to the registry of another process.
+
+        Args:
+            exclude (tuple, optional): Names of the metrics left out of the snapshot.
+
+        Returns:
+            dict: Values of every metric by name, see `set_remote`.
+        """
+        self.collect()
+        return {metric.name: metric.snapshot() for metric in self.metrics if metric.name not in exclude}
+
+    def set_remote(self, source, snapshot):
+        """
+        Replace the values reported by `source`, which are added to the values of this process when rendering.
+
+        Args:
+            source: Identifier of the reporting process, e.g. its pid.
+            snapshot (dict): Values returned by `snapshot` in the reporting process.
+        """
+        for metric in self.metrics:
+            with metric.lock:
+                metric.remote[source] = snapshot.get(metric.name, {})
+
+    def remove_remote(self, source):
+        """Forget the values reported by `source`, e.g. once the process exited."""
+        for metric in self.metrics:
+            with metric.lock:
+                metric.remote.pop(source, None)
+
+
+def get_resident_memory():
+    """Returns the resident memory of the process in bytes, or None if it cannot be determined."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ServerMetrics:
+    """
+    Metrics of a `TranscriptionServer`.
+
+    Processing stages and sent messages are recorded by the clients as they happen; the number of
+    clients, their backlog and the loaded models are sampled from the server whenever the metrics
+    are scraped. With a `WorkerPool`, the workers record the metrics of their sessions and models in
+    their own `ServerMetrics` and report them periodically; they are summed with the metrics of the
+    front end, apart from the number of active and queued clients which only the front end knows.
+
+    Attributes:
+        registry (MetricsRegistry): Registry holding the metrics.
+        stage_seconds (Histogram): Latency of every processing stage of a transcription pass.
+        real_time_factor (Gauge): Processing time over duration of the new audio of the last pass, per client.
+        backlog_seconds (Gauge): Audio received but not transcribed yet, per client.
+        decoding_level (Gauge): Level of the adaptive decoding policy, per client, 0 being the best quality.
+        active_clients (Gauge): Number of clients being transcribed.
+        queued_clients (Gauge): Number of connections waiting in the admission queue.
+        loaded_models (Gauge): Number of clients holding each loaded model.
+        model_size_bytes (Gauge): Size of the weights of each loaded model.
+        resident_memory_bytes (Gauge): Resident memory of the server process, worker processes included.
+        messages_sent (Counter): Messages sent to clients, by type.
+        dropped_audio_seconds (Counter): Audio skipped without being transcribed, by reason.
+        dropped_passes (Counter): Transcription passes whose result was discarded.
+        reused_passes (Counter): Transcription passes that reused the result of the previous pass, as no new audio
+            arrived.
+        prefix_fallbacks (Counter): Transcription passes decoded again without the forced prefix, because the
+            result failed the quality checks of the model.
+        decoded_windows (Counter): Windows decoded by each loaded model.
+        fallback_windows (Counter): Windows that needed at least one temperature fallback, per model.
+        fallback_budget_exceeded (Counter): Windows whose fallback was cut short by the fallback budget, per model.
+        fallback_exhausted (Counter): Windows where all fallback temperatures failed, per model.
+    """
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.server = None
+        self.stage_seconds = self.registry.histogram(
+            "whisper_live_stage_seconds",
+            "Latency of the processing stages of a transcription pass.",
+            ("stage",),
+        )
+        self.real_time_factor = self.registry.gauge(
+            "whisper_live_client_real_time_factor",
+            "Processing time over duration of the new audio of the last transcription pass.",
+            ("client",),
+        )
+        self.backlog_seconds = self.registry.gauge(
+            "whisper_live_client_backlog_seconds",
+            "Seconds of audio received but not transcribed yet.",
+            ("client",),
+        )
+        self.decoding_level = self.registry.gauge(
+            "whisper_live_client_decoding_level",
+            "Level of the adaptive decoding policy, 0 is the best quality.",
+            ("client",),
+        )
+        self.active_clients = self.registry.gauge(
+            "whisper_live_active_clients", "Number of clients being transcribed."
+        )
+        self.queued_clients = self.registry.gauge(
+            "whisper_live_queued_clients", "Number of connections waiting for a free slot."
+        )
+        self.loaded_models = self.registry.gauge(
+            "whisper_live_model_refs",
+            "Number of clients holding each loaded model.",
+            ("model", "device", "compute_type"),
+        )
+        self.model_size_bytes = self.registry.gauge(
+            "whisper_live_model_size_bytes",
+            "Size of the weights of each loaded model.",
+            ("model", "device", "compute_type"),
+        )
+        self.resident_memory_bytes = self.registry.gauge(
+            "whisper_live_resident_memory_bytes", "Resident memory of the server processes."
+        )
+        self.messages_sent = self.registry.counter(
+            "whisper_live_messages_sent_total", "Messages sent to clients.", ("type",)
+        )
+        self.dropped_audio_seconds = self.registry.counter(
+            "whisper_live_dropped_audio_seconds_total",
+            "Seconds of audio skipped without being transcribed.",
+            ("reason",),
+        )
+        self.dropped_passes = self.registry.counter(
+            "whisper_live_dropped_passes_total",
+            "Transcription passes whose result was discarded because their audio was overwritten.",
+        )
+        self.reused_passes = self.registry.counter(
+            "whisper_live_reused_passes_total",
+            "Transcription passes that reused the previous result because no new audio arrived.",
+        )
+        self.prefix_fallbacks = self.registry.counter(
+            "whisper_live_prefix_fallbacks_total",
+            "Transcription passes decoded again without the forced prefix after failing the quality checks.",
+        )
+        model_labels = ("model", "device", "compute_type")
+        self.decoded_windows = self.registry.counter(
+            "whisper_live_decoded_windows_total", "Windows decoded by each loaded model.", model_labels
+        )
+        self.fallback_windows = self.registry.counter(
+            "whisper_live_fallback_windows_total",
+            "Windows that needed at least one temperature fallback.",
+            model_labels,
+        )
+        self.fallback_budget_exceeded = self.registry.counter(
+            "whisper_live_fallback_budget_exceeded_total",
+            "Windows whose temperature fallback was stopped by the fallback budget.",
+            model_labels,
+        )
+        self.fallback_exhausted = self.registry.counter(
+            "whisper_live_fallback_exhausted_total",
+            "Windows where all fallback temperatures failed the quality checks.",
+            model_labels,
+        )
+        self.registry.add_collector(self.collect)
+
+    def attach(self, server):
+        """
+        Sample the clients, queue and model pool of `server` on every scrape, and collect the metrics of the
+        workers of its worker pool, if any.
+        """
+        self.server = server
+        if getattr(server, "worker_pool", None) is not None:
+            server.worker_pool.forward_metrics(self)
+
+    def worker_snapshot(self):
+        """Returns the values a worker process reports to the front end, see `MetricsRegistry.snapshot`."""
+        return self.registry.snapshot(exclude=(self.active_clients.name, self.queued_clients.name))
+
+    def observe_stage(self, stage, seconds):
+        self.stage_seconds.observe(seconds, stage=stage)
+
+    def collect(self):
+        memory = get_resident_memory()
+        if memory is not None:
+            self.resident_memory_bytes.set(memory)
+
+        server = self.server
+        if server is None:
+            return
+        clients = list(server.clients.values())
+        self.active_clients.set(len(clients))
+        self.queued_clients.set(len(server.admission.waiting))
+
+        self.real_time_factor.clear()
+        self.backlog_seconds.clear()
+        self.decoding_level.clear()
+        for client in clients:
+            if getattr(client, "audio_buffer", None) is None or not hasattr(client, "get_backlog"):
+                # not loaded yet, or running in a worker process
+                continue
+            self.real_time_factor.set(client.rtf, client=client.client_uid)
+            self.backlog_seconds.set(client.get_backlog(), client=client.client_uid)
+            if client.decoding_policy is not None:
+                self.decoding_level.set(client.decoding_policy.level, client=client.client_uid)
+
+        fallback_counters = (
+            (self.decoded_windows, "windows"),
+            (self.fallback_windows, "fallbacks"),
+            (self.fallback_budget_exceeded, "budget_exceeded"),
+            (self.fallback_exhausted, "exhausted"),
+        )
+        self.loaded_models.clear()
+        self.model_size_bytes.clear()
+        for metric, _ in fallback_counters:
+            metric.clear()
+        for stats in server.model_pool.stats():
+            labels = {k: stats[k] for k in ("model", "device", "compute_type")}
+            self.loaded_models.set(stats["ref_count"], **labels)
+            if stats.get("size_bytes") is not None:
+                self.model_size_bytes.set(stats["size_bytes"], **labels)
+            if stats.get("fallback") is not None:
+                for metric, name in fallback_counters:
+                    metric.set_total(stats["fallback"][name], **labels)
+
+    def serve(self, host, port):
+        """
+        Serve the metrics on `http://host:port/metrics` from a daemon thread.
+
+        Returns:
+            ThreadingHTTPServer: The HTTP server, call `shutdown()` to stop it.
+        """
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return httpd
+
+
+class StageTimer:
+    """
+    Context manager recording the duration of a block as a stage of `ServerMetrics`, a no-op when
+    metrics are disabled.
+    """
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.metrics is not None:
+            self.metrics.observe_stage(self.stage, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,248 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from faster_whisper.audio import decode_audio
+
+from whisper_live.transcriber import WhisperModel
+
+
+class _PoolEntry:
+    """
+    Bookkeeping for one loaded model inside a `ModelPool`.
+
+    Attributes:
+        model (WhisperModel): The loaded model, None while it is still loading.
+        ref_count (int): Number of clients currently holding the model.
+        last_used (float): Time at which the model was last released.
+        ready (threading.Event): Set once loading has finished (successfully or not).
+        error (Exception): The exception raised while loading the model, if any.
+        size_bytes (int): Size of the files of the model on disk, an estimate of its memory use.
+    """
+    def __init__(self):
+        self.model = None
+        self.size_bytes = None
+        self.ref_count = 0
+        self.last_used = time.time()
+        self.ready = threading.Event()
+        self.error = None
+
+
+class ModelPool:
+    """
+    Server-level registry that loads each Whisper model once and shares it between clients.
+
+    Models are keyed by (model size or path, device, compute type). Every `acquire` increments
+    the reference count of the model and every `release` decrements it. Models that are no longer
+    referenced by any client stay loaded so that the next client gets `SERVER_READY` immediately,
+    and are unloaded once they have been idle for longer than `idle_ttl` seconds or when more
+    than `max_idle_models` idle models are loaded (least recently used first).
+
+    Attributes:
+        max_idle_models (int): Maximum number of unreferenced models kept loaded.
+        idle_ttl (float): Seconds after which an unreferenced model is unloaded. None disables the TTL.
+        cpu_threads (int): Number of CTranslate2 threads used per model on CPU.
+        num_workers (int): Number of CTranslate2 workers per model, i.e. how many clients can
+            run inference on the same model in parallel.
+        local_files_only (bool): Only load models already present in the local cache.
+        download_root (str): Directory where the models are downloaded.
+        entries (OrderedDict): Loaded models in least recently used order.
+    """
+    def __init__(
+        self,
+        max_idle_models=2,
+        idle_ttl=600,
+        cpu_threads=0,
+        num_workers=1,
+        local_files_only=False,
+        download_root=None,
+        reap_interval=30,
+    ):
+        self.max_idle_models = max_idle_models
+        self.idle_ttl = idle_ttl
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.local_files_only = local_files_only
+        self.download_root = download_root
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        if self.idle_ttl is not None:
+            self.reaper_thread = threading.Thread(
+                target=self._reap_forever, args=(reap_interval,), daemon=True
+            )
+            self.reaper_thread.start()
+
+    @staticmethod
+    def get_key(model_size_or_path, device, compute_type):
+        """Returns the key identifying a model in the pool."""
+        return (model_size_or_path, device, compute_type)
+
+    def acquire(self, model_size_or_path, device="cpu", compute_type="int8"):
+        """
+        Get a shared reference to a model, loading it if needed.
+
+        If another client is already loading the same model, waits for that load to finish
+        instead of loading a second copy.
+
+        Args:
+            model_size_or_path (str): Size of the model or path to a converted model directory.
+            device (str): Device to run the model on, "cpu" or "cuda".
+            compute_type (str): CTranslate2 compute type, e.g. "int8" or "float16".
+
+        Returns:
+            WhisperModel: The shared model instance.
+
+        Raises:
+            Exception: If the model could not be loaded.
+        """
+        key = self.get_key(model_size_or_path, device, compute_type)
+        with self.lock:
+            entry = self.entries.get(key)
+            is_loader = entry is None
+            if is_loader:
+                entry = _PoolEntry()
+                self.entries[key] = entry
+            entry.ref_count += 1
+            self.entries.move_to_end(key)
+
+        if is_loader:
+            logging.info(f"Loading model {key}")
+            try:
+                entry.model = WhisperModel(
+                    model_size_or_path,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers,
+                    download_root=self.download_root,
+                    local_files_only=self.local_files_only,
+                )
+                entry.size_bytes = get_model_size_bytes(entry.model.model_path)
+            except Exception as e:
+                entry.error = e
+                with self.lock:
+                    self.entries.pop(key, None)
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.model
+
+    def preload(self, model_size_or_path, device="cpu", compute_type="int8", warmup_audio=None):
+        """
+        Load a model ahead of the first client and keep it loaded for the lifetime of the pool.
+
+        The pool holds a reference on the model, so it is never evicted. With `warmup_audio`, a transcription is
+        run once so that the first client does not pay for cold allocations and lazily loaded components.
+
+        Args:
+            model_size_or_path (str): Size of the model or path to a converted model directory, as requested by
+                                      the clients (e.g. "small.en" for English-only clients of the "small" model).
+            device (str): Device to run the model on, "cpu" or "cuda".
+            compute_type (str): CTranslate2 compute type, e.g. "int8" or "float16".
+            warmup_audio (str or numpy.ndarray, optional): Audio file or 16kHz samples to transcribe once.
+
+        Returns:
+            WhisperModel: The loaded model.
+        """
+        start = time.time()
+        model = self.acquire(model_size_or_path, device=device, compute_type=compute_type)
+        logging.info(f"Preloaded model {model_size_or_path} in {time.time() - start:.2f}s")
+        if warmup_audio is not None:
+            warmup_model(model, warmup_audio)
+        return model
+
+    def release(self, model):
+        """
+        Drop a reference obtained with `acquire`.
+
+        Args:
+            model (WhisperModel): The model returned by `acquire`.
+        """
+        with self.lock:
+            for key, entry in self.entries.items():
+                if entry.model is model:
+                    entry.ref_count = max(0, entry.ref_count - 1)
+                    entry.last_used = time.time()
+                    self.entries.move_to_end(key)
+                    break
+        self.evict_idle()
+
+    def evict_idle(self):
+        """
+        Unload models that are not referenced by any client and that are either older than
+        `idle_ttl` or beyond the `max_idle_models` most recently used idle models.
+        """
+        now = time.time()
+        evicted = []
+        with self.lock:
+            idle = [
+                (key, entry) for key, entry in self.entries.items()
+                if entry.ref_count == 0 and entry.ready.is_set()
+            ]
+            n_over_limit = max(0, len(idle) - self.max_idle_models)
+            for i, (key, entry) in enumerate(idle):
+                expired = self.idle_ttl is not None and now - entry.last_used > self.idle_ttl
+                if i < n_over_limit or expired:
+                    self.entries.pop(key)
+                    evicted.append(key)
+
+        for key in evicted:
+            logging.info(f"Unloading idle model {key}")
+
+    def stats(self):
+        """
+        Returns:
+            list: One dict per loaded model with its key, reference count, size on disk and fallback counters
+                  (see `FallbackStats.snapshot`).
+        """
+        with self.lock:
+            return [
+                {
+                    "model": key[0],
+                    "device": key[1],
+                    "compute_type": key[2],
+                    "ref_count": entry.ref_count,
+                    "size_bytes": entry.size_bytes,
+                    "fallback": entry.model.fallback_stats.snapshot() if entry.model is not None else None,
+                }
+                for key, entry in self.entries.items()
+            ]
+
+    def _reap_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+
+
+def warmup_model(model, audio):
+    """
+    Run one transcription with the same VAD and decoding path as the clients, so that the allocations and the
+    lazily loaded VAD model are ready before the first client connects.
+
+    Args:
+        model (WhisperModel): The model to warm up.
+        audio (str or numpy.ndarray): Audio file or 16kHz samples.
+    """
+    if isinstance(audio, str):
+        audio = decode_audio(audio, sampling_rate=model.feature_extractor.sampling_rate)
+    start = time.time()
+    segments, _ = model.transcribe(audio, vad_filter=True, vad_parameters={"threshold": 0.5})
+    text = "".join(segment.text for segment in segments)
+    logging.info(f"Warmed up model in {time.time() - start:.2f}s: {text.strip()[:60]!r}")
+
+
+def get_model_size_bytes(model_path):
+    """Returns the total size of the files of a converted model directory, None if unavailable."""
+    try:
+        return sum(
+            entry.stat().st_size for entry in os.scandir(model_path) if entry.is_file()
+        )
+    except OSError:
+        return None
@@ -0,0 +1,178 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from whisper_live.transcriber import get_ctranslate2_storage
+
+
+class _Request:
+    """
+    A single `encode` or `generate` call waiting to be batched.
+
+    Attributes:
+        model: The CTranslate2 Whisper model the call targets.
+        method (str): "encode" or "generate".
+        features (numpy.ndarray): Mel features or encoder output, with a batch dimension.
+        prompts (list): Prompt token ids, only used by "generate".
+        kwargs (dict): Keyword arguments of the call, without `asynchronous`.
+        key (tuple): Calls with the same key can be executed as one batch. CTranslate2 applies the decoding
+                     options, e.g. `beam_size` or `sampling_temperature`, to a whole batch, so they are part of
+                     the key: calls at different fallback temperatures are executed as separate batches.
+        future (Future): Resolved with the result of the call.
+    """
+    def __init__(self, model, method, features, prompts=None, kwargs=None):
+        self.model = model
+        self.method = method
+        self.features = features
+        self.prompts = prompts
+        self.kwargs = kwargs or {}
+        self.key = (id(model), method, _freeze(self.kwargs))
+        self.future = Future()
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class BatchedModel:
+    """
+    Stand-in for a CTranslate2 Whisper model that routes `encode` and `generate` through an
+    `InferenceScheduler`, so that calls made concurrently by different clients sharing the
+    same model are executed as one batch. All other attributes are forwarded to the wrapped model.
+
+    Encoder outputs are always returned on the CPU so that they can be regrouped into new
+    batches; CTranslate2 moves them back to the model device when decoding.
+    """
+    def __init__(self, model, scheduler):
+        self.model = model
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def encode(self, features, to_cpu=False):
+        return self.scheduler.submit(_Request(self.model, "encode", np.asarray(features))).result()
+
+    def generate(self, features, prompts, asynchronous=False, **kwargs):
+        try:
+            features = np.asarray(features)
+        except Exception:
+            # encoder output that does not live on the CPU cannot be regrouped
+            return self.model.generate(features, prompts, asynchronous=asynchronous, **kwargs)
+        if len(prompts) != features.shape[0]:
+            return self.model.generate(
+                get_ctranslate2_storage(features), prompts, asynchronous=asynchronous, **kwargs
+            )
+        request = _Request(self.model, "generate", features, prompts, kwargs)
+        # batches are always decoded asynchronously, so synchronous and asynchronous calls share them
+        results = self.scheduler.submit(request).result()
+        if asynchronous:
+            return results
+        return [result.result() for result in results]
+
+
+class InferenceScheduler:
+    """
+    Central scheduler batching the encoder and decoder calls of all connected clients.
+
+    Every client thread still runs `WhisperModel.transcribe` on its own, but the calls it makes
+    to the CTranslate2 model are queued here. The scheduler thread waits at most `max_wait_time`
+    seconds after the first pending call for others to arrive, concatenates the mel features (or
+    encoder outputs) and prompts of compatible calls into a single `encode` or `generate` call and
+    scatters the results back to the waiting clients. Decoder calls are submitted to CTranslate2
+    asynchronously, so the scheduler thread collects the next batch while the previous one is decoded.
+
+    Attributes:
+        max_batch_size (int): Maximum number of calls executed as one batch.
+        max_wait_time (float): Maximum time in seconds a call waits for others to batch with.
+        queue (queue.Queue): Pending calls.
+    """
+    def __init__(self, max_batch_size=8, max_wait_time=0.01):
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def attach(self, transcriber):
+        """
+        Route the inference calls of a `WhisperModel` through this scheduler. Calling it several
+        times for the same model is a no-op.
+
+        Args:
+            transcriber (WhisperModel): The model shared by the clients.
+        """
+        with self.lock:
+            if not isinstance(transcriber.model, BatchedModel):
+                transcriber.model = BatchedModel(transcriber.model, self)
+
+    def submit(self, request):
+        """Queue a call and return the future holding its result."""
+        self.queue.put(request)
+        return request.future
+
+    def run(self):
+        """
+        Collect pending calls into batches and execute them, forever.
+        """
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait_time
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+            for requests in groups.values():
+                self.execute(requests)
+
+    def execute(self, requests):
+        """
+        Run a group of compatible calls as one batch and resolve their futures.
+
+        Args:
+            requests (list): Calls sharing the same model, method and keyword arguments.
+        """
+        try:
+            model = requests[0].model
+            features = get_ctranslate2_storage(
+                np.concatenate([r.features for r in requests], axis=0)
+            )
+            # a request can hold several windows, e.g. from batched long-form transcription
+            offsets = np.cumsum([0] + [r.features.shape[0] for r in requests])
+            if requests[0].method == "encode":
+                output = np.asarray(model.encode(features, to_cpu=True))
+                results = [
+                    get_ctranslate2_storage(output[start:end])
+                    for start, end in zip(offsets[:-1], offsets[1:])
+                ]
+            else:
+                prompts = [prompt for r in requests for prompt in r.prompts]
+                output = model.generate(features, prompts, asynchronous=True, **requests[0].kwargs)
+                results = [output[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+            if len(requests) > 1:
+                logging.debug(f"Executed batched {requests[0].method} of size {len(requests)}")
+        except Exception as e:
+            for r in requests:
+                r.future.set_exception(e)
+            return
+
+        for r, result in zip(requests, results):
+            r.future.set_result(result)
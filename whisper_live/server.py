@@ -3,7 +3,11 @@ import websockets
 import time
 import threading
 import json
+import string
 import textwrap
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import logging
 # logging.basicConfig(level = logging.INFO)
@@ -11,11 +15,122 @@ import logging
 from websockets.sync.server import serve
 
 import torch
-import numpy as np
 import time
 import functools
 
 from whisper_live.transcriber import WhisperModel
+from whisper_live.model_pool import ModelPool
+from whisper_live.scheduler import InferenceScheduler
+from whisper_live.audio_buffer import AudioRingBuffer
+from whisper_live.features import StreamingFeatureExtractor
+from whisper_live.vad import StreamingVad
+from whisper_live.metrics import ServerMetrics, StageTimer
+from whisper_live.audio_codec import get_audio_decoder
+from whisper_live.decoding_policy import DecodingPolicy
+from whisper_live.tracing import SessionTracer
+
+COMMIT_POLICIES = ("local_agreement", "repetition")
+
+
+def get_inference_device():
+    """
+    Returns:
+        tuple: The device and CTranslate2 compute type the models of the clients are loaded with.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return device, "int8" if device == "cpu" else "float16"
+
+
+class AdmissionQueue:
+    """
+    Client slots of the server and the FIFO of connections waiting for one.
+
+    Connections that arrive while all `max_clients` slots are taken are held open in the queue
+    instead of being turned away, and are admitted in arrival order as soon as a slot frees up.
+
+    Attributes:
+        max_clients (int): Number of clients transcribed at the same time.
+        max_size (int): Maximum number of waiting connections.
+        timeout (float): Maximum time in seconds a connection waits in the queue.
+        active (int): Number of slots currently taken.
+        waiting (deque): Tickets of the waiting connections, in arrival order.
+    """
+    def __init__(self, max_clients=4, max_size=16, timeout=600):
+        self.max_clients = max_clients
+        self.max_size = max_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = deque()
+        self.cond = threading.Condition()
+
+    def try_acquire(self, ticket):
+        """
+        Take a slot for `ticket` if one is free and nobody queued before it.
+
+        Returns:
+            bool: Whether the slot was taken. On success the ticket leaves the queue.
+        """
+        with self.cond:
+            if not self._can_acquire(ticket):
+                return False
+            if self.waiting:
+                self.waiting.popleft()
+                # the others moved up the queue
+                self.cond.notify_all()
+            self.active += 1
+            return True
+
+    def _can_acquire(self, ticket):
+        return self.active < self.max_clients and (not self.waiting or self.waiting[0] is ticket)
+
+    def enqueue(self, ticket):
+        """
+        Add `ticket` to the end of the queue.
+
+        Returns:
+            bool: False if the queue is full.
+        """
+        with self.cond:
+            if len(self.waiting) >= self.max_size:
+                return False
+            self.waiting.append(ticket)
+            return True
+
+    def position(self, ticket):
+        """Returns the 1-based position of `ticket` in the queue."""
+        with self.cond:
+            return self.waiting.index(ticket) + 1
+
+    def leave(self, ticket):
+        """Remove `ticket` from the queue, e.g. after a timeout or a disconnect."""
+        with self.cond:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+                self.cond.notify_all()
+
+    def release(self):
+        """Free a slot taken with `try_acquire` and wake up the waiting connections."""
+        with self.cond:
+            self.active = max(0, self.active - 1)
+            self.cond.notify_all()
+
+    def wait(self, ticket, timeout):
+        """
+        Block until `ticket` can take a slot, its position in the queue changed or `timeout` seconds elapsed.
+
+        The state is checked under the lock before blocking, so a slot released since the last `try_acquire`
+        is not missed.
+
+        Returns:
+            bool: Whether `ticket` can take a slot.
+        """
+        with self.cond:
+            position = self.waiting.index(ticket) if ticket in self.waiting else None
+
+            def moved():
+                return (self.waiting.index(ticket) if ticket in self.waiting else None) != position
+
+            return self.cond.wait_for(lambda: self._can_acquire(ticket) or moved(), timeout) and self._can_acquire(ticket)
 
 
 class TranscriptionServer:
@@ -31,35 +146,218 @@ class TranscriptionServer:
         clients_start_time (dict): A dictionary to track client start times.
         max_clients (int): Maximum allowed connected clients.
         max_connection_time (int): Maximum allowed connection time in seconds.
+        admission (AdmissionQueue): Client slots and the queue of connections waiting for one.
+        queue_update_interval (float): Seconds between two queue position updates sent to a waiting client.
+        model_pool (ModelPool): Registry of loaded models shared by all clients.
+        scheduler (InferenceScheduler): Batches inference across clients, None if disabled.
+        inference_executor (ThreadPoolExecutor): Runs the transcription passes in asyncio mode.
+        metrics (ServerMetrics): Metrics of the server, None if disabled.
+        worker_pool (WorkerPool): Worker processes running the client sessions, None to run them in this process.
+        adaptive_decoding (bool): Whether clients lower their decoding quality when the server falls behind.
+        fallback_budget (float): Maximum seconds spent decoding one window of a client, None for no limit.
+        parallel_fallback (bool): Whether clients submit their fallback temperatures at once instead of one by one.
+        commit_policy (str): How clients decide that the text of the last segment is final, from `COMMIT_POLICIES`.
+        forced_prefix (bool): Whether clients force the tokens their last passes agree on as the decoder prefix.
     """
 
     RATE = 16000
 
-    def __init__(self):
+    def __init__(
+        self,
+        model_pool=None,
+        batch_inference=False,
+        max_batch_size=8,
+        max_batch_wait=0.01,
+        max_clients=4,
+        max_connection_time=600,
+        max_queue_size=16,
+        queue_timeout=600,
+        metrics=None,
+        worker_pool=None,
+        adaptive_decoding=True,
+        fallback_budget=1.0,
+        parallel_fallback=False,
+        commit_policy="local_agreement",
+        forced_prefix=True,
+    ):
         # voice activity detection model
 
         self.clients = {}
         self.websockets = {}
         self.clients_start_time = {}
-        self.max_clients = 4
-        self.max_connection_time = 600
+        self.max_clients = max_clients
+        self.max_connection_time = max_connection_time
+        self.admission = AdmissionQueue(max_clients, max_size=max_queue_size, timeout=queue_timeout)
+        self.queue_update_interval = 5
+        self.model_pool = model_pool if model_pool is not None else ModelPool()
+        self.inference_executor = None
+        self.worker_pool = worker_pool
+        self.adaptive_decoding = adaptive_decoding
+        self.fallback_budget = fallback_budget
+        self.parallel_fallback = parallel_fallback
+        self.commit_policy = commit_policy
+        self.forced_prefix = forced_prefix
+        self.metrics = metrics
+        if self.metrics is not None:
+            self.metrics.attach(self)
+        self.scheduler = None
+        if batch_inference:
+            self.scheduler = InferenceScheduler(
+                max_batch_size=max_batch_size,
+                max_wait_time=max_batch_wait,
+            )
+
+    def preload(self, models, warmup_audio=None):
+        """
+        Load models before accepting clients, and optionally warm them up with one transcription.
 
-    def get_wait_time(self):
+        Models are kept loaded for the lifetime of the server. With a worker pool, every worker preloads the models
+        itself when it starts, see `WorkerPool`.
+
+        Args:
+            models (list): Model sizes or paths, as requested by the clients (e.g. "small.en" for English-only
+                           clients of the "small" model).
+            warmup_audio (str, optional): Audio file transcribed once by every model.
+        """
+        if self.worker_pool is not None:
+            return
+        device, compute_type = get_inference_device()
+        for model in models:
+            self.model_pool.preload(model, device=device, compute_type=compute_type, warmup_audio=warmup_audio)
+
+    def get_wait_time(self, position=1):
         """
         Calculate and return the estimated wait time for clients.
 
+        Assumes connected clients stay until `max_connection_time`: the n-th client in the queue is
+        admitted when the n-th slot frees up, and slots free up again every `max_connection_time`.
+
+        Args:
+            position (int, optional): Position in the queue. Defaults to 1, the next client.
+
         Returns:
             float: The estimated wait time in minutes.
         """
-        wait_time = None
+        remaining = sorted(
+            max(0, self.max_connection_time - (time.time() - v))
+            for v in list(self.clients_start_time.values())
+        )
+        if not remaining:
+            return 0.0
+
+        rounds, index = divmod(position - 1, len(remaining))
+        return (remaining[index] + rounds * self.max_connection_time) / 60
+
+    def queue_status(self, uid, ticket):
+        """Returns the QUEUED status message for a waiting connection."""
+        position = self.admission.position(ticket)
+        return json.dumps({
+            "uid": uid,
+            "status": "QUEUED",
+            "position": position,
+            "message": self.get_wait_time(position),
+        })
+
+    def reject(self, uid):
+        """Returns the WAIT status message sent to a connection that cannot be queued."""
+        logging.warning("Client Queue Full. Asking client to wait ...")
+        return json.dumps({
+            "uid": uid,
+            "status": "WAIT",
+            "message": self.get_wait_time(len(self.admission.waiting) + 1),
+        })
+
+    def wait_for_slot(self, websocket, uid):
+        """
+        Take a client slot, holding the connection in the admission queue while the server is full.
 
-        for k, v in self.clients_start_time.items():
-            current_client_time_remaining = self.max_connection_time - (time.time() - v)
+        The waiting client receives a QUEUED status with its position and estimated wait time whenever
+        the queue moves and at least every `queue_update_interval` seconds.
 
-            if wait_time is None or current_client_time_remaining < wait_time:
-                wait_time = current_client_time_remaining
+        Args:
+            websocket (WebSocket): The WebSocket connection for the client.
+            uid (str): The uid of the client.
 
-        return wait_time / 60
+        Returns:
+            bool: Whether a slot was taken. If not, the connection was closed.
+        """
+        ticket = object()
+        if self.admission.try_acquire(ticket):
+            return True
+        if not self.admission.enqueue(ticket):
+            websocket.send(self.reject(uid))
+            websocket.close()
+            return False
+
+        deadline = time.time() + self.admission.timeout
+        try:
+            while not self.admission.try_acquire(ticket):
+                if time.time() >= deadline:
+                    self.admission.leave(ticket)
+                    websocket.send(self.reject(uid))
+                    websocket.close()
+                    return False
+                websocket.send(self.queue_status(uid, ticket))
+                self.admission.wait(ticket, self.queue_update_interval)
+        except Exception as e:
+            logging.info(f"Client with uid '{uid}' left the queue: {e}")
+            self.admission.leave(ticket)
+            return False
+        return True
+
+    async def wait_for_slot_async(self, websocket, uid):
+        """
+        Asyncio counterpart of `wait_for_slot`.
+        """
+        ticket = object()
+        if self.admission.try_acquire(ticket):
+            return True
+        if not self.admission.enqueue(ticket):
+            await websocket.send(self.reject(uid))
+            await websocket.close()
+            return False
+
+        deadline = time.time() + self.admission.timeout
+        last_update = None
+        try:
+            while not self.admission.try_acquire(ticket):
+                if time.time() >= deadline:
+                    self.admission.leave(ticket)
+                    await websocket.send(self.reject(uid))
+                    await websocket.close()
+                    return False
+                status = self.queue_status(uid, ticket)
+                if last_update is None or status != last_update[0] or time.time() - last_update[1] >= self.queue_update_interval:
+                    await websocket.send(status)
+                    last_update = (status, time.time())
+                await asyncio.sleep(0.5)
+        except websockets.exceptions.ConnectionClosed:
+            logging.info(f"Client with uid '{uid}' left the queue.")
+            self.admission.leave(ticket)
+            return False
+        return True
+
+    def create_audio_decoder(self, options):
+        """
+        Create the decoder of the audio encoding negotiated in the handshake.
+
+        Clients announce "float32" (the default, raw float32 PCM), "int16" (raw 16-bit PCM) or "opus"
+        (length prefixed Opus packets) with the "audio_encoding" option.
+
+        Returns:
+            tuple: The decoder, or None and the error message to send to the client.
+        """
+        try:
+            return get_audio_decoder(options.get("audio_encoding", "float32"), self.RATE), None
+        except (ValueError, ImportError) as e:
+            logging.error(f"Rejecting client with uid '{options['uid']}': {e}")
+            return None, json.dumps({"uid": options["uid"], "status": "ERROR", "message": str(e)})
+
+    def remove_client(self, websocket):
+        """Forget a client and free its slot for the next connection in the queue."""
+        if self.clients.pop(websocket, None) is not None:
+            self.clients_start_time.pop(websocket, None)
+        self.admission.release()
 
     def recv_audio(self, websocket, custom_model_path=None):
         """
@@ -70,9 +368,10 @@ class TranscriptionServer:
         voice activity detection (VAD) model to determine if they contain speech
         or not. If the audio frame contains speech, it is added to the client's
         audio data for ASR.
-        If the maximum number of clients is reached, the method sends a
-        "WAIT" status to the client, indicating that they should wait
-        until a slot is available.
+        If the maximum number of clients is reached, the connection is held
+        in the admission queue and receives "QUEUED" status updates with its
+        position until a slot is available. A "WAIT" status is sent only
+        when the queue is full or the client waited longer than the queue timeout.
         If a client's connection exceeds the maximum allowed time, it will
         be disconnected, and the client's resources will be cleaned up.
 
@@ -88,43 +387,36 @@ class TranscriptionServer:
 
         logging.info(f"with options {options}")
 
-        if len(self.clients) >= self.max_clients:
-            logging.warning("Client Queue Full. Asking client to wait ...")
-            wait_time = self.get_wait_time()
-            response = {
-                "uid": options["uid"],
-                "status": "WAIT",
-                "message": wait_time,
-            }
-            websocket.send(json.dumps(response))
+        decoder, error = self.create_audio_decoder(options)
+        if decoder is None:
+            websocket.send(error)
             websocket.close()
+            return
+
+        if not self.wait_for_slot(websocket, options["uid"]):
             del websocket
             return
-        
-        # validate custom model
-        if options["use_custom_model"]:
-            if custom_model_path is None or not os.path.exists(custom_model_path):
-                options["use_custom_model"] = False
 
-        client = ServeClient(
-            websocket,
-            multilingual=options["multilingual"],
-            language=options["language"],
-            task=options["task"],
-            client_uid=options["uid"],
-            model_size_or_path=custom_model_path if options["use_custom_model"] else options["model_size"],
-            initial_prompt=options.get("initial_prompt"),
-            vad_parameters=options.get("vad_parameters"),
-            use_custom_model=options["use_custom_model"]
-        )
-        
+        try:
+            client = self.create_client(websocket, options, custom_model_path)
+        except Exception as e:
+            logging.error(f"Failed to create client with uid '{options['uid']}': {e}")
+            client = None
+        if client is None or client.model_size_or_path is None:
+            self.admission.release()
+            websocket.close()
+            return
+
         self.clients[websocket] = client
         self.clients_start_time[websocket] = time.time()
 
         while True:
             try:
                 frame_data = websocket.recv()
-                frame_np = np.frombuffer(frame_data, dtype=np.float32)
+                if isinstance(frame_data, str):
+                    self.handle_control_message(self.clients[websocket], frame_data)
+                    continue
+                frame_np = decoder.decode(frame_data)
 
                 self.clients[websocket].add_frames(frame_np)
 
@@ -133,8 +425,7 @@ class TranscriptionServer:
                     self.clients[websocket].disconnect()
                     logging.warning(f"Client with uid '{self.clients[websocket].client_uid}' disconnected due to overtime.")
                     self.clients[websocket].cleanup()
-                    self.clients.pop(websocket)
-                    self.clients_start_time.pop(websocket)
+                    self.remove_client(websocket)
                     websocket.close()
                     del websocket
                     break
@@ -143,19 +434,215 @@ class TranscriptionServer:
                 logging.info(f"[ERROR]: Client with uid '{self.clients[websocket].client_uid}' Disconnected.")
                 if self.clients[websocket].model_size_or_path is not None:
                     self.clients[websocket].cleanup()
-                self.clients.pop(websocket)
-                self.clients_start_time.pop(websocket)
+                self.remove_client(websocket)
                 del websocket
                 break
 
-    def run(self, host, port=9090, custom_model_path=None):
+    def create_client(self, websocket, options, custom_model_path=None, start_thread=True, audio_buffer=None):
+        """
+        Create the `ServeClient` for a connection from its handshake options.
+
+        Args:
+            websocket: The WebSocket connection, or any object with a `send(str)` method.
+            options (dict): The JSON handshake sent by the client.
+            custom_model_path (str, optional): Path to the custom model of the server.
+            start_thread (bool, optional): Start the transcription thread of the client.
+            audio_buffer (AudioRingBuffer, optional): Buffer the audio of the client is written to, by default
+                                                      the client allocates its own.
+
+        Returns:
+            ServeClient: The new client, or a `RemoteClient` when sessions run in worker processes.
+        """
+        if self.worker_pool is not None:
+            return self.worker_pool.open_session(websocket, options, custom_model_path)
+
+        # validate custom model
+        if options["use_custom_model"]:
+            if custom_model_path is None or not os.path.exists(custom_model_path):
+                options["use_custom_model"] = False
+
+        return ServeClient(
+            websocket,
+            multilingual=options["multilingual"],
+            language=options["language"],
+            task=options["task"],
+            client_uid=options["uid"],
+            model_size_or_path=custom_model_path if options["use_custom_model"] else options["model_size"],
+            initial_prompt=options.get("initial_prompt"),
+            vad_parameters=options.get("vad_parameters"),
+            use_custom_model=options["use_custom_model"],
+            model_pool=self.model_pool,
+            scheduler=self.scheduler,
+            start_thread=start_thread,
+            metrics=self.metrics,
+            protocol_version=options.get("protocol_version", 1),
+            audio_buffer=audio_buffer,
+            adaptive_decoding=self.adaptive_decoding,
+            fallback_budget=self.fallback_budget,
+            parallel_fallback=self.parallel_fallback,
+            commit_policy=self.commit_policy,
+            forced_prefix=self.forced_prefix,
+        )
+
+    def handle_control_message(self, client, message):
+        """
+        Handle a text message sent by the client after the handshake.
+
+        Supported messages:
+            {"type": "resync"}: resend the full transcript, for clients using protocol version 2.
+
+        Args:
+            client (ServeClient): The client that sent the message.
+            message (str): The JSON message.
+        """
+        try:
+            message = json.loads(message)
+        except ValueError:
+            logging.warning(f"Ignoring invalid control message from client '{client.client_uid}'")
+            return
+        if message.get("type") == "resync":
+            client.resync()
+        else:
+            logging.warning(f"Ignoring unknown control message from client '{client.client_uid}': {message}")
+
+    async def recv_audio_async(self, websocket, custom_model_path=None):
+        """
+        Asyncio counterpart of `recv_audio`, serving one client connection.
+
+        Receiving and buffering audio happen on the event loop, while the transcription passes of the
+        client run in the bounded `inference_executor` instead of a dedicated thread per client. Messages
+        produced by the client are sent back through an `AsyncWebSocketBridge`.
+
+        Args:
+            websocket: The asyncio WebSocket connection for the client.
+            custom_model_path (str, optional): Path to the custom model of the server.
+        """
+        logging.info("New client connected")
+        loop = asyncio.get_running_loop()
+        options = json.loads(await websocket.recv())
+
+        logging.info(f"with options {options}")
+
+        decoder, error = self.create_audio_decoder(options)
+        if decoder is None:
+            await websocket.send(error)
+            await websocket.close()
+            return
+
+        if not await self.wait_for_slot_async(websocket, options["uid"]):
+            return
+
+        bridge = AsyncWebSocketBridge(websocket, loop)
+        try:
+            # loading a model blocks, keep it off the event loop and out of the inference executor
+            client = await loop.run_in_executor(
+                None, functools.partial(self.create_client, bridge, options, custom_model_path, False)
+            )
+        except Exception as e:
+            logging.error(f"Failed to create client with uid '{options['uid']}': {e}")
+            client = None
+        if client is None or client.model_size_or_path is None:
+            self.admission.release()
+            await websocket.close()
+            return
+
+        self.clients[websocket] = client
+        self.clients_start_time[websocket] = time.time()
+        new_audio = asyncio.Event()
+        transcription = None
+        if self.worker_pool is None:
+            transcription = asyncio.ensure_future(self.transcribe_async(client, new_audio))
+
+        try:
+            async for frame_data in websocket:
+                if isinstance(frame_data, str):
+                    self.handle_control_message(client, frame_data)
+                    continue
+                client.add_frames(decoder.decode(frame_data))
+                if transcription is not None and client.has_new_audio():
+                    new_audio.set()
+
+                elapsed_time = time.time() - self.clients_start_time[websocket]
+                if elapsed_time >= self.max_connection_time:
+                    client.disconnect()
+                    logging.warning(f"Client with uid '{client.client_uid}' disconnected due to overtime.")
+                    await websocket.close()
+                    break
+        except websockets.exceptions.ConnectionClosed:
+            logging.info(f"[ERROR]: Client with uid '{client.client_uid}' Disconnected.")
+        finally:
+            client.cleanup()
+            new_audio.set()
+            if transcription is not None:
+                await transcription
+            self.remove_client(websocket)
+
+    async def transcribe_async(self, client, new_audio):
+        """
+        Run the transcription passes of a client in the inference executor whenever new audio arrives.
+
+        Args:
+            client (ServeClient): The client to transcribe.
+            new_audio (asyncio.Event): Set when enough new audio was received or the client disconnected.
+        """
+        loop = asyncio.get_running_loop()
+        while not client.exit:
+            try:
+                await asyncio.wait_for(new_audio.wait(), timeout=client.new_audio_timeout)
+            except asyncio.TimeoutError:
+                pass
+            new_audio.clear()
+            if client.exit:
+                break
+            await loop.run_in_executor(self.inference_executor, client.transcribe_audio)
+        client.tracer.log_summary(client.client_uid)
+        client.release_model()
+
+    async def serve_async(self, host, port=9090, custom_model_path=None):
+        """
+        Serve clients with the asyncio WebSocket API until cancelled.
+
+        Args:
+            host (str): The host address to bind the server.
+            port (int): The port number to bind the server.
+            custom_model_path (str, optional): Path to a custom model.
+        """
+        async with websockets.serve(
+            functools.partial(self.recv_audio_async, custom_model_path=custom_model_path),
+            host,
+            port,
+        ):
+            await asyncio.Future()
+
+    def run(self, host, port=9090, custom_model_path=None, use_asyncio=False, inference_workers=4, metrics_port=None):
         """
         Run the transcription server.
 
+        By default every connection is served by its own thread plus a transcription thread per client.
+        With `use_asyncio`, connections are handled as coroutines on a single event loop and transcription
+        passes run in a pool of `inference_workers` threads, so mostly idle connections only cost memory.
+
         Args:
             host (str): The host address to bind the server.
             port (int): The port number to bind the server.
+            custom_model_path (str, optional): Path to a custom model.
+            use_asyncio (bool, optional): Serve clients with the asyncio WebSocket API. Defaults to False.
+            inference_workers (int, optional): Number of concurrent transcription passes in asyncio mode.
+                                               Defaults to 4.
+            metrics_port (int, optional): Serve Prometheus metrics on `http://host:metrics_port/metrics`.
+                                          Defaults to None, no metrics endpoint.
         """
+        if metrics_port is not None:
+            if self.metrics is None:
+                self.metrics = ServerMetrics()
+                self.metrics.attach(self)
+            self.metrics.serve(host, metrics_port)
+
+        if use_asyncio:
+            self.inference_executor = ThreadPoolExecutor(max_workers=inference_workers)
+            asyncio.run(self.serve_async(host, port, custom_model_path))
+            return
+
         with serve(
             functools.partial(
                 self.recv_audio,
@@ -167,6 +654,51 @@ class TranscriptionServer:
             server.serve_forever()
 
 
+class AsyncWebSocketBridge:
+    """
+    Thread-safe `send` for an asyncio WebSocket connection.
+
+    `ServeClient` sends its messages from inference threads; the bridge schedules them on the
+    event loop that owns the connection, preserving their order.
+
+    Attributes:
+        websocket: The asyncio WebSocket connection.
+        loop (asyncio.AbstractEventLoop): The event loop serving the connection.
+    """
+    def __init__(self, websocket, loop):
+        self.websocket = websocket
+        self.loop = loop
+
+    def send(self, message):
+        """Schedule `message` to be sent to the client."""
+        future = asyncio.run_coroutine_threadsafe(self.websocket.send(message), self.loop)
+        future.add_done_callback(self._log_error)
+
+    def close(self):
+        """Schedule the connection to be closed."""
+        asyncio.run_coroutine_threadsafe(self.websocket.close(), self.loop)
+
+    @staticmethod
+    def _log_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"[ERROR]: Failed to send message to client: {future.exception()}")
+
+
+def common_prefix(a, b):
+    """Returns the longest common prefix of two lists."""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return list(a[:n])
+
+
+def normalize_word(word):
+    """Returns the form of a word compared by the local agreement, without case and surrounding punctuation."""
+    return word.strip().strip(string.punctuation).lower()
+
+
 class ServeClient:
     """
     Attributes:
@@ -180,13 +712,25 @@ class ServeClient:
         task (str): The task type, e.g., "transcribe."
         transcriber (WhisperModel): The Whisper model for speech-to-text.
         timestamp_offset (float): The offset in audio timestamps.
-        frames_np (numpy.ndarray): NumPy array to store audio frames.
-        frames_offset (float): The offset in audio frames.
+        audio_buffer (AudioRingBuffer): Ring buffer holding the most recent audio of the stream.
+        audio_retention (float): Seconds of audio kept in `audio_buffer`.
+        feature_cache (StreamingFeatureExtractor): Log-mel frames of the audio already seen.
+        vad (StreamingVad): Voice activity detection run once over every incoming sample.
         text (list): List of transcribed text segments.
         current_out (str): The current incomplete transcription.
         prev_out (str): The previous incomplete transcription.
         t_start (float): Timestamp for the start of transcription.
         exit (bool): A flag to exit the transcription thread.
+        frames_cond (threading.Condition): Signalled by `add_frames` when enough new audio has arrived.
+        min_new_audio (float): Seconds of new audio that wake up the transcription thread.
+        new_audio_timeout (float): Maximum time in seconds the transcription thread sleeps without new audio.
+        processed_until (float): Stream time up to which audio has been handed to the transcriber.
+        last_inference (tuple): Window `(start, end)` in samples, result and info of the last pass that ran the
+            model. Passes woken up by `new_audio_timeout` reuse the result while less than `min_new_audio` seconds
+            arrived and the window did not move, instead of transcribing the same audio again.
+        keepalive_interval (float): With protocol version 2, seconds without any message after which a pass that
+            reused its result sends a keepalive message.
+        last_message_time (float): `time.monotonic()` of the last message sent to the client.
         same_output_threshold (int): Threshold for consecutive same output segments.
         show_prev_out_thresh (int): Threshold for showing previous output segments.
         add_pause_thresh (int): Threshold for adding a pause (blank) segment.
@@ -195,10 +739,40 @@ class ServeClient:
         wrapper (textwrap.TextWrapper): Text wrapper for formatting text.
         pick_previous_segments (int): Number of previous segments to include in the output.
         websocket: The WebSocket connection for the client.
+        model_pool (ModelPool): Registry the Whisper model is borrowed from, if any.
+        scheduler (InferenceScheduler): Scheduler batching this client's inference with other clients, if any.
+        metrics (ServerMetrics): Server metrics updated by this client, if any.
+        rtf (float): Real-time factor of the last transcription pass, its duration over the new audio it covered.
+        protocol_version (int): Format of the segment messages. 1 resends the last `send_last_n_segments` segments
+            on every pass, 2 only sends newly committed segments and the partial segment when they change.
+        sent_segments (int): Number of transcript segments already sent, with protocol version 2.
+        last_partial (dict): Partial segment last sent, with protocol version 2.
+        segments_lock (threading.Lock): Serializes the segment messages of transcription passes and resyncs.
+        decoding_policy (DecodingPolicy): Adapts the decoding options to the load, None to always use the defaults.
+        word_timestamps (bool): Whether to request word timestamps from the model.
+        fallback_budget (float): Maximum seconds spent on the temperature fallback of one window, None for no limit.
+        parallel_fallback (bool): Whether the fallback temperatures of a window are submitted at once.
+        commit_policy (str): "local_agreement" commits the words on which two consecutive passes agree, using word
+            timestamps, and re-decodes only the rest. "repetition" commits the last segment once its text was
+            repeated by more than 5 passes, and is also used for the passes decoded without word timestamps.
+        hypothesis (list): Uncommitted words `(start, end, text)` of the last pass, in stream time, with the
+            "local_agreement" commit policy.
+        forced_prefix (bool): Whether the tokens on which the last two passes over the same window start agree are
+            forced as the decoder prefix of the next pass, so that only the tokens after them are generated.
+        decoded_tokens (tuple): Window start in samples and tokens of the last pass that ran the model.
+        stable_tokens (list): Longest common prefix of the tokens of the last two passes over the same window start.
+        min_prefix_tokens (int): Minimum number of stable tokens forced as prefix.
+        agreed_words (list): Words `(start, end, text)` committed by the local agreement whose segment is not
+            complete yet. They are out of the transcribed window, but sent as the start of the partial segment.
+        max_agreed_duration (float): Seconds of `agreed_words` after which they are appended to the transcript even
+            though their segment is not complete.
+        tracer (SessionTracer): Aggregates the time spent in every stage of the model for this session and
+                                records it in the stage latencies of `metrics`.
     """
     RATE = 16000
     SERVER_READY = "SERVER_READY"
     DISCONNECT = "DISCONNECT"
+    KEEPALIVE = "KEEPALIVE"
 
     def __init__(
         self,
@@ -211,7 +785,19 @@ class ServeClient:
         model_size_or_path="small",
         initial_prompt=None,
         vad_parameters=None,
-        use_custom_model=False
+        use_custom_model=False,
+        model_pool=None,
+        scheduler=None,
+        audio_retention=45,
+        start_thread=True,
+        metrics=None,
+        protocol_version=1,
+        audio_buffer=None,
+        adaptive_decoding=True,
+        fallback_budget=1.0,
+        parallel_fallback=False,
+        commit_policy="local_agreement",
+        forced_prefix=True,
         ):
         """
         Initialize a ServeClient instance.
@@ -226,9 +812,35 @@ class ServeClient:
             multilingual (bool, optional): Whether the client supports multilingual transcription. Defaults to False.
             language (str, optional): The language for transcription. Defaults to None.
             client_uid (str, optional): A unique identifier for the client. Defaults to None.
+            model_pool (ModelPool, optional): Shared model registry. If None, the client loads its own
+                                              model. Defaults to None.
+            scheduler (InferenceScheduler, optional): Batch the model calls of this client with other
+                                                      clients. Defaults to None.
+            audio_retention (float, optional): Seconds of audio retained for transcription. Defaults to 45.
+            start_thread (bool, optional): Start a transcription thread for this client. Set to False when the
+                                           caller schedules `transcribe_audio` itself. Defaults to True.
+            metrics (ServerMetrics, optional): Record stage latencies and sent messages. Defaults to None.
+            protocol_version (int, optional): Format of the segment messages, 1 or 2. Defaults to 1.
+            audio_buffer (AudioRingBuffer, optional): Buffer the audio of the client is written to, e.g. a
+                                                      `SharedAudioRingBuffer` filled by another process. Its capacity
+                                                      replaces `audio_retention`. Defaults to None.
+            adaptive_decoding (bool, optional): Degrade the decoding options when transcription falls behind real
+                                                time and restore them when the load drops. Defaults to True.
+            fallback_budget (float, optional): Stop the temperature fallback of a window once decoding it would take
+                                               longer than this many seconds, keeping the best result so far.
+                                               None tries all temperatures. Defaults to 1.0.
+            parallel_fallback (bool, optional): When the first temperature of a window fails, submit the remaining
+                                                ones at once so that the model workers decode them concurrently.
+                                                Defaults to False.
+            commit_policy (str, optional): How the text of the last segment is committed, "local_agreement" or
+                                           "repetition". Defaults to "local_agreement".
+            forced_prefix (bool, optional): Force the tokens of the window that the last two passes agree on as the
+                                            decoder prefix, and decode again without it if the result fails the
+                                            quality checks of the model. Defaults to True.
 
         """
         self.client_uid = client_uid
+        self.websocket = websocket
         self.data = b""
         self.frames = b""
         self.model_sizes = [
@@ -242,48 +854,98 @@ class ServeClient:
         
         self.language = language if self.multilingual else "en"
         self.task = task
-        self.websocket = websocket
         self.initial_prompt = initial_prompt
         self.vad_parameters = vad_parameters or {"threshold": 0.5}
+        self.model_pool = model_pool
+        self.metrics = metrics
+        self.protocol_version = 2 if protocol_version == 2 else 1
         
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+        device, compute_type = get_inference_device()
         
         if self.model_size_or_path == None:
             return
         
-        self.transcriber = WhisperModel(
-            self.model_size_or_path,
-            device=device,
-            compute_type="int8" if device=="cpu" else "float16", 
-            local_files_only=False,
-        )
+        if self.model_pool is not None:
+            self.transcriber = self.model_pool.acquire(
+                self.model_size_or_path,
+                device=device,
+                compute_type=compute_type,
+            )
+        else:
+            self.transcriber = WhisperModel(
+                self.model_size_or_path,
+                device=device,
+                compute_type=compute_type,
+                local_files_only=False,
+            )
+        if scheduler is not None:
+            scheduler.attach(self.transcriber)
         
         self.timestamp_offset = 0.0
-        self.frames_np = None
-        self.frames_offset = 0.0
+        if audio_buffer is None:
+            audio_buffer = AudioRingBuffer(int(audio_retention * self.RATE))
+        self.audio_buffer = audio_buffer
+        self.audio_retention = self.audio_buffer.capacity / self.RATE
+        self.feature_cache = StreamingFeatureExtractor(
+            self.transcriber.feature_extractor, self.audio_buffer.capacity
+        )
+        self.vad = StreamingVad(
+            self.vad_parameters,
+            sampling_rate=self.RATE,
+            hop_length=self.transcriber.feature_extractor.hop_length,
+        )
         self.text = []
         self.current_out = ''
         self.prev_out = ''
         self.t_start=None
         self.exit = False
+        self.frames_cond = threading.Condition()
+        self.min_new_audio = 0.25
+        self.new_audio_timeout = 1.0
+        self.processed_until = 0.0
+        self.last_inference = None
+        self.keepalive_interval = 5.0
+        self.last_message_time = time.monotonic()
+        self.rtf = 0.0
+        self.decoding_policy = DecodingPolicy() if adaptive_decoding else None
+        if commit_policy not in COMMIT_POLICIES:
+            raise ValueError(f"Unsupported commit policy {commit_policy}. Available choices: {list(COMMIT_POLICIES)}")
+        self.commit_policy = commit_policy
+        self.hypothesis = []
+        self.agreed_words = []
+        self.max_agreed_duration = 10.0
+        self.forced_prefix = forced_prefix
+        self.decoded_tokens = None
+        self.stable_tokens = []
+        self.min_prefix_tokens = 4
+        # word timestamps locate the end of the committed words in the audio
+        self.word_timestamps = commit_policy == "local_agreement"
+        self.fallback_budget = fallback_budget
+        self.parallel_fallback = parallel_fallback
+        self.tracer = SessionTracer(metrics)
         self.same_output_threshold = 0
         self.show_prev_out_thresh = 5   # if pause(no output from whisper) show previous output for 5 seconds
         self.add_pause_thresh = 3       # add a blank to segment list as a pause(no speech) for 3 seconds
         self.transcript = []
         self.send_last_n_segments = 10
+        self.sent_segments = 0
+        self.last_partial = None
+        self.segments_lock = threading.Lock()
 
         # text formatting
         self.wrapper = textwrap.TextWrapper(width=50)
         self.pick_previous_segments = 2
 
         # threading
-        self.trans_thread = threading.Thread(target=self.speech_to_text)
-        self.trans_thread.start()
+        if start_thread:
+            self.trans_thread = threading.Thread(target=self.speech_to_text)
+            self.trans_thread.start()
         self.websocket.send(
             json.dumps(
                 {
                     "uid": self.client_uid,
-                    "message": self.SERVER_READY
+                    "message": self.SERVER_READY,
+                    "protocol_version": self.protocol_version,
                 }
             )
         )
@@ -317,25 +979,53 @@ class ServeClient:
         """
         Add audio frames to the ongoing audio stream buffer.
 
-        This method is responsible for maintaining the audio stream buffer, allowing the continuous addition
-        of audio frames as they are received. It also ensures that the buffer does not exceed a specified size
-        to prevent excessive memory usage.
-
-        If the buffer size exceeds a threshold (45 seconds of audio data), it discards the oldest 30 seconds
-        of audio data to maintain a reasonable buffer size. If the buffer is empty, it initializes it with the provided
-        audio frame. The audio stream buffer is used for real-time processing of audio data for transcription.
+        Frames are written into a preallocated ring buffer retaining the last `audio_retention` seconds, so the
+        cost of adding a frame only depends on the frame size. The audio stream buffer is used for real-time
+        processing of audio data for transcription.
 
         Args:
             frame_np (numpy.ndarray): The audio frame data as a NumPy array.
 
         """
-        if self.frames_np is not None and self.frames_np.shape[0] > 45*self.RATE:
-            self.frames_offset += 30.0
-            self.frames_np = self.frames_np[int(30*self.RATE):]
-        if self.frames_np is None:
-            self.frames_np = frame_np.copy()
-        else:
-            self.frames_np = np.concatenate((self.frames_np, frame_np), axis=0)
+        with self.frames_cond:
+            self.audio_buffer.append(frame_np)
+
+            if self.has_new_audio():
+                self.frames_cond.notify()
+
+    def notify_new_audio(self):
+        """
+        Wake up the transcription thread if enough audio was appended to `audio_buffer` by someone else than
+        `add_frames`, e.g. by the front end process when the client runs in a worker process.
+        """
+        with self.frames_cond:
+            if self.has_new_audio():
+                self.frames_cond.notify()
+
+    def has_new_audio(self):
+        """
+        Whether at least `min_new_audio` seconds of audio arrived since the last transcription pass.
+        """
+        received_until = self.audio_buffer.end / self.RATE
+        return received_until - self.processed_until >= self.min_new_audio
+
+    def get_backlog(self):
+        """
+        Returns:
+            float: Seconds of audio received but not handed to the transcriber yet.
+        """
+        return self.audio_buffer.end / self.RATE - self.processed_until
+
+    def record_dropped_audio(self, seconds, reason):
+        if self.metrics is not None and seconds > 0:
+            self.metrics.dropped_audio_seconds.inc(seconds, reason=reason)
+
+    def send_message(self, message, message_type):
+        """Send a JSON message to the client and count it in the metrics."""
+        self.websocket.send(json.dumps(message))
+        self.last_message_time = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.messages_sent.inc(type=message_type)
 
     def speech_to_text(self):
         """
@@ -344,11 +1034,9 @@ class ServeClient:
         This method continuously receives audio frames, performs real-time transcription, and sends
         transcribed segments to the client via a WebSocket connection.
 
-        If the client's language is not detected, it waits for 30 seconds of audio input to make a language prediction.
-        It utilizes the Whisper ASR model to transcribe the audio, continuously processing and streaming results. Segments
-        are sent to the client in real-time, and a history of segments is maintained to provide context.Pauses in speech 
-        (no output from Whisper) are handled by showing the previous output for a set duration. A blank segment is added if 
-        there is no speech for a specified duration to indicate a pause.
+        The thread sleeps on `frames_cond` until `add_frames` signals that `min_new_audio` seconds of
+        new audio are available, or at most `new_audio_timeout` seconds, so idle clients do not use any CPU.
+        Each wake-up runs one `transcribe_audio` pass, which only runs the model if new audio arrived.
 
         Raises:
             Exception: If there is an issue with audio processing or WebSocket communication.
@@ -357,83 +1045,287 @@ class ServeClient:
         while True:
             if self.exit:
                 logging.info("Exiting speech to text thread")
+                self.tracer.log_summary(self.client_uid)
+                self.release_model()
                 break
-            
-            if self.frames_np is None: 
-                continue
-
-            # clip audio if the current chunk exceeds 30 seconds, this basically implies that
-            # no valid segment for the last 30 seconds from whisper
-            if self.frames_np[int((self.timestamp_offset - self.frames_offset)*self.RATE):].shape[0] > 25 * self.RATE:
-                duration = self.frames_np.shape[0] / self.RATE
-                self.timestamp_offset = self.frames_offset + duration - 5
-    
-            samples_take = max(0, (self.timestamp_offset - self.frames_offset)*self.RATE)
-            input_bytes = self.frames_np[int(samples_take):].copy()
-            duration = input_bytes.shape[0] / self.RATE
-            if duration<1.0:
-                continue
-            try:
-                input_sample = input_bytes.copy()
-                
-                # whisper transcribe with prompt
-                result, info = self.transcriber.transcribe(
-                    input_sample, 
-                    initial_prompt=self.initial_prompt,
-                    language=self.language,
-                    task=self.task,
-                    vad_filter=True,
-                    vad_parameters=self.vad_parameters
+
+            with self.frames_cond:
+                self.frames_cond.wait_for(
+                    lambda: self.exit or self.has_new_audio(),
+                    timeout=self.new_audio_timeout
                 )
+                if self.exit:
+                    continue
 
-                if self.language is None:
-                    if info.language_probability > 0.5:
-                        self.language = info.language
-                        logging.info(f"Detected language {self.language} with probability {info.language_probability}")
-                        self.websocket.send(json.dumps(
-                            {"uid": self.client_uid, "language": self.language, "language_prob": info.language_probability}))
-                    else:
-                        # detect language again
-                        continue
+            self.transcribe_audio()
+
+    def transcribe_audio(self):
+        """
+        Run one transcription pass over the uncommitted audio and send the result to the client.
+
+        If the client's language is not detected, it waits for 30 seconds of audio input to make a language prediction.
+        It utilizes the Whisper ASR model to transcribe the audio, continuously processing and streaming results. Segments
+        are sent to the client in real-time, and a history of segments is maintained to provide context.Pauses in speech 
+        (no output from Whisper) are handled by showing the previous output for a set duration. A blank segment is added if 
+        there is no speech for a specified duration to indicate a pause.
+
+        When the stream stalls, the window is unchanged since the last pass and the previous result is reused
+        without running the model, so that the pause handling above still advances.
+        """
+        pass_start = time.perf_counter()
+        with self.frames_cond:
+            end = self.audio_buffer.end
+            if end == 0:
+                return
+            new_audio = end / self.RATE - self.processed_until
+
+        # clip audio if the current chunk exceeds 30 seconds, this basically implies that
+        # no valid segment for the last 30 seconds from whisper
+        if end - int(self.timestamp_offset * self.RATE) > 25 * self.RATE:
+            self.record_dropped_audio(end / self.RATE - 5 - self.timestamp_offset, "clipped")
+            self.timestamp_offset = end / self.RATE - 5
+
+        # windows start on a feature frame boundary so cached log-mel frames can be reused
+        start = self.feature_cache.align(int(self.timestamp_offset * self.RATE))
+        if start < self.audio_buffer.start:
+            self.record_dropped_audio((self.audio_buffer.start - start) / self.RATE, "overwritten")
+            start = self.audio_buffer.start
+        self.timestamp_offset = start / self.RATE
+        duration = (end - start) / self.RATE
+
+        reuse = (
+            self.last_inference is not None
+            and self.last_inference[0] == start
+            and end - self.last_inference[1] < self.min_new_audio * self.RATE
+        )
+        if reuse:
+            # transcribing the same audio again would give the same result
+            end = self.last_inference[1]
+            duration = (end - start) / self.RATE
+            new_audio = 0.0
+        else:
+            with self.frames_cond:
+                self.processed_until = end / self.RATE
+        if duration<1.0:
+            return
+        try:
+            if reuse:
+                _, _, result, info = self.last_inference
+                if self.metrics is not None:
+                    self.metrics.reused_passes.inc()
+            else:
+                result, info = self.run_inference(start, end)
+                self.last_inference = (start, end, result, info)
+
+            if not self.audio_buffer.is_retained(start):
+                logging.warning("Audio was overwritten during transcription, dropping the result.")
+                if self.metrics is not None:
+                    self.metrics.dropped_passes.inc()
+                return
+
+            if self.language is None and info is not None:
+                if info.language_probability > 0.5:
+                    self.language = info.language
+                    logging.info(f"Detected language {self.language} with probability {info.language_probability}")
+                    self.send_message(
+                        {"uid": self.client_uid, "language": self.language, "language_prob": info.language_probability},
+                        "language",
+                    )
+                else:
+                    # detect language again
+                    return
 
-                if len(result):
-                    self.t_start = None
-                    last_segment = self.update_segments(result, duration)
+            if len(result):
+                self.t_start = None
+                last_segment = self.update_segments(result, duration, reused=reuse)
+                if len(self.transcript) < self.send_last_n_segments:
+                    segments = self.transcript
+                else:
+                    segments = self.transcript[-self.send_last_n_segments:]
+                if last_segment is not None:
+                    segments = segments + [last_segment]                    
+            else:
+                last_segment = None
+                self.hypothesis = []
+                self.flush_agreed_words()
+                # show previous output if there is pause i.e. no output from whisper
+                segments = []
+                if self.t_start is None: self.t_start = time.time()
+                if time.time() - self.t_start < self.show_prev_out_thresh:
                     if len(self.transcript) < self.send_last_n_segments:
                         segments = self.transcript
                     else:
                         segments = self.transcript[-self.send_last_n_segments:]
-                    if last_segment is not None:
-                        segments = segments + [last_segment]                    
-                else:
-                    # show previous output if there is pause i.e. no output from whisper
-                    segments = []
-                    if self.t_start is None: self.t_start = time.time()
-                    if time.time() - self.t_start < self.show_prev_out_thresh:
-                        if len(self.transcript) < self.send_last_n_segments:
-                            segments = self.transcript
-                        else:
-                            segments = self.transcript[-self.send_last_n_segments:]
-                    
-                    # add a blank if there is no speech for 3 seconds
-                    if len(self.text) and self.text[-1] != '':
-                        if time.time() - self.t_start > self.add_pause_thresh:
-                            self.text.append('')
-
-                try:
-                    self.websocket.send(
-                        json.dumps({
-                            "uid": self.client_uid,
-                            "segments": segments
-                        })
-                    )
-                except Exception as e:
-                    logging.error(f"[ERROR]: Failed to send message to client: {e}")
+                
+                # add a blank if there is no speech for 3 seconds
+                if len(self.text) and self.text[-1] != '':
+                    if time.time() - self.t_start > self.add_pause_thresh:
+                        self.text.append('')
 
+            try:
+                if self.protocol_version == 2:
+                    self.send_segment_updates(last_segment)
+                    if time.monotonic() - self.last_message_time >= self.keepalive_interval:
+                        self.send_message({"uid": self.client_uid, "message": self.KEEPALIVE}, "keepalive")
+                else:
+                    self.send_message({"uid": self.client_uid, "segments": segments}, "segments")
             except Exception as e:
-                logging.error(f"[ERROR]: Failed to transcribe audio chunk: {e}")
-                time.sleep(0.01)
-    
+                logging.error(f"[ERROR]: Failed to send message to client: {e}")
+
+            if new_audio > 0:
+                self.rtf = (time.perf_counter() - pass_start) / new_audio
+                if self.decoding_policy is not None:
+                    self.decoding_policy.update(self.rtf, new_audio)
+
+        except Exception as e:
+            logging.error(f"[ERROR]: Failed to transcribe audio chunk: {e}")
+            time.sleep(0.01)
+
+    def run_inference(self, start, end):
+        """
+        Transcribe the window `[start, end)` of `audio_buffer`.
+
+        Args:
+            start (int): First sample of the window in the stream.
+            end (int): End sample of the window in the stream.
+
+        Returns:
+            tuple: The segments and the `TranscriptionInfo` of the window, `([], None)` if it contains no speech.
+        """
+        # zero-copy view, add_frames only writes past `end`
+        input_sample = self.audio_buffer.view(start, end)
+
+        # only the audio received since the last pass goes through the VAD model
+        with StageTimer(self.metrics, "vad"):
+            self.vad.process(self.audio_buffer)
+            self.vad.discard_before(start)
+            speech_chunks = self.vad.get_speech_chunks(start, end)
+
+        if not speech_chunks:
+            # no speech in the window, nothing to transcribe
+            self.decoded_tokens = None
+            self.stable_tokens = []
+            return [], None
+
+        with StageTimer(self.metrics, "features"):
+            log_mel = self.feature_cache.get_log_mel(self.audio_buffer, start, end)
+
+        prefix = None
+        if (
+            self.forced_prefix
+            and self.decoded_tokens is not None
+            and self.decoded_tokens[0] == start
+            and len(self.stable_tokens) >= self.min_prefix_tokens
+        ):
+            prefix = self.stable_tokens
+
+        result, info = self.transcribe_window(input_sample, log_mel, speech_chunks, prefix)
+        tokens = [token for segment in result for token in segment.tokens]
+        if prefix is not None and not (result and all(segment.temperature == 0.0 for segment in result)):
+            # the prefix does not fit the audio anymore, e.g. a word at its end was misheard
+            if self.metrics is not None:
+                self.metrics.prefix_fallbacks.inc()
+            result, info = self.transcribe_window(input_sample, log_mel, speech_chunks, None)
+            tokens = [token for segment in result for token in segment.tokens]
+            self.stable_tokens = []
+        elif self.decoded_tokens is not None and self.decoded_tokens[0] == start:
+            self.stable_tokens = common_prefix(self.decoded_tokens[1], tokens)
+        else:
+            self.stable_tokens = []
+        self.decoded_tokens = (start, tokens)
+        return result, info
+
+    def transcribe_window(self, input_sample, log_mel, speech_chunks, prefix):
+        """
+        Runs the model on a window.
+
+        Args:
+            input_sample (numpy.ndarray): Audio of the window.
+            log_mel (numpy.ndarray): Log-mel features of the window.
+            speech_chunks (list): Speech in the window, as found by the VAD.
+            prefix (list): Token ids forced at the start of the output, None to decode the whole window.
+
+        Returns:
+            tuple: The segments and the `TranscriptionInfo` of the window.
+        """
+        with StageTimer(self.metrics, "transcribe"):
+            return self.transcriber.transcribe(
+                input_sample,
+                initial_prompt=self.initial_prompt,
+                prefix=prefix,
+                language=self.language,
+                task=self.task,
+                vad_filter=True,
+                vad_parameters=self.vad_parameters,
+                log_mel=log_mel,
+                speech_chunks=speech_chunks,
+                tracer=self.tracer,
+                **self.get_decoding_options(),
+            )
+
+    def get_decoding_options(self):
+        """
+        Returns:
+            dict: Decoding keyword arguments of `WhisperModel.transcribe` for the next pass.
+        """
+        if self.decoding_policy is None:
+            options = {"word_timestamps": self.word_timestamps}
+        else:
+            options = self.decoding_policy.options(self.word_timestamps)
+        options["fallback_budget"] = self.fallback_budget
+        options["parallel_fallback"] = self.parallel_fallback
+        return options
+
+    def send_segment_updates(self, partial):
+        """
+        Send the segments committed since the last message and the current partial segment (protocol version 2).
+
+        Committed segments are numbered by their position in the transcript, so that the client can detect a
+        missing message and ask for a resync. Nothing is sent if nothing changed since the last message.
+
+        Args:
+            partial (dict): The incomplete last segment of the pass, None if there is none.
+        """
+        with self.segments_lock:
+            committed = self.transcript[self.sent_segments:]
+            if not committed and partial == self.last_partial:
+                return
+            message = {
+                "uid": self.client_uid,
+                "committed": [
+                    dict(segment, id=self.sent_segments + i) for i, segment in enumerate(committed)
+                ],
+                "partial": partial,
+            }
+            self.sent_segments += len(committed)
+            self.last_partial = partial
+            self.send_message(message, "segments")
+
+    def resync(self):
+        """
+        Send the whole transcript and the current partial segment, when the client requests a resync.
+        """
+        if self.protocol_version != 2:
+            return
+        with self.segments_lock:
+            transcript = list(self.transcript)
+            message = {
+                "uid": self.client_uid,
+                "resync": True,
+                "committed": [dict(segment, id=i) for i, segment in enumerate(transcript)],
+                "partial": self.last_partial,
+            }
+            self.sent_segments = len(transcript)
+            self.send_message(message, "resync")
+
+    def release_model(self):
+        """
+        Return the Whisper model to the model pool once the client stopped transcribing.
+        """
+        if self.model_pool is not None and self.transcriber is not None:
+            self.model_pool.release(self.transcriber)
+            self.transcriber = None
+
     def format_segment(self, start, end, text):
         """Helper function to format a segment with string timestamps."""
         return {
@@ -442,7 +1334,7 @@ class ServeClient:
             'text': text
         }
 
-    def update_segments(self, segments, duration):
+    def update_segments(self, segments, duration, reused=False):
         """
         Processes the segments from whisper. Appends all the segments to the list
         except for the last segment assuming that it is incomplete.
@@ -458,11 +1350,22 @@ class ServeClient:
         Args:
             segments(dict) : dictionary of segments as returned by whisper
             duration(float): duration of the current chunk
+            reused(bool): whether the segments are the result of the previous pass, reused because no new audio
+                arrived. They count as a repetition of the incomplete segment, but are never compared with
+                themselves by the local agreement policy.
         
         Returns:
             dict or None: The last processed segment with its start time, end time, and transcribed text.
                      Returns None if there are no valid segments to process.
         """
+        if self.commit_policy == "local_agreement" and all(s.words is not None for s in segments):
+            if reused:
+                # a result agrees with itself, only a pass over new audio can confirm words
+                return self.get_partial_segment()
+            return self.commit_agreed_words(segments, duration)
+        self.hypothesis = []
+        self.flush_agreed_words()
+
         offset = None
         self.current_out = ''
         last_segment = None
@@ -510,7 +1413,83 @@ class ServeClient:
             self.timestamp_offset += offset
 
         return last_segment
-    
+
+    def commit_agreed_words(self, segments, duration):
+        """
+        Commits the longest prefix of words on which this pass and the previous one agree (local agreement).
+
+        The words of a pass are compared with the uncommitted words of the previous pass, ignoring case and
+        punctuation, and `timestamp_offset` moves to the end of the agreed words, so that the next pass only decodes
+        the unstable tail. Agreed words are kept in `agreed_words` until the segment they belong to is complete, or
+        `max_agreed_duration` is reached, and then appended to the transcript as one segment. The segments must come
+        from a pass over new audio: a reused result would agree with itself entirely.
+
+        Args:
+            segments (list): Segments of the pass, with word timestamps.
+            duration (float): Duration of the transcribed window.
+
+        Returns:
+            dict or None: The agreed words of the incomplete segment and the uncommitted words as the partial
+                          segment, None if there are none.
+        """
+        words = []
+        for i, segment in enumerate(segments):
+            for word in segment.words:
+                words.append((
+                    self.timestamp_offset + word.start,
+                    self.timestamp_offset + min(duration, word.end),
+                    word.word,
+                    i,
+                ))
+
+        agreed = 0
+        for word, previous in zip(words, self.hypothesis):
+            if normalize_word(word[2]) != normalize_word(previous[2]):
+                break
+            agreed += 1
+
+        # the segment of the first disagreeing word is still open
+        open_segment = words[agreed][3] if agreed < len(words) else None
+        current = None
+        for start, end, text, i in words[:agreed]:
+            if current is not None and i != current:
+                self.flush_agreed_words()
+            current = i
+            self.agreed_words.append((start, end, text))
+        if current is not None and current != open_segment:
+            self.flush_agreed_words()
+        if self.agreed_words and self.agreed_words[-1][1] - self.agreed_words[0][0] >= self.max_agreed_duration:
+            self.flush_agreed_words()
+        if agreed:
+            self.timestamp_offset = words[agreed - 1][1]
+
+        self.hypothesis = [(start, end, text) for start, end, text, _ in words[agreed:]]
+        last_segment = self.get_partial_segment()
+        self.prev_out = self.current_out
+        self.same_output_threshold = 0
+        return last_segment
+
+    def get_partial_segment(self):
+        """
+        Returns:
+            dict or None: The agreed words of the incomplete segment followed by the uncommitted words, None if
+                          there are none.
+        """
+        partial = self.agreed_words + self.hypothesis
+        self.current_out = "".join(text for _, _, text in partial)
+        if not partial:
+            return None
+        return self.format_segment(partial[0][0], partial[-1][1], self.current_out)
+
+    def flush_agreed_words(self):
+        """Appends the words in `agreed_words` to the transcript as one segment."""
+        if not self.agreed_words:
+            return
+        text = "".join(text for _, _, text in self.agreed_words)
+        self.text.append(text)
+        self.transcript.append(self.format_segment(self.agreed_words[0][0], self.agreed_words[-1][1], text))
+        self.agreed_words = []
+
     def disconnect(self):
         """
         Notify the client of disconnection and send a disconnect message.
@@ -539,3 +1518,5 @@ class ServeClient:
         """
         logging.info("Cleaning up.")
         self.exit = True
+        with self.frames_cond:
+            self.frames_cond.notify()
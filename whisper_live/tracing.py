@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+
+
+class Tracer:
+    """
+    Receives the timed spans of the stages of `WhisperModel.transcribe`: "vad", "features", "language_detection",
+    "encode", "generate" and "alignment".
+
+    Spans carry attributes identifying their window (`window`, the start of the window in seconds, or `windows`,
+    the number of windows of a batch) and, for "generate", the sampling `temperature` of the attempt (a tuple when
+    several temperatures are submitted at once). Subclasses override `record`; it can be called from several
+    threads when a model is shared.
+    """
+    def span(self, name, **attributes):
+        """Returns a context manager recording the duration of its block as a span."""
+        return Span(self, name, attributes)
+
+    def record(self, name, seconds, attributes):
+        """
+        Called once per finished span.
+
+        Args:
+            name (str): The stage.
+            seconds (float): Duration of the span.
+            attributes (dict): Attributes of the span.
+        """
+        raise NotImplementedError
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attributes", "start")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, time.perf_counter() - self.start, self.attributes)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def trace(tracer, name, **attributes):
+    """Returns a span of `tracer`, or a shared no-op context manager when tracing is disabled."""
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **attributes)
+
+
+class SessionTracer(Tracer):
+    """
+    Aggregates the spans of the transcription passes of one client session, and forwards them to the stage
+    latency histogram of the server metrics.
+
+    Attributes:
+        metrics (ServerMetrics): Metrics the spans are recorded in, None to only aggregate them.
+        totals (dict): Number of spans and total seconds by stage.
+        temperatures (dict): Number of "generate" spans and total seconds by sampling temperature.
+    """
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.temperatures = {}
+
+    def record(self, name, seconds, attributes):
+        with self.lock:
+            count, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (count + 1, total + seconds)
+            if name == "generate":
+                temperature = attributes.get("temperature")
+                count, total = self.temperatures.get(temperature, (0, 0.0))
+                self.temperatures[temperature] = (count + 1, total + seconds)
+        if self.metrics is not None:
+            self.metrics.observe_stage(name, seconds)
+
+    def summary(self):
+        """
+        Returns:
+            dict: For every stage, the number of spans and their total and mean duration in seconds.
+        """
+        with self.lock:
+            return {
+                name: {"count": count, "seconds": total, "mean_seconds": total / count}
+                for name, (count, total) in self.totals.items()
+            }
+
+    def log_summary(self, client_uid):
+        summary = self.summary()
+        if not summary:
+            return
+        stages = ", ".join(
+            f"{name} {stats['seconds']:.2f}s/{stats['count']}" for name, stats in sorted(summary.items())
+        )
+        logging.info(f"Client '{client_uid}' model time by stage (total/spans): {stages}")
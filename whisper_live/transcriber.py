@@ -5,6 +5,9 @@ import logging
 import os
 import zlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from inspect import signature
 
 from typing import BinaryIO, Iterable, List, NamedTuple, Optional, Tuple, Union
@@ -24,6 +27,9 @@ from faster_whisper.vad import (
     get_speech_timestamps,
 )
 
+from whisper_live.features import collect_log_mel_chunks, pad_log_mel
+from whisper_live.tracing import Tracer, trace
+
 
 class Word(NamedTuple):
     start: float
@@ -60,7 +66,7 @@ class TranscriptionOptions(NamedTuple):
     prompt_reset_on_temperature: float
     temperatures: List[float]
     initial_prompt: Optional[Union[str, Iterable[int]]]
-    prefix: Optional[str]
+    prefix: Optional[Union[str, Iterable[int]]]
     suppress_blank: bool
     suppress_tokens: Optional[List[int]]
     without_timestamps: bool
@@ -68,6 +74,48 @@ class TranscriptionOptions(NamedTuple):
     word_timestamps: bool
     prepend_punctuations: str
     append_punctuations: str
+    fallback_budget: Optional[float]
+    parallel_fallback: bool
+    tracer: Optional[Tracer]
+
+
+class FallbackStats:
+    """Counters of the temperature fallback of `generate_with_fallback`, shared by all callers of a model."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = 0
+        self.attempts = 0
+        self.fallbacks = 0
+        self.budget_exceeded = 0
+        self.exhausted = 0
+
+    def record(self, attempts: int, budget_exceeded: bool, exhausted: bool) -> None:
+        with self.lock:
+            self.windows += 1
+            self.attempts += attempts
+            self.fallbacks += attempts > 1
+            self.budget_exceeded += budget_exceeded
+            self.exhausted += exhausted
+
+    def snapshot(self) -> dict:
+        """Returns the counters: decoded windows, generate calls, windows that fell back at least once,
+        windows cut short by the fallback budget and windows where all temperatures failed."""
+        with self.lock:
+            return {
+                "windows": self.windows,
+                "attempts": self.attempts,
+                "fallbacks": self.fallbacks,
+                "budget_exceeded": self.budget_exceeded,
+                "exhausted": self.exhausted,
+            }
+
+
+class DecodingSetup(NamedTuple):
+    tokenizer: Tokenizer
+    suppress_tokens: Optional[List[int]]
+    initial_prompt_tokens: List[int]
+    sot_sequence: Tuple[int, ...]
 
 
 class TranscriptionInfo(NamedTuple):
@@ -91,6 +139,8 @@ class WhisperModel:
         num_workers: int = 1,
         download_root: Optional[str] = None,
         local_files_only: bool = False,
+        tracer: Optional[Tracer] = None,
+        decoding_setup_cache_size: int = 32,
     ):
         """Initializes the Whisper model.
 
@@ -117,9 +167,13 @@ class WhisperModel:
             are saved in the standard Hugging Face cache directory.
           local_files_only:  If True, avoid downloading the file and return the path to the
             local cached file if it exists.
+          tracer: Tracer receiving timed spans of the stages of every transcription (VAD,
+            features, language detection, encoder, every decoding attempt and alignment).
+            None disables tracing. It can be overridden per call of transcribe().
+          decoding_setup_cache_size: Number of tokenizers, with their suppressed tokens and
+            encoded initial prompt, kept for the next transcribe() calls with the same task,
+            language, suppressed tokens and initial prompt.
         """
-        self.logger = get_logger()
-
         if os.path.isdir(model_size_or_path):
             model_path = model_size_or_path
         else:
@@ -129,7 +183,7 @@ class WhisperModel:
                 cache_dir=download_root,
             )
 
-        self.model = ctranslate2.models.Whisper(
+        model = ctranslate2.models.Whisper(
             model_path,
             device=device,
             device_index=device_index,
@@ -137,16 +191,73 @@ class WhisperModel:
             intra_threads=cpu_threads,
             inter_threads=num_workers,
         )
+        self._init_from_model(
+            model,
+            model_path=model_path,
+            tracer=tracer,
+            decoding_setup_cache_size=decoding_setup_cache_size,
+        )
 
-        tokenizer_file = os.path.join(model_path, "tokenizer.json")
-        if os.path.isfile(tokenizer_file):
-            self.hf_tokenizer = tokenizers.Tokenizer.from_file(tokenizer_file)
-        else:
-            self.hf_tokenizer = tokenizers.Tokenizer.from_pretrained(
-                "openai/whisper-tiny" + ("" if self.model.is_multilingual else ".en")
-            )
+    @classmethod
+    def from_model(
+        cls,
+        model,
+        model_path: Optional[str] = None,
+        hf_tokenizer: Optional[tokenizers.Tokenizer] = None,
+        tracer: Optional[Tracer] = None,
+        decoding_setup_cache_size: int = 32,
+    ) -> "WhisperModel":
+        """Creates a WhisperModel running on an already loaded model.
+
+        Args:
+          model: A ctranslate2.models.Whisper, or any object with the same interface, e.g.
+            a model shared with another WhisperModel or a stand-in for benchmarks.
+          model_path: Directory of the model files, used to load the tokenizer and the
+            feature extractor configuration. If not set, the default feature extractor is used.
+          hf_tokenizer: Tokenizer of the model. If not set, it is loaded from model_path,
+            and without model_path transcribe() cannot be called.
+          tracer: See __init__.
+          decoding_setup_cache_size: See __init__.
+        """
+        whisper_model = cls.__new__(cls)
+        whisper_model._init_from_model(
+            model,
+            model_path=model_path,
+            hf_tokenizer=hf_tokenizer,
+            tracer=tracer,
+            decoding_setup_cache_size=decoding_setup_cache_size,
+        )
+        return whisper_model
+
+    def _init_from_model(
+        self,
+        model,
+        model_path: Optional[str] = None,
+        hf_tokenizer: Optional[tokenizers.Tokenizer] = None,
+        tracer: Optional[Tracer] = None,
+        decoding_setup_cache_size: int = 32,
+    ):
+        """Initializes everything but the model, see from_model()."""
+        self.logger = get_logger()
+        self.tracer = tracer
+        self.decoding_setups = OrderedDict()
+        self.decoding_setup_cache_size = decoding_setup_cache_size
+        self.decoding_setups_lock = threading.Lock()
+
+        self.model_path = model_path
+        self.model = model
+
+        self.hf_tokenizer = hf_tokenizer
+        if hf_tokenizer is None and model_path is not None:
+            tokenizer_file = os.path.join(model_path, "tokenizer.json")
+            if os.path.isfile(tokenizer_file):
+                self.hf_tokenizer = tokenizers.Tokenizer.from_file(tokenizer_file)
+            else:
+                self.hf_tokenizer = tokenizers.Tokenizer.from_pretrained(
+                    "openai/whisper-tiny" + ("" if self.model.is_multilingual else ".en")
+                )
 
-        self.feat_kwargs = self._get_feature_kwargs(model_path)
+        self.feat_kwargs = self._get_feature_kwargs(model_path) if model_path is not None else {}
         self.feature_extractor = FeatureExtractor(**self.feat_kwargs)
         self.num_samples_per_token = self.feature_extractor.hop_length * 2
         self.frames_per_second = (
@@ -158,6 +269,7 @@ class WhisperModel:
         self.input_stride = 2
         self.time_precision = 0.02
         self.max_length = 448
+        self.fallback_stats = FallbackStats()
 
     @property
     def supported_languages(self) -> List[str]:
@@ -205,7 +317,7 @@ class WhisperModel:
         condition_on_previous_text: bool = True,
         prompt_reset_on_temperature: float = 0.5,
         initial_prompt: Optional[Union[str, Iterable[int]]] = None,
-        prefix: Optional[str] = None,
+        prefix: Optional[Union[str, Iterable[int]]] = None,
         suppress_blank: bool = True,
         suppress_tokens: Optional[List[int]] = [-1],
         without_timestamps: bool = False,
@@ -215,6 +327,12 @@ class WhisperModel:
         append_punctuations: str = "\"'.。,，!！?？:：”)]}、",
         vad_filter: bool = False,
         vad_parameters: Optional[Union[dict, VadOptions]] = None,
+        log_mel: Optional[np.ndarray] = None,
+        speech_chunks: Optional[List[dict]] = None,
+        fallback_budget: Optional[float] = None,
+        parallel_fallback: bool = False,
+        batch_size: Optional[int] = None,
+        tracer: Optional[Tracer] = None,
     ) -> Tuple[Iterable[Segment], TranscriptionInfo]:
         """Transcribes an input file.
 
@@ -249,7 +367,10 @@ class WhisperModel:
             Arg has effect only if condition_on_previous_text is True.
           initial_prompt: Optional text string or iterable of token ids to provide as a
             prompt for the first window.
-          prefix: Optional text to provide as a prefix for the first window.
+          prefix: Optional text to provide as a prefix for the first window, or iterable of
+            token ids forced at the start of its output, timestamp tokens included, e.g. the
+            tokens of a previous transcription of the same audio. The decoder then only
+            generates the tokens after them.
           suppress_blank: Suppress blank outputs at the beginning of the sampling.
           suppress_tokens: List of token IDs to suppress. -1 will suppress a default set
             of symbols as defined in the model config.json file.
@@ -266,6 +387,29 @@ class WhisperModel:
             https://github.com/snakers4/silero-vad.
           vad_parameters: Dictionary of Silero VAD parameters or VadOptions class (see available
             parameters and default values in the class `VadOptions`).
+          log_mel: Precomputed log10 mel frames of `audio` without padding or normalization,
+            e.g. from a StreamingFeatureExtractor. When set, the features are not recomputed
+            from the audio.
+          speech_chunks: Precomputed speech chunks of `audio` (e.g. from a StreamingVad), as
+            returned by `get_speech_timestamps`. When set with `vad_filter`, the VAD model
+            is not run on the audio.
+          fallback_budget: Maximum time in seconds spent decoding one 30-second window. The
+            temperature fallback stops before an attempt that is expected to exceed the budget,
+            judging from the duration of the previous attempt, and the best result so far is used.
+            None (the default) tries all temperatures.
+          parallel_fallback: When the first temperature fails, submit all the remaining sampling
+            temperatures at once and keep the first acceptable result in temperature order. They
+            are decoded concurrently when the model has several workers (`num_workers`), which
+            shortens the worst case at the cost of attempts that turn out not to be needed.
+          batch_size: Transcribe long audio this many windows at a time instead of one window
+            after the other. The audio is split at the silences found by the VAD (configured with
+            `vad_parameters`) into chunks of at most 30 seconds, which are encoded and decoded in
+            batches, each without the text of the previous chunks as prompt. The segments keep
+            their timestamps in the original audio. Speech is always VAD filtered in this mode,
+            and `log_mel`, `prefix`, `condition_on_previous_text`, `fallback_budget` and
+            `parallel_fallback` have no effect.
+          tracer: Tracer receiving the timed spans of this transcription, e.g. to aggregate the
+            stages per caller of a shared model. Defaults to the tracer of the model.
 
         Returns:
           A tuple with:
@@ -274,23 +418,57 @@ class WhisperModel:
             - an instance of TranscriptionInfo
         """
         sampling_rate = self.feature_extractor.sampling_rate
+        if tracer is None:
+            tracer = self.tracer
 
         if not isinstance(audio, np.ndarray):
             audio = decode_audio(audio, sampling_rate=sampling_rate)
 
-        duration = audio.shape[0] / sampling_rate
+        n_samples = audio.shape[0]
+        duration = n_samples / sampling_rate
         duration_after_vad = duration
 
         self.logger.info(
             "Processing audio with duration %s", format_timestamp(duration)
         )
 
-        if vad_filter:
+        if batch_size:
             if vad_parameters is None:
                 vad_parameters = VadOptions()
             elif isinstance(vad_parameters, dict):
                 vad_parameters = VadOptions(**vad_parameters)
-            speech_chunks = get_speech_timestamps(audio, vad_parameters)
+            if speech_chunks is None:
+                with trace(tracer, "vad"):
+                    speech_chunks = get_speech_timestamps(
+                        audio,
+                        vad_parameters._replace(
+                            max_speech_duration_s=min(
+                                vad_parameters.max_speech_duration_s,
+                                self.feature_extractor.chunk_length,
+                            )
+                        ),
+                    )
+            speech_chunks = merge_speech_chunks(
+                speech_chunks, self.feature_extractor.n_samples
+            )
+            duration_after_vad = (
+                sum(chunk["end"] - chunk["start"] for chunk in speech_chunks)
+                / sampling_rate
+            )
+
+            self.logger.info(
+                "Split audio into %d chunks of speech for batched transcription",
+                len(speech_chunks),
+            )
+
+        elif vad_filter:
+            if vad_parameters is None:
+                vad_parameters = VadOptions()
+            elif isinstance(vad_parameters, dict):
+                vad_parameters = VadOptions(**vad_parameters)
+            if speech_chunks is None:
+                with trace(tracer, "vad"):
+                    speech_chunks = get_speech_timestamps(audio, vad_parameters)
             audio = collect_chunks(audio, speech_chunks)
             duration_after_vad = audio.shape[0] / sampling_rate
 
@@ -315,7 +493,34 @@ class WhisperModel:
         else:
             speech_chunks = None
 
-        features = self.feature_extractor(audio)
+        if batch_size:
+            with trace(tracer, "features", windows=len(speech_chunks)):
+                features = (
+                    np.stack(
+                        [
+                            self.get_window_features(audio[chunk["start"] : chunk["end"]])
+                            for chunk in speech_chunks
+                        ]
+                    )
+                    if speech_chunks
+                    else None
+                )
+        elif log_mel is not None:
+            if speech_chunks is not None:
+                log_mel = collect_log_mel_chunks(
+                    log_mel,
+                    speech_chunks,
+                    self.feature_extractor.hop_length,
+                    n_samples=n_samples,
+                )
+            features = pad_log_mel(
+                log_mel,
+                audio.shape[0] // self.feature_extractor.hop_length
+                + self.feature_extractor.nb_max_frames,
+            )
+        else:
+            with trace(tracer, "features"):
+                features = self.feature_extractor(audio)
 
         encoder_output = None
         all_language_probs = None
@@ -325,11 +530,19 @@ class WhisperModel:
                 language = "en"
                 language_probability = 1
             else:
-                segment = features[:, : self.feature_extractor.nb_max_frames]
-                encoder_output = self.encode(segment)
-                # results is a list of tuple[str, float] with language names and
-                # probabilities.
-                results = self.model.detect_language(encoder_output)[0]
+                if not batch_size:
+                    segment = features[:, : self.feature_extractor.nb_max_frames]
+                elif features is not None:
+                    segment = features[0]
+                else:
+                    segment = self.get_window_features(
+                        audio[: self.feature_extractor.n_samples]
+                    )
+                with trace(tracer, "language_detection"):
+                    encoder_output = self.encode(segment)
+                    # results is a list of tuple[str, float] with language names and
+                    # probabilities.
+                    results = self.model.detect_language(encoder_output)[0]
                 # Parse language names to strip out markers
                 all_language_probs = [(token[2:-2], prob) for (token, prob) in results]
                 # Get top language token and probability
@@ -350,12 +563,8 @@ class WhisperModel:
 
             language_probability = 1
 
-        tokenizer = Tokenizer(
-            self.hf_tokenizer,
-            self.model.is_multilingual,
-            task=task,
-            language=language,
-        )
+        setup = self.get_decoding_setup(task, language, suppress_tokens, initial_prompt)
+        tokenizer = setup.tokenizer
 
         options = TranscriptionOptions(
             beam_size=beam_size,
@@ -375,18 +584,43 @@ class WhisperModel:
             initial_prompt=initial_prompt,
             prefix=prefix,
             suppress_blank=suppress_blank,
-            suppress_tokens=get_suppressed_tokens(tokenizer, suppress_tokens),
+            suppress_tokens=setup.suppress_tokens,
             without_timestamps=without_timestamps,
             max_initial_timestamp=max_initial_timestamp,
             word_timestamps=word_timestamps,
             prepend_punctuations=prepend_punctuations,
             append_punctuations=append_punctuations,
+            fallback_budget=fallback_budget,
+            parallel_fallback=parallel_fallback,
+            tracer=tracer,
         )
 
-        segments = self.generate_segments(features, tokenizer, options, encoder_output)
+        if batch_size:
+            segments = (
+                self.generate_batched_segments(
+                    features,
+                    speech_chunks,
+                    tokenizer,
+                    options,
+                    batch_size,
+                    initial_prompt_tokens=setup.initial_prompt_tokens,
+                )
+                if speech_chunks
+                else []
+            )
+        else:
+            segments = self.generate_segments(
+                features,
+                tokenizer,
+                options,
+                encoder_output,
+                initial_prompt_tokens=setup.initial_prompt_tokens,
+            )
 
-        if speech_chunks:
-            segments = restore_speech_timestamps(segments, speech_chunks, sampling_rate)
+            if speech_chunks:
+                segments = restore_speech_timestamps(
+                    segments, speech_chunks, sampling_rate
+                )
 
         info = TranscriptionInfo(
             language=language,
@@ -406,20 +640,18 @@ class WhisperModel:
         tokenizer: Tokenizer,
         options: TranscriptionOptions,
         encoder_output: Optional[ctranslate2.StorageView] = None,
+        initial_prompt_tokens: Optional[List[int]] = None,
     ) -> Iterable[Segment]:
         content_frames = features.shape[-1] - self.feature_extractor.nb_max_frames
         idx = 0
         seek = 0
-        all_tokens = []
         prompt_reset_since = 0
 
-        if options.initial_prompt is not None:
-            if isinstance(options.initial_prompt, str):
-                initial_prompt = " " + options.initial_prompt.strip()
-                initial_prompt_tokens = tokenizer.encode(initial_prompt)
-                all_tokens.extend(initial_prompt_tokens)
-            else:
-                all_tokens.extend(options.initial_prompt)
+        if initial_prompt_tokens is None:
+            initial_prompt_tokens = encode_initial_prompt(
+                tokenizer, options.initial_prompt
+            )
+        all_tokens = list(initial_prompt_tokens)
 
         last_speech_timestamp = 0.0
         all_segments = []
@@ -445,14 +677,17 @@ class WhisperModel:
             )
 
             if seek > 0 or encoder_output is None:
-                encoder_output = self.encode(segment)
+                with trace(options.tracer, "encode", window=time_offset):
+                    encoder_output = self.encode(segment)
 
             (
                 result,
                 avg_logprob,
                 temperature,
                 compression_ratio,
-            ) = self.generate_with_fallback(encoder_output, prompt, tokenizer, options)
+            ) = self.generate_with_fallback(
+                encoder_output, prompt, tokenizer, options, window=time_offset
+            )
 
             if options.no_speech_threshold is not None:
                 # no voice activity check
@@ -557,15 +792,16 @@ class WhisperModel:
                 seek += segment_size
 
             if options.word_timestamps:
-                self.add_word_timestamps(
-                    current_segments,
-                    tokenizer,
-                    encoder_output,
-                    segment_size,
-                    options.prepend_punctuations,
-                    options.append_punctuations,
-                    last_speech_timestamp=last_speech_timestamp,
-                )
+                with trace(options.tracer, "alignment", window=time_offset):
+                    self.add_word_timestamps(
+                        current_segments,
+                        tokenizer,
+                        encoder_output,
+                        segment_size,
+                        options.prepend_punctuations,
+                        options.append_punctuations,
+                        last_speech_timestamp=last_speech_timestamp,
+                    )
 
                 word_end_timestamps = [
                     w["end"] for s in current_segments for w in s["words"]
@@ -622,6 +858,193 @@ class WhisperModel:
                 prompt_reset_since = len(all_tokens)
         return all_segments
 
+    def generate_batched_segments(
+        self,
+        features: np.ndarray,
+        chunks: List[dict],
+        tokenizer: Tokenizer,
+        options: TranscriptionOptions,
+        batch_size: int,
+        initial_prompt_tokens: Optional[List[int]] = None,
+    ) -> List[Segment]:
+        """Transcribes independent windows of at most 30 seconds, `batch_size` at a time.
+
+        Arguments:
+          features: Features of the windows, of shape (n_windows, n_mels, nb_max_frames).
+          chunks: Start and end sample of every window in the audio.
+          initial_prompt_tokens: The encoded `options.initial_prompt`, encoded here if not set.
+        """
+        sampling_rate = self.feature_extractor.sampling_rate
+        if initial_prompt_tokens is None:
+            initial_prompt_tokens = encode_initial_prompt(
+                tokenizer, options.initial_prompt
+            )
+        prompt = self.get_prompt(
+            tokenizer,
+            initial_prompt_tokens,
+            without_timestamps=options.without_timestamps,
+        )
+
+        idx = 0
+        all_segments = []
+        for batch_start in range(0, len(chunks), batch_size):
+            batch_chunks = chunks[batch_start : batch_start + batch_size]
+            # kept on the CPU to be sliced into the windows that fall back or need alignment
+            with trace(options.tracer, "encode", windows=len(batch_chunks)):
+                encoder_output = np.asarray(
+                    self.model.encode(
+                        get_ctranslate2_storage(
+                            features[batch_start : batch_start + batch_size]
+                        ),
+                        to_cpu=True,
+                    )
+                )
+            decode_results = self.generate_batch_with_fallback(
+                encoder_output, prompt, tokenizer, options
+            )
+
+            for i, (chunk, decode_result) in enumerate(zip(batch_chunks, decode_results)):
+                result, avg_logprob, temperature, compression_ratio = decode_result
+                if (
+                    options.no_speech_threshold is not None
+                    and result.no_speech_prob > options.no_speech_threshold
+                    and (
+                        options.log_prob_threshold is None
+                        or avg_logprob <= options.log_prob_threshold
+                    )
+                ):
+                    continue
+
+                time_offset = chunk["start"] / sampling_rate
+                chunk_duration = (chunk["end"] - chunk["start"]) / sampling_rate
+                current_segments = self.split_window_tokens(
+                    result.sequences_ids[0], tokenizer, chunk_duration
+                )
+
+                if options.word_timestamps:
+                    with trace(options.tracer, "alignment", window=time_offset):
+                        self.add_word_timestamps(
+                            current_segments,
+                            tokenizer,
+                            get_ctranslate2_storage(encoder_output[i : i + 1]),
+                            round(chunk_duration * self.frames_per_second),
+                            options.prepend_punctuations,
+                            options.append_punctuations,
+                            last_speech_timestamp=0.0,
+                        )
+
+                seek = chunk["start"] // self.feature_extractor.hop_length
+                for segment in current_segments:
+                    tokens = segment["tokens"]
+                    text = tokenizer.decode(tokens)
+
+                    if segment["start"] == segment["end"] or not text.strip():
+                        continue
+
+                    idx += 1
+                    all_segments.append(Segment(
+                        id=idx,
+                        seek=seek,
+                        start=round(time_offset + segment["start"], 3),
+                        end=round(time_offset + segment["end"], 3),
+                        text=text,
+                        tokens=tokens,
+                        temperature=temperature,
+                        avg_logprob=avg_logprob,
+                        compression_ratio=compression_ratio,
+                        no_speech_prob=result.no_speech_prob,
+                        words=(
+                            [
+                                Word(
+                                    start=round(time_offset + word["start"], 2),
+                                    end=round(time_offset + word["end"], 2),
+                                    word=word["word"],
+                                    probability=word["probability"],
+                                )
+                                for word in segment["words"]
+                            ]
+                            if options.word_timestamps
+                            else None
+                        ),
+                    ))
+        return all_segments
+
+    def split_window_tokens(
+        self, tokens: List[int], tokenizer: Tokenizer, duration: float
+    ) -> List[dict]:
+        """Splits the tokens decoded for a window at their timestamp tokens.
+
+        Unlike the sequential path, text after the last timestamp is kept as a segment ending
+        with the window since no later window decodes it again.
+        """
+        segments = []
+        current = []
+        start = 0.0
+        for token in tokens:
+            if token < tokenizer.timestamp_begin:
+                current.append(token)
+                continue
+            timestamp = min(
+                (token - tokenizer.timestamp_begin) * self.time_precision, duration
+            )
+            if any(t < tokenizer.eot for t in current):
+                segments.append(
+                    dict(seek=0, start=start, end=timestamp, tokens=current + [token])
+                )
+            current = [token]
+            start = timestamp
+
+        if any(t < tokenizer.eot for t in current):
+            segments.append(
+                dict(seek=0, start=start, end=max(start, duration), tokens=current)
+            )
+        return segments
+
+    def get_decoding_setup(
+        self,
+        task: str,
+        language: str,
+        suppress_tokens: Optional[List[int]],
+        initial_prompt: Optional[Union[str, Iterable[int]]],
+    ) -> DecodingSetup:
+        """Returns the tokenizer, suppressed tokens and encoded initial prompt of a transcription.
+
+        They only depend on the arguments, which the streaming server repeats on every pass of
+        a client, so the last `decoding_setup_cache_size` of them are kept.
+        """
+        if initial_prompt is not None and not isinstance(initial_prompt, str):
+            initial_prompt = tuple(initial_prompt)
+        key = (
+            task,
+            language,
+            tuple(suppress_tokens) if suppress_tokens is not None else None,
+            initial_prompt,
+        )
+        with self.decoding_setups_lock:
+            setup = self.decoding_setups.get(key)
+            if setup is not None:
+                self.decoding_setups.move_to_end(key)
+                return setup
+
+        tokenizer = Tokenizer(
+            self.hf_tokenizer,
+            self.model.is_multilingual,
+            task=task,
+            language=language,
+        )
+        setup = DecodingSetup(
+            tokenizer=tokenizer,
+            suppress_tokens=get_suppressed_tokens(tokenizer, suppress_tokens),
+            initial_prompt_tokens=encode_initial_prompt(tokenizer, initial_prompt),
+            sot_sequence=tuple(tokenizer.sot_sequence),
+        )
+
+        with self.decoding_setups_lock:
+            self.decoding_setups[key] = setup
+            while len(self.decoding_setups) > self.decoding_setup_cache_size:
+                self.decoding_setups.popitem(last=False)
+        return setup
+
     def encode(self, features: np.ndarray) -> ctranslate2.StorageView:
         # When the model is running on multiple GPUs, the encoder output should be moved
         # to the CPU since we don't know which GPU will handle the next job.
@@ -632,12 +1055,22 @@ class WhisperModel:
 
         return self.model.encode(features, to_cpu=to_cpu)
 
+    def get_window_features(self, audio: np.ndarray) -> np.ndarray:
+        """Computes the features of a single window of at most 30 seconds of audio, padded
+        with silence like the windows of the sequential path."""
+        audio = audio[: self.feature_extractor.n_samples]
+        audio = np.pad(audio, (0, self.feature_extractor.n_samples - audio.shape[0]))
+        return self.feature_extractor(audio, padding=False)[
+            :, : self.feature_extractor.nb_max_frames
+        ]
+
     def generate_with_fallback(
         self,
         encoder_output: ctranslate2.StorageView,
         prompt: List[int],
         tokenizer: Tokenizer,
         options: TranscriptionOptions,
+        window: Optional[float] = None,
     ) -> Tuple[ctranslate2.models.WhisperGenerationResult, float, float, float]:
         decode_result = None
         all_results = []
@@ -647,103 +1080,273 @@ class WhisperModel:
             round(options.max_initial_timestamp / self.time_precision)
         )
 
-        for temperature in options.temperatures:
-            if temperature > 0:
-                kwargs = {
-                    "beam_size": 1,
-                    "num_hypotheses": options.best_of,
-                    "sampling_topk": 0,
-                    "sampling_temperature": temperature,
-                }
-            else:
-                kwargs = {
-                    "beam_size": options.beam_size,
-                    "patience": options.patience,
-                }
+        start_time = time.perf_counter()
+        attempt_start = start_time
+        budget_exceeded = False
+        needs_fallback = False
+        attempts = 0
 
-            result = self.model.generate(
-                encoder_output,
-                [prompt],
-                length_penalty=options.length_penalty,
-                repetition_penalty=options.repetition_penalty,
-                no_repeat_ngram_size=options.no_repeat_ngram_size,
-                max_length=self.max_length,
-                return_scores=True,
-                return_no_speech_prob=True,
-                suppress_blank=options.suppress_blank,
-                suppress_tokens=options.suppress_tokens,
-                max_initial_timestamp_index=max_initial_timestamp_index,
-                **kwargs,
-            )[0]
+        temperatures = list(options.temperatures)
+        while temperatures:
+            if options.parallel_fallback and temperatures[0] > 0:
+                batch, temperatures = temperatures, []
+            else:
+                batch, temperatures = temperatures[:1], temperatures[1:]
 
-            tokens = result.sequences_ids[0]
+            with trace(
+                options.tracer,
+                "generate",
+                window=window,
+                temperature=batch[0] if len(batch) == 1 else tuple(batch),
+            ):
+                if len(batch) > 1:
+                    # CTranslate2 takes a single sampling temperature per call: submit all of them at
+                    # once so that the model workers decode them concurrently from the same encoder output
+                    pending = [
+                        self.generate_attempt(
+                            encoder_output,
+                            [prompt],
+                            options,
+                            temperature,
+                            max_initial_timestamp_index,
+                            asynchronous=True,
+                        )[0]
+                        for temperature in batch
+                    ]
+                    results = [async_result.result() for async_result in pending]
+                else:
+                    results = [
+                        self.generate_attempt(
+                            encoder_output,
+                            [prompt],
+                            options,
+                            batch[0],
+                            max_initial_timestamp_index,
+                        )[0]
+                    ]
+            attempts += len(batch)
+
+            # the first acceptable result in temperature order wins, as with sequential decoding
+            for temperature, result in zip(batch, results):
+                decode_result, needs_fallback, below_cr_threshold = self.evaluate_attempt(
+                    result, temperature, tokenizer, options
+                )
+                all_results.append(decode_result)
+                if below_cr_threshold:
+                    below_cr_threshold_results.append(decode_result)
+                if not needs_fallback:
+                    break
 
-            # Recover the average log prob from the returned score.
-            seq_len = len(tokens)
-            cum_logprob = result.scores[0] * (seq_len**options.length_penalty)
-            avg_logprob = cum_logprob / (seq_len + 1)
+            if not needs_fallback:
+                break
 
-            text = tokenizer.decode(tokens).strip()
-            compression_ratio = get_compression_ratio(text)
+            if options.fallback_budget is not None and temperatures:
+                now = time.perf_counter()
+                # the next attempt is expected to take about as long as the last one
+                if now + (now - attempt_start) - start_time > options.fallback_budget:
+                    budget_exceeded = True
+                    self.logger.debug(
+                        "Fallback budget of %.2fs exceeded after temperature %.1f",
+                        options.fallback_budget,
+                        batch[-1],
+                    )
+                    break
+                attempt_start = now
 
-            decode_result = (
-                result,
-                avg_logprob,
-                temperature,
-                compression_ratio,
+        if needs_fallback:
+            # all failed, select the result with the highest average log probability
+            decode_result = max(
+                below_cr_threshold_results or all_results, key=lambda x: x[1]
             )
-            all_results.append(decode_result)
 
-            needs_fallback = False
+        self.fallback_stats.record(
+            attempts,
+            budget_exceeded=budget_exceeded,
+            exhausted=needs_fallback and not budget_exceeded,
+        )
+        return decode_result
 
-            if options.compression_ratio_threshold is not None:
-                if compression_ratio > options.compression_ratio_threshold:
-                    needs_fallback = True  # too repetitive
+    def generate_batch_with_fallback(
+        self,
+        encoder_output: np.ndarray,
+        prompt: List[int],
+        tokenizer: Tokenizer,
+        options: TranscriptionOptions,
+    ) -> List[Tuple[ctranslate2.models.WhisperGenerationResult, float, float, float]]:
+        """Decodes a batch of windows with the same prompt. Only the windows whose result
+        fails the thresholds are decoded again, as one batch, at the next temperature."""
+        max_initial_timestamp_index = int(
+            round(options.max_initial_timestamp / self.time_precision)
+        )
 
-                    self.logger.debug(
-                        "Compression ratio threshold is not met with temperature %.1f (%f > %f)",
-                        temperature,
-                        compression_ratio,
-                        options.compression_ratio_threshold,
-                    )
-                else:
-                    below_cr_threshold_results.append(decode_result)
+        batch_size = encoder_output.shape[0]
+        decode_results = [None] * batch_size
+        all_results = [[] for _ in range(batch_size)]
+        below_cr_threshold_results = [[] for _ in range(batch_size)]
+        pending = list(range(batch_size))
 
-            if (
-                options.log_prob_threshold is not None
-                and avg_logprob < options.log_prob_threshold
+        for temperature in options.temperatures:
+            features = (
+                encoder_output
+                if len(pending) == batch_size
+                else encoder_output[pending]
+            )
+            with trace(
+                options.tracer, "generate", windows=len(pending), temperature=temperature
             ):
-                needs_fallback = True  # average log probability is too low
-
-                self.logger.debug(
-                    "Log probability threshold is not met with temperature %.1f (%f < %f)",
+                results = self.generate_attempt(
+                    get_ctranslate2_storage(features),
+                    [prompt] * len(pending),
+                    options,
                     temperature,
-                    avg_logprob,
-                    options.log_prob_threshold,
+                    max_initial_timestamp_index,
                 )
 
-            if (
-                options.no_speech_threshold is not None
-                and result.no_speech_prob > options.no_speech_threshold
-            ):
-                needs_fallback = False  # silence
+            failed = []
+            for i, result in zip(pending, results):
+                decode_result, needs_fallback, below_cr_threshold = self.evaluate_attempt(
+                    result, temperature, tokenizer, options
+                )
+                all_results[i].append(decode_result)
+                if below_cr_threshold:
+                    below_cr_threshold_results[i].append(decode_result)
+                if needs_fallback:
+                    failed.append(i)
+                else:
+                    decode_results[i] = decode_result
 
-            if not needs_fallback:
+            pending = failed
+            if not pending:
                 break
-        else:
+
+        for i in pending:
             # all failed, select the result with the highest average log probability
-            decode_result = max(
-                below_cr_threshold_results or all_results, key=lambda x: x[1]
+            decode_results[i] = max(
+                below_cr_threshold_results[i] or all_results[i], key=lambda x: x[1]
             )
 
-        return decode_result
+        for i in range(batch_size):
+            self.fallback_stats.record(
+                len(all_results[i]), budget_exceeded=False, exhausted=i in pending
+            )
+        return decode_results
+
+    def generate_attempt(
+        self,
+        encoder_output: ctranslate2.StorageView,
+        prompts: List[List[int]],
+        options: TranscriptionOptions,
+        temperature: float,
+        max_initial_timestamp_index: int,
+        asynchronous: bool = False,
+    ) -> list:
+        """Runs one decoding attempt: beam search at temperature 0, sampling otherwise.
+
+        Returns the list of results of `generate`, one per prompt, which are asynchronous
+        results when `asynchronous` is set.
+        """
+        if temperature > 0:
+            kwargs = {
+                "beam_size": 1,
+                "num_hypotheses": options.best_of,
+                "sampling_topk": 0,
+                "sampling_temperature": temperature,
+            }
+        else:
+            kwargs = {
+                "beam_size": options.beam_size,
+                "patience": options.patience,
+            }
+        if asynchronous:
+            kwargs["asynchronous"] = True
+
+        return self.model.generate(
+            encoder_output,
+            prompts,
+            length_penalty=options.length_penalty,
+            repetition_penalty=options.repetition_penalty,
+            no_repeat_ngram_size=options.no_repeat_ngram_size,
+            max_length=self.max_length,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=options.suppress_blank,
+            suppress_tokens=options.suppress_tokens,
+            max_initial_timestamp_index=max_initial_timestamp_index,
+            **kwargs,
+        )
+
+    def evaluate_attempt(
+        self,
+        result: ctranslate2.models.WhisperGenerationResult,
+        temperature: float,
+        tokenizer: Tokenizer,
+        options: TranscriptionOptions,
+    ) -> Tuple[Tuple[ctranslate2.models.WhisperGenerationResult, float, float, float], bool, bool]:
+        """Checks the result of a decoding attempt against the fallback thresholds.
+
+        Returns the decode result tuple, whether the next temperature should be tried and
+        whether the result is below the compression ratio threshold.
+        """
+        tokens = result.sequences_ids[0]
+
+        # Recover the average log prob from the returned score.
+        seq_len = len(tokens)
+        cum_logprob = result.scores[0] * (seq_len**options.length_penalty)
+        avg_logprob = cum_logprob / (seq_len + 1)
+
+        text = tokenizer.decode(tokens).strip()
+        compression_ratio = get_compression_ratio(text)
+
+        decode_result = (
+            result,
+            avg_logprob,
+            temperature,
+            compression_ratio,
+        )
+
+        needs_fallback = False
+        below_cr_threshold = False
+
+        if options.compression_ratio_threshold is not None:
+            if compression_ratio > options.compression_ratio_threshold:
+                needs_fallback = True  # too repetitive
+
+                self.logger.debug(
+                    "Compression ratio threshold is not met with temperature %.1f (%f > %f)",
+                    temperature,
+                    compression_ratio,
+                    options.compression_ratio_threshold,
+                )
+            else:
+                below_cr_threshold = True
+
+        if (
+            options.log_prob_threshold is not None
+            and avg_logprob < options.log_prob_threshold
+        ):
+            needs_fallback = True  # average log probability is too low
+
+            self.logger.debug(
+                "Log probability threshold is not met with temperature %.1f (%f < %f)",
+                temperature,
+                avg_logprob,
+                options.log_prob_threshold,
+            )
+
+        if (
+            options.no_speech_threshold is not None
+            and result.no_speech_prob > options.no_speech_threshold
+        ):
+            needs_fallback = False  # silence
+
+        return decode_result, needs_fallback, below_cr_threshold
 
     def get_prompt(
         self,
         tokenizer: Tokenizer,
         previous_tokens: List[int],
         without_timestamps: bool = False,
-        prefix: Optional[str] = None,
+        prefix: Optional[Union[str, Iterable[int]]] = None,
     ) -> List[int]:
         prompt = []
 
@@ -756,13 +1359,16 @@ class WhisperModel:
         if without_timestamps:
             prompt.append(tokenizer.no_timestamps)
 
-        if prefix:
+        if isinstance(prefix, str) and prefix:
             prefix_tokens = tokenizer.encode(" " + prefix.strip())
             if len(prefix_tokens) >= self.max_length // 2:
                 prefix_tokens = prefix_tokens[: self.max_length // 2 - 1]
             if not without_timestamps:
                 prompt.append(tokenizer.timestamp_begin)
             prompt.extend(prefix_tokens)
+        elif prefix:
+            # token ids already start with their timestamp
+            prompt.extend(list(prefix)[: self.max_length // 2 - 1])
 
         return prompt
 
@@ -941,6 +1547,7 @@ def restore_speech_timestamps(
     sampling_rate: int,
 ) -> Iterable[Segment]:
     ts_map = SpeechTimestampsMap(speech_chunks, sampling_rate)
+    restored_segments = []
 
     for segment in segments:
         if segment.words:
@@ -967,7 +1574,25 @@ def restore_speech_timestamps(
                 end=ts_map.get_original_time(segment.end),
             )
 
-    return segments
+        restored_segments.append(segment)
+
+    return restored_segments
+
+
+def merge_speech_chunks(speech_chunks: List[dict], max_samples: int) -> List[dict]:
+    """Groups consecutive speech chunks into windows spanning at most `max_samples`, so that
+    windows are cut in the silences between chunks. Longer chunks are cut every `max_samples`."""
+    windows = []
+    for chunk in speech_chunks:
+        start = chunk["start"]
+        while chunk["end"] - start > max_samples:
+            windows.append(dict(start=start, end=start + max_samples))
+            start += max_samples
+        if windows and chunk["end"] - windows[-1]["start"] <= max_samples:
+            windows[-1]["end"] = chunk["end"]
+        else:
+            windows.append(dict(start=start, end=chunk["end"]))
+    return windows
 
 
 def get_ctranslate2_storage(segment: np.ndarray) -> ctranslate2.StorageView:
@@ -981,6 +1606,16 @@ def get_compression_ratio(text: str) -> float:
     return len(text_bytes) / len(zlib.compress(text_bytes))
 
 
+def encode_initial_prompt(
+    tokenizer: Tokenizer, initial_prompt: Optional[Union[str, Iterable[int]]]
+) -> List[int]:
+    if initial_prompt is None:
+        return []
+    if isinstance(initial_prompt, str):
+        return tokenizer.encode(" " + initial_prompt.strip())
+    return list(initial_prompt)
+
+
 def get_suppressed_tokens(
     tokenizer: Tokenizer,
     suppress_tokens: Optional[List[int]],
@@ -0,0 +1,184 @@
+import numpy as np
+
+from faster_whisper.vad import VadOptions, get_vad_model
+
+
+class StreamingVad:
+    """
+    Silero voice activity detection over a live audio stream.
+
+    `get_speech_timestamps` runs the Silero model over a whole buffer, so calling it on the
+    re-sent transcription window every pass pushes the same audio through the model again and
+    again. This class feeds every `window_size_samples` block of the stream to the model exactly
+    once, keeps the recurrent state between calls and maintains speech intervals in absolute
+    sample indices, applying the same thresholds, splitting of long speech, silence handling and
+    padding as `get_speech_timestamps`.
+
+    Attributes:
+        options (VadOptions): VAD parameters.
+        sampling_rate (int): Sampling rate of the stream.
+        processed (int): Absolute index up to which the stream has been processed.
+        triggered (bool): Whether the stream is currently inside a speech interval.
+        speech_start (int): Absolute start of the current speech interval.
+        temp_end (int): Start of the silence that may end the current speech interval, 0 if none.
+        prev_end (int): End of the last silence of the current speech interval long enough to split it there
+                        once it exceeds `max_speech_duration_s`, 0 if none.
+        next_start (int): Start of the speech following `prev_end`, 0 if none.
+        speeches (list): Closed speech intervals as [start, end] absolute sample indices.
+        hop_length (int): Speech chunks start and end on multiples of it in the window.
+    """
+    def __init__(self, vad_options=None, sampling_rate=16000, hop_length=160):
+        """
+        Args:
+            vad_options (dict or VadOptions, optional): VAD parameters. Defaults to `VadOptions()`.
+            sampling_rate (int, optional): Sampling rate of the stream. Defaults to 16000.
+            hop_length (int, optional): Hop length of the feature frames, chunks are aligned on it so that
+                                        their features can be selected from the frames of the window.
+                                        Defaults to 160.
+        """
+        if vad_options is None:
+            vad_options = VadOptions()
+        elif isinstance(vad_options, dict):
+            vad_options = VadOptions(**vad_options)
+        self.options = vad_options
+        self.sampling_rate = sampling_rate
+        self.hop_length = hop_length
+        self.window_size = vad_options.window_size_samples
+        self.min_speech_samples = sampling_rate * vad_options.min_speech_duration_ms / 1000
+        self.min_silence_samples = sampling_rate * vad_options.min_silence_duration_ms / 1000
+        self.speech_pad_samples = sampling_rate * vad_options.speech_pad_ms / 1000
+        self.max_speech_samples = (
+            sampling_rate * vad_options.max_speech_duration_s
+            - self.window_size
+            - 2 * self.speech_pad_samples
+        )
+        self.min_silence_samples_at_max_speech = sampling_rate * 98 / 1000
+        self.neg_threshold = vad_options.threshold - 0.15
+
+        self.model = get_vad_model()
+        self.reset(0)
+
+    def reset(self, sample):
+        """Forget the model state and all speech intervals, and resume processing at `sample`."""
+        self.state = self.model.get_initial_state(batch_size=1)
+        self.processed = sample
+        self.triggered = False
+        self.speech_start = 0
+        self.temp_end = 0
+        self.prev_end = 0
+        self.next_start = 0
+        self.speeches = []
+
+    def process(self, audio_buffer):
+        """
+        Run the model over the complete windows appended to the buffer since the last call.
+
+        Args:
+            audio_buffer (AudioRingBuffer): Buffer holding the stream.
+        """
+        if self.processed < audio_buffer.start:
+            # the stream was not processed fast enough and audio was overwritten
+            self.reset(audio_buffer.start)
+
+        n_windows = (audio_buffer.end - self.processed) // self.window_size
+        if n_windows <= 0:
+            return
+        samples = audio_buffer.view(self.processed, self.processed + n_windows * self.window_size)
+        for chunk in samples.reshape(n_windows, self.window_size):
+            speech_prob, self.state = self.model(chunk, self.state, self.sampling_rate)
+            self.update(float(np.squeeze(speech_prob)), self.processed)
+            self.processed += self.window_size
+
+    def update(self, speech_prob, sample):
+        """
+        Advance the speech/silence state machine with the probability of the window starting at `sample`.
+        """
+        threshold = self.options.threshold
+        if speech_prob >= threshold and self.temp_end:
+            self.temp_end = 0
+            if self.next_start < self.prev_end:
+                self.next_start = sample
+
+        if speech_prob >= threshold and not self.triggered:
+            self.triggered = True
+            self.speech_start = sample
+            return
+
+        if self.triggered and sample - self.speech_start > self.max_speech_samples:
+            if self.prev_end:
+                # split at the last long enough silence
+                self.speeches.append([self.speech_start, self.prev_end])
+                if self.next_start < self.prev_end:
+                    # still in that silence
+                    self.triggered = False
+                else:
+                    self.speech_start = self.next_start
+                self.prev_end = self.next_start = self.temp_end = 0
+            else:
+                self.speeches.append([self.speech_start, sample])
+                self.prev_end = self.next_start = self.temp_end = 0
+                self.triggered = False
+                return
+
+        if speech_prob < self.neg_threshold and self.triggered:
+            if not self.temp_end:
+                self.temp_end = sample
+            # condition to avoid cutting in very short silence
+            if sample - self.temp_end > self.min_silence_samples_at_max_speech:
+                self.prev_end = self.temp_end
+            if sample - self.temp_end >= self.min_silence_samples:
+                if self.temp_end - self.speech_start > self.min_speech_samples:
+                    self.speeches.append([self.speech_start, self.temp_end])
+                self.prev_end = self.next_start = self.temp_end = 0
+                self.triggered = False
+
+    def discard_before(self, sample):
+        """Drop speech intervals that end before `sample`."""
+        self.speeches = [s for s in self.speeches if s[1] + self.speech_pad_samples > sample]
+
+    def get_speech_chunks(self, start, end):
+        """
+        Speech chunks of the window [start, end), padded by `speech_pad_ms` on each side.
+
+        The speech interval still open at the end of the processed audio is extended to the end of the
+        window, as `get_speech_timestamps` does at the end of its input. Silences shorter than twice the
+        padding are split between the intervals around them instead of padding both. Chunk starts are rounded down and
+        chunk ends rounded up to a multiple of `hop_length` in the window, so that `collect_chunks` and
+        `collect_log_mel_chunks` select the same audio.
+
+        Args:
+            start (int): Absolute index of the first sample of the window.
+            end (int): Absolute index one past the last sample of the window.
+
+        Returns:
+            list: Chunks as dicts with "start" and "end" sample indices relative to `start`,
+                  in the format expected by `collect_chunks`.
+        """
+        intervals = list(self.speeches)
+        if self.triggered and end - self.speech_start > self.min_speech_samples:
+            intervals.append([self.speech_start, end])
+
+        pad = self.speech_pad_samples
+        chunks = []
+        for i, (speech_start, speech_end) in enumerate(intervals):
+            if i > 0:
+                silence = speech_start - intervals[i - 1][1]
+                pad_start = silence // 2 if silence < 2 * pad else pad
+            else:
+                pad_start = pad
+            if i + 1 < len(intervals):
+                silence = intervals[i + 1][0] - speech_end
+                pad_end = silence // 2 if silence < 2 * pad else pad
+            else:
+                pad_end = pad
+            chunk_start = int(max(0, speech_start - pad_start - start))
+            chunk_end = int(min(end - start, speech_end + pad_end - start))
+            chunk_start -= chunk_start % self.hop_length
+            chunk_end = min(end - start, -(-chunk_end // self.hop_length) * self.hop_length)
+            if chunks:
+                # rounding can make chunks around a short silence overlap
+                chunk_start = max(chunk_start, chunks[-1]["end"])
+            if chunk_end <= chunk_start:
+                continue
+            chunks.append({"start": chunk_start, "end": chunk_end})
+        return chunks
@@ -0,0 +1,417 @@
+import os
+import json
+import time
+import logging
+import threading
+import itertools
+import multiprocessing
+
+from whisper_live.audio_buffer import SharedAudioRingBuffer
+
+
+class PipeWebSocket:
+    """
+    Stand-in for the WebSocket connection of a session running in a worker process: messages sent by the
+    `ServeClient` go back to the front end over the worker's pipe.
+
+    Attributes:
+        conn (multiprocessing.connection.Connection): The worker end of the pipe.
+        lock (threading.Lock): Serializes the writes of all sessions of the worker.
+        session_id (int): Identifier of the session in the front end.
+    """
+    def __init__(self, conn, lock, session_id):
+        self.conn = conn
+        self.lock = lock
+        self.session_id = session_id
+
+    def send(self, message):
+        with self.lock:
+            self.conn.send(("send", self.session_id, message))
+
+    def close(self):
+        pass
+
+
+def run_worker(conn, cpu_threads, model_pool_options, preload=(), warmup_audio=None, server_options=None):
+    """
+    Main loop of a worker process: runs the sessions routed to it by a `WorkerPool`.
+
+    Each session is a regular `ServeClient` with its own transcription thread. Its audio is read from the
+    shared memory buffer filled by the front end, and its messages are sent back over the pipe. Once the front
+    end asks for metrics, the worker records them in its own `ServerMetrics` and reports a snapshot every few
+    seconds.
+
+    Args:
+        conn (multiprocessing.connection.Connection): The worker end of the pipe to the front end.
+        cpu_threads (int): Number of CTranslate2 threads of every model loaded by the worker.
+        model_pool_options (dict): Keyword arguments of the `ModelPool` of the worker.
+        preload (list, optional): Models loaded before the worker reports ready.
+        warmup_audio (str, optional): Audio file transcribed once by every preloaded model.
+        server_options (dict, optional): Keyword arguments of the `TranscriptionServer` creating the sessions.
+    """
+    from whisper_live.model_pool import ModelPool
+    from whisper_live.server import TranscriptionServer
+
+    logging.basicConfig(level=logging.INFO)
+    server = TranscriptionServer(
+        model_pool=ModelPool(cpu_threads=cpu_threads, **model_pool_options),
+        **(server_options or {}),
+    )
+    send_lock = threading.Lock()
+    sessions = {}
+
+    try:
+        server.preload(preload, warmup_audio)
+    except Exception as e:
+        logging.error(f"[ERROR]: Worker {os.getpid()} failed to preload models: {e}")
+    with send_lock:
+        conn.send(("ready", None, None))
+
+    def close_session(session_id):
+        client, audio_buffer = sessions.pop(session_id, (None, None))
+        if client is None:
+            return
+        server.clients.pop(session_id, None)
+        if client.model_size_or_path is not None:
+            client.cleanup()
+        trans_thread = getattr(client, "trans_thread", None)
+        if trans_thread is not None:
+            trans_thread.join()
+        client.audio_buffer = None
+        audio_buffer.close()
+
+    def report_metrics(interval):
+        while True:
+            time.sleep(interval)
+            snapshot = server.metrics.worker_snapshot()
+            try:
+                with send_lock:
+                    conn.send(("metrics", None, snapshot))
+            except (OSError, ValueError):
+                break
+
+    while True:
+        try:
+            command, session_id, *args = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        try:
+            if command == "open":
+                options, buffer_name, capacity, custom_model_path = args
+                audio_buffer = SharedAudioRingBuffer(capacity, name=buffer_name)
+                websocket = PipeWebSocket(conn, send_lock, session_id)
+                client = server.create_client(websocket, options, custom_model_path, audio_buffer=audio_buffer)
+                if client.model_size_or_path is None:
+                    # the client was already sent the reason, e.g. an invalid model size
+                    audio_buffer.close()
+                    with send_lock:
+                        conn.send(("open_failed", session_id, None))
+                    continue
+                sessions[session_id] = (client, audio_buffer)
+                # sampled by the metrics of the worker
+                server.clients[session_id] = client
+            elif command == "audio":
+                client, _ = sessions.get(session_id, (None, None))
+                if client is not None and client.model_size_or_path is not None:
+                    client.notify_new_audio()
+            elif command == "control":
+                client, _ = sessions.get(session_id, (None, None))
+                if client is not None:
+                    server.handle_control_message(client, args[0])
+            elif command == "metrics":
+                if server.metrics is None:
+                    from whisper_live.metrics import ServerMetrics
+
+                    server.metrics = ServerMetrics()
+                    server.metrics.attach(server)
+                    threading.Thread(target=report_metrics, args=(args[0],), daemon=True).start()
+            elif command == "close":
+                # joining the transcription thread can take a whole pass, do not block other sessions
+                threading.Thread(target=close_session, args=(session_id,), daemon=True).start()
+            elif command == "stop":
+                break
+        except Exception as e:
+            logging.error(f"[ERROR]: Worker {os.getpid()} failed to handle '{command}': {e}")
+            if command == "open":
+                with send_lock:
+                    conn.send(("open_failed", session_id, str(e)))
+
+    for session_id in list(sessions):
+        close_session(session_id)
+
+
+class RemoteClient:
+    """
+    Front end side of a session running in a worker process, with the interface of `ServeClient` used by
+    `TranscriptionServer`.
+
+    Audio frames are appended to a shared memory ring buffer read by the worker, which is notified through
+    its pipe once `min_new_audio` seconds were appended since the last notification, rather than for every
+    frame. Messages produced by the worker are forwarded to `websocket` by the `WorkerPool`.
+
+    Attributes:
+        pool (WorkerPool): The pool the session belongs to.
+        worker (_Worker): The worker running the session.
+        session_id (int): Identifier of the session.
+        websocket: The WebSocket connection of the client, or any object with a `send(str)` method.
+        client_uid (str): A unique identifier for the client.
+        model_size_or_path (str): The model requested by the client, None once the worker failed to open the
+                                  session.
+        audio_buffer (SharedAudioRingBuffer): Buffer holding the audio of the session.
+        notified_until (int): Absolute sample index up to which the worker was notified of new audio.
+        exit (bool): Whether the session was closed.
+    """
+    def __init__(self, pool, worker, session_id, websocket, options, audio_buffer):
+        self.pool = pool
+        self.worker = worker
+        self.session_id = session_id
+        self.websocket = websocket
+        self.client_uid = options["uid"]
+        self.model_size_or_path = options.get("model_size")
+        self.audio_buffer = audio_buffer
+        self.notified_until = 0
+        self.exit = False
+
+    def add_frames(self, frame_np):
+        """
+        Append audio frames to the shared buffer and notify the worker when enough audio accumulated.
+
+        The transcription thread of the session checks for new audio before sleeping and wakes up on its own
+        after `new_audio_timeout`, so audio appended between two notifications is never left unprocessed.
+        """
+        if self.exit:
+            return
+        self.audio_buffer.append(frame_np)
+        if self.audio_buffer.end - self.notified_until >= self.pool.min_new_audio * self.pool.RATE:
+            self.notified_until = self.audio_buffer.end
+            self.worker.send(("audio", self.session_id))
+
+    def resync(self):
+        self.worker.send(("control", self.session_id, json.dumps({"type": "resync"})))
+
+    def disconnect(self):
+        self.websocket.send(json.dumps({"uid": self.client_uid, "message": "DISCONNECT"}))
+
+    def cleanup(self):
+        """Close the session in the worker and free the shared buffer."""
+        if self.exit:
+            return
+        self.exit = True
+        self.pool.close_session(self)
+
+
+class _Worker:
+    """
+    A worker process of a `WorkerPool` and the front end end of its pipe.
+
+    Attributes:
+        process (multiprocessing.Process): The worker process.
+        ready (threading.Event): Set once the worker preloaded its models.
+        conn (multiprocessing.connection.Connection): The front end end of the pipe.
+        lock (threading.Lock): Serializes the writes of the connection threads to the pipe.
+        sessions (dict): Sessions running in the worker, by session id.
+    """
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.sessions = {}
+
+    def send(self, message):
+        with self.lock:
+            self.conn.send(message)
+
+
+class WorkerPool:
+    """
+    Runs client sessions in worker processes, so that transcription scales across all the cores of the
+    machine instead of being limited by the GIL of the front end process.
+
+    The front end keeps the WebSocket connections. Each new session is routed to the worker running the
+    fewest sessions; the worker loads its own models with its own CPU thread budget. Audio is exchanged
+    through shared memory and results come back over a pipe, read by one forwarding thread per worker.
+
+    Attributes:
+        num_workers (int): Number of worker processes.
+        cpu_threads (int): Number of CTranslate2 threads per model in each worker.
+        audio_retention (float): Seconds of audio kept in the shared buffer of every session.
+        min_new_audio (float): Seconds of audio appended to a session before its worker is notified.
+        metrics (ServerMetrics): Metrics of the front end the workers report to, None if disabled.
+        metrics_interval (float): Seconds between two metrics reports of a worker.
+        workers (list): The `_Worker`s of the pool.
+    """
+    RATE = 16000
+
+    def __init__(
+        self,
+        num_workers=2,
+        cpu_threads=None,
+        audio_retention=45,
+        model_pool_options=None,
+        preload=(),
+        warmup_audio=None,
+        server_options=None,
+        min_new_audio=0.25,
+        metrics_interval=2.0,
+    ):
+        """
+        Args:
+            num_workers (int, optional): Number of worker processes. Defaults to 2.
+            cpu_threads (int, optional): Number of CTranslate2 threads per model. Defaults to the number of cores
+                                         divided by the number of workers.
+            audio_retention (float, optional): Seconds of audio retained per session. Defaults to 45.
+            model_pool_options (dict, optional): Keyword arguments of the `ModelPool` of every worker, apart from
+                                                 `cpu_threads`.
+            preload (list, optional): Models every worker loads at startup, see `TranscriptionServer.preload`.
+                                      The constructor returns once all workers are ready.
+            warmup_audio (str, optional): Audio file transcribed once by every preloaded model.
+            server_options (dict, optional): Keyword arguments of the `TranscriptionServer` of every worker, e.g.
+                                             `adaptive_decoding`.
+            min_new_audio (float, optional): Seconds of audio appended to a session before its worker is notified,
+                                             the `min_new_audio` of the sessions. Defaults to 0.25.
+            metrics_interval (float, optional): Seconds between two metrics reports of a worker, once
+                                                `forward_metrics` was called. Defaults to 2.0.
+        """
+        self.num_workers = num_workers
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // num_workers)
+        self.audio_retention = audio_retention
+        self.min_new_audio = min_new_audio
+        self.metrics = None
+        self.metrics_interval = metrics_interval
+        self.lock = threading.Lock()
+        self.session_ids = itertools.count()
+        self.workers = []
+        self.stopping = False
+
+        # CTranslate2 and the websocket threads do not survive a fork, start clean interpreters
+        context = multiprocessing.get_context("spawn")
+        for _ in range(num_workers):
+            conn, worker_conn = context.Pipe()
+            process = context.Process(
+                target=run_worker,
+                args=(worker_conn, self.cpu_threads, model_pool_options or {}, list(preload), warmup_audio, server_options),
+                daemon=True,
+            )
+            process.start()
+            worker_conn.close()
+            worker = _Worker(process, conn)
+            self.workers.append(worker)
+            threading.Thread(target=self._forward_results, args=(worker,), daemon=True).start()
+
+        for worker in self.workers:
+            worker.ready.wait()
+        logging.info(f"Started {num_workers} worker processes")
+
+    def open_session(self, websocket, options, custom_model_path=None):
+        """
+        Start a session in the least busy worker.
+
+        Args:
+            websocket: The WebSocket connection, or any object with a `send(str)` method.
+            options (dict): The JSON handshake sent by the client.
+            custom_model_path (str, optional): Path to the custom model of the server.
+
+        Returns:
+            RemoteClient: The front end side of the session.
+        """
+        audio_buffer = SharedAudioRingBuffer(int(self.audio_retention * self.RATE))
+        with self.lock:
+            worker = min(self.workers, key=lambda w: len(w.sessions))
+            session_id = next(self.session_ids)
+            client = RemoteClient(self, worker, session_id, websocket, options, audio_buffer)
+            worker.sessions[session_id] = client
+        worker.send(("open", session_id, options, audio_buffer.name, audio_buffer.capacity, custom_model_path))
+        return client
+
+    def forward_metrics(self, metrics):
+        """
+        Ask the workers to record metrics and add their reports to `metrics`, see `MetricsRegistry.set_remote`.
+
+        Args:
+            metrics (ServerMetrics): Metrics of the front end.
+        """
+        self.metrics = metrics
+        for worker in self.workers:
+            try:
+                worker.send(("metrics", None, self.metrics_interval))
+            except (OSError, ValueError) as e:
+                logging.error(f"[ERROR]: Failed to enable the metrics of worker {worker.process.pid}: {e}")
+
+    def close_session(self, client):
+        with self.lock:
+            client.worker.sessions.pop(client.session_id, None)
+        try:
+            client.worker.send(("close", client.session_id))
+        except (OSError, ValueError) as e:
+            logging.error(f"[ERROR]: Failed to close session of client '{client.client_uid}': {e}")
+        # the worker keeps its own mapping until its transcription thread exits
+        client.audio_buffer.close(unlink=True)
+
+    def _forward_results(self, worker):
+        """Forward the messages of the sessions of `worker` to their WebSocket connections."""
+        while True:
+            try:
+                command, session_id, message = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            if command == "ready":
+                worker.ready.set()
+                continue
+            if command == "metrics":
+                if self.metrics is not None:
+                    self.metrics.registry.set_remote(worker.process.pid, message)
+                continue
+            client = worker.sessions.get(session_id)
+            if client is None:
+                continue
+            if command == "open_failed":
+                self._fail_session(client, message)
+                continue
+            try:
+                client.websocket.send(message)
+            except Exception as e:
+                logging.error(f"[ERROR]: Failed to send message to client '{client.client_uid}': {e}")
+
+        worker.ready.set()
+        if self.metrics is not None:
+            self.metrics.registry.remove_remote(worker.process.pid)
+        if self.stopping:
+            return
+        logging.error(f"[ERROR]: Worker process {worker.process.pid} exited.")
+        for client in list(worker.sessions.values()):
+            try:
+                client.websocket.close()
+            except Exception:
+                pass
+
+    def _fail_session(self, client, reason):
+        """
+        Close the connection of a session its worker failed to open. The connection handler of the server then
+        forgets the client and frees its admission slot.
+
+        Args:
+            client (RemoteClient): The session.
+            reason (str): Error sent to the client, None if the worker already sent one.
+        """
+        logging.error(f"[ERROR]: Failed to open session of client '{client.client_uid}': {reason}")
+        client.model_size_or_path = None
+        try:
+            if reason is not None:
+                client.websocket.send(json.dumps({"uid": client.client_uid, "status": "ERROR", "message": reason}))
+            client.websocket.close()
+        except Exception as e:
+            logging.error(f"[ERROR]: Failed to close connection of client '{client.client_uid}': {e}")
+        client.cleanup()
+
+    def stop(self):
+        """Stop all worker processes."""
+        self.stopping = True
+        for worker in self.workers:
+            try:
+                worker.send(("stop", None))
+            except (OSError, ValueError):
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=5)